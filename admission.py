@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Admission control for the server front-ends
+Each client (API key or address) draws from a token bucket kept in a
+memory-mapped table that all workers on the host share; tool calls also
+need one of a worker's MCP_MAX_CONCURRENT slots, waiting in a bounded
+queue when none is free. Rejections are immediate: 429 when a client is
+over its rate, 503 when the queue is full
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Optional
+
+from metrics import ADMISSION_REJECTED
+
+
+# Requests per second each client may make (0: no rate limit)
+RATE_LIMIT = float(os.environ.get('MCP_RATE_LIMIT', 0))
+
+# Requests a client may make in a burst after being idle
+RATE_BURST = float(os.environ.get('MCP_RATE_BURST', 0)) or max(1.0, 2 * RATE_LIMIT)
+
+# Headers identifying a client, first present wins (else its address)
+CLIENT_KEY_HEADERS = [h.strip() for h in os.environ.get(
+    'MCP_CLIENT_KEY_HEADERS', 'X-API-Key,Authorization,X-Tenant-Id').split(',') if h.strip()]
+
+# Proxies in front of the server that append to X-Forwarded-For (0: use the peer address)
+PROXY_HOPS = int(os.environ.get('MCP_PROXY_HOPS', 0))
+
+# Memory-mapped bucket table shared by the workers
+RATE_LIMIT_FILE = os.environ.get('MCP_RATE_LIMIT_FILE') or os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'mcp-rate-limit')
+
+# Clients tracked at once; idle buckets are reused when the table is full
+RATE_LIMIT_SLOTS = int(os.environ.get('MCP_RATE_LIMIT_SLOTS', 4096))
+
+# Tool calls running at once per worker process (0: unlimited)
+MAX_CONCURRENT = int(os.environ.get('MCP_MAX_CONCURRENT', 0))
+
+# Tool calls that may wait for a slot, and for how many seconds
+ADMISSION_QUEUE = int(os.environ.get('MCP_ADMISSION_QUEUE', 2 * MAX_CONCURRENT))
+ADMISSION_TIMEOUT = float(os.environ.get('MCP_ADMISSION_TIMEOUT', 1.0))
+
+# JSON-RPC error codes (implementation-defined server error range)
+RATE_LIMITED_CODE = -32029
+OVERLOADED_CODE = -32003
+
+
+class RateLimited(Exception):
+    """Raised when a client has no tokens left"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry in {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class Overloaded(Exception):
+    """Raised when no slot frees up and the wait queue is full or times out"""
+
+    retry_after_header = "1"
+
+    def __init__(self, message: str = "Server overloaded, retry later"):
+        super().__init__(message)
+        ADMISSION_REJECTED.inc("overloaded")
+
+
+def client_key(get_header: Callable[[str], Optional[str]], remote_addr: Optional[str]) -> str:
+    """Identify the client a request counts against: an API key header, else its address"""
+    for name in CLIENT_KEY_HEADERS:
+        value = get_header(name)
+        if value:
+            return f"{name.lower()}:{value}"
+    if PROXY_HOPS:
+        forwarded = get_header('X-Forwarded-For')
+        if forwarded:
+            # Each trusted proxy appends the address it saw; earlier entries can be forged
+            hops = [hop.strip() for hop in forwarded.split(',')]
+            return "ip:" + hops[max(0, len(hops) - PROXY_HOPS)]
+    return f"ip:{remote_addr}"
+
+
+@lru_cache(maxsize=4096)
+def _key_hash(key: str) -> int:
+    # Stable across processes (hash() is salted per process); 0 marks a free slot
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+
+class TokenBuckets:
+    """Per-client token buckets in a memory-mapped table shared across processes
+
+    Each slot holds a key hash, a token count and the time it was last
+    updated. A lookup probes a few slots under a thread lock plus a file
+    lock; a new client takes a free slot or the one idle the longest.
+    """
+
+    SLOT = struct.Struct("<Qdd")
+    PROBES = 8
+
+    def __init__(self, rate: float = RATE_LIMIT, burst: float = RATE_BURST,
+                 path: str = RATE_LIMIT_FILE, slots: int = RATE_LIMIT_SLOTS):
+        self.rate = rate
+        self.burst = burst
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+
+    def _open(self):
+        # Mapped on first use, so processes with limiting off create no file
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = self.slots * self.SLOT.size
+        if os.fstat(fd).st_size != size:
+            os.ftruncate(fd, size)
+        self._map = mmap.mmap(fd, size)
+        self._fd = fd
+
+    def take(self, key: str) -> float:
+        """Take a token for key: 0 if admitted, else seconds until one is due"""
+        key_hash = _key_hash(key)
+        with self._lock:
+            if self._map is None:
+                self._open()
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                return self._take(key_hash, time.monotonic())
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _take(self, key_hash: int, now: float) -> float:
+        table, slot = self._map, self.SLOT
+        start = key_hash % self.slots
+        victim, victim_updated = None, math.inf
+        for probe in range(self.PROBES):
+            offset = ((start + probe) % self.slots) * slot.size
+            slot_hash, tokens, updated = slot.unpack_from(table, offset)
+            if slot_hash == key_hash:
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                break
+            if slot_hash == 0:
+                updated = -math.inf
+            if updated < victim_updated:
+                victim, victim_updated = offset, updated
+        else:
+            # A bucket idle for burst / rate seconds is full anyway, so
+            # reusing the longest-idle slot rarely loses anything
+            offset, tokens = victim, self.burst
+        if tokens >= 1:
+            slot.pack_into(table, offset, key_hash, tokens - 1, now)
+            return 0.0
+        slot.pack_into(table, offset, key_hash, tokens, now)
+        return (1 - tokens) / self.rate
+
+    def check(self, key: str):
+        """Take a token for key or raise RateLimited"""
+        if self.rate > 0:
+            wait = self.take(key)
+            if wait:
+                ADMISSION_REJECTED.inc("rate_limited")
+                raise RateLimited(wait)
+
+
+class ConcurrencyLimit:
+    """Caps requests running at once in this process, with a bounded FIFO wait queue"""
+
+    def __init__(self, limit: int = MAX_CONCURRENT, queue: int = ADMISSION_QUEUE,
+                 timeout: float = ADMISSION_TIMEOUT):
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Take a slot, waiting up to timeout; raises Overloaded"""
+        if self.limit <= 0:
+            return
+        with self._condition:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return
+            if self.waiting >= self.queue:
+                raise Overloaded()
+            self.waiting += 1
+            try:
+                if not self._condition.wait_for(lambda: self.active < self.limit, self.timeout):
+                    raise Overloaded()
+                self.active += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        if self.limit <= 0:
+            return
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+class AsyncConcurrencyLimit:
+    """ConcurrencyLimit for one event loop: waiters are futures handed slots in order"""
+
+    def __init__(self, limit: int = MAX_CONCURRENT, queue: int = ADMISSION_QUEUE,
+                 timeout: float = ADMISSION_TIMEOUT):
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: deque = deque()
+
+    async def acquire(self):
+        """Take a slot, waiting up to timeout; raises Overloaded"""
+        if self.limit <= 0:
+            return
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.queue:
+            raise Overloaded()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait((waiter,), timeout=self.timeout)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the request went away
+                self.release()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+                self._waiters.remove(waiter)
+        if waiter.cancelled():
+            raise Overloaded()
+
+    def release(self):
+        """Free a slot, handing it straight to the oldest waiter"""
+        if self.limit <= 0:
+            return
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+buckets = TokenBuckets()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tool dispatch cost as the registry grows
+Registers N no-op tools and times registry.call() for the last one, which
+an if/elif chain would reach only after N comparisons
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool_registry import ToolRegistry  # noqa: E402
+
+
+SCHEMA = {"type": "object", "properties": {}}
+
+
+def build_registry(size: int) -> ToolRegistry:
+    registry = ToolRegistry()
+    for i in range(size):
+        registry.tool(name=f"tool_{i}", description="No-op", input_schema=SCHEMA)(lambda arguments: "ok")
+    return registry
+
+
+async def time_calls(registry: ToolRegistry, name: str, iterations: int) -> float:
+    """Mean microseconds per registry.call()"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await registry.call(name, {})
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=100000)
+    parser.add_argument("--sizes", default="4,100,1000,10000",
+                        help="comma-separated registry sizes")
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        registry = build_registry(size)
+        mean_us = asyncio.run(time_calls(registry, f"tool_{size - 1}", args.iterations))
+        results.append({"tools": size, "mean_us": round(mean_us, 3)})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'tools':>8}{'mean (us)':>12}")
+    for r in results:
+        print(f"{r['tools']:>8}{r['mean_us']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request event loop vs shared loop for /sse dispatch
+Compares the old new_event_loop()/run_until_complete()/close() pattern with
+the shared loop in loop_runner, both in-process and through the Flask app
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mcp_protocol  # noqa: E402
+import mcp_sse_server  # noqa: E402
+from loop_runner import run_coroutine, runner  # noqa: E402
+
+
+ECHO_ARGS = {"text": "Hello, MCP!"}
+
+
+def run_on_new_loop(coro):
+    """The dispatch pattern sse_endpoint used before the shared loop"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def iterate_on_new_loop(agen):
+    """The same pattern for the async iterator POST /sse streams its responses from"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        while True:
+            try:
+                item = loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
+
+
+def per_request_loop():
+    run_on_new_loop(mcp_protocol.call_tool("echo", ECHO_ARGS))
+
+
+def shared_loop():
+    """Dispatch onto the long-lived worker loop"""
+    run_coroutine(mcp_protocol.call_tool("echo", ECHO_ARGS))
+
+
+def sse_request(client):
+    """Full POST /sse round trip through the Flask test client"""
+    response = client.post('/sse', json={
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "tools/call",
+        "params": {"name": "echo", "arguments": ECHO_ARGS}
+    })
+    response.get_data()
+
+
+def measure(fn, iterations, threads):
+    """Return per-call latencies in microseconds"""
+    def timed(_):
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) * 1e6
+
+    for _ in range(min(100, iterations)):
+        fn()
+
+    if threads == 1:
+        return [timed(i) for i in range(iterations)]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(timed, range(iterations)))
+
+
+def summarize(name, samples):
+    samples = sorted(samples)
+    return {
+        "name": name,
+        "calls": len(samples),
+        "p50_us": round(statistics.median(samples), 1),
+        "p99_us": round(samples[int(len(samples) * 0.99) - 1], 1),
+        "mean_us": round(statistics.fmean(samples), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=5000)
+    parser.add_argument("-t", "--threads", type=int, default=1,
+                        help="concurrent request threads (Flask is threaded)")
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    client = mcp_sse_server.app.test_client()
+
+    def sse_before():
+        # Route the endpoint through a fresh loop per request, as before
+        original = mcp_sse_server.iterate_async
+        mcp_sse_server.iterate_async = iterate_on_new_loop
+        try:
+            sse_request(client)
+        finally:
+            mcp_sse_server.iterate_async = original
+
+    results = [
+        summarize("dispatch/new_loop", measure(per_request_loop, args.iterations, args.threads)),
+        summarize("dispatch/shared_loop", measure(shared_loop, args.iterations, args.threads)),
+    ]
+    if args.threads == 1:
+        results += [
+            summarize("sse/new_loop", measure(sse_before, args.iterations, 1)),
+            summarize("sse/shared_loop", measure(lambda: sse_request(client), args.iterations, 1)),
+        ]
+    runner.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'case':<24}{'calls':>8}{'p50 (us)':>12}{'p99 (us)':>12}{'mean (us)':>12}")
+    for r in results:
+        print(f"{r['name']:<24}{r['calls']:>8}{r['p50_us']:>12}{r['p99_us']:>12}{r['mean_us']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: JSON encode/decode cost on tools/list and tools/call payloads
+Compares the stdlib json module with orjson (when installed), and the old
+dict-building tools/call path with writing the text content straight to bytes
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serializer  # noqa: E402
+from tools import registry  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def mean_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def tools_call_message(text: str) -> dict:
+    """tools/call response as sse_endpoint used to build it"""
+    return {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "result": {"content": [{"type": content["type"], "text": content["text"]}
+                               for content in [{"type": "text", "text": text}]]}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=20000)
+    parser.add_argument("--large", type=int, default=1_000_000,
+                        help="characters in the large tools/call result")
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    tools_list = {"jsonrpc": "2.0", "id": 1, "result": {"tools": registry.catalogue}}
+    small_text = "Echo: Hello, MCP!"
+    large_text = "x" * args.large
+    request_body = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                               "params": {"name": "echo", "arguments": {"text": small_text}}}).encode()
+
+    backends = {"json": (lambda v: json.dumps(v).encode(), json.loads)}
+    if orjson is not None:
+        backends["orjson"] = (orjson.dumps, orjson.loads)
+
+    results = []
+    for backend, (dumps, loads) in backends.items():
+        large_n = max(1, args.iterations // 100)
+        results += [
+            {"case": "tools/list encode", "backend": backend,
+             "mean_us": mean_us(lambda: dumps(tools_list), args.iterations)},
+            {"case": "tools/call encode (dict)", "backend": backend,
+             "mean_us": mean_us(lambda: dumps(tools_call_message(small_text)), args.iterations)},
+            {"case": "tools/call 1MB encode (dict)", "backend": backend,
+             "mean_us": mean_us(lambda: dumps(tools_call_message(large_text)), large_n)},
+            {"case": "request decode", "backend": backend,
+             "mean_us": mean_us(lambda: loads(request_body), args.iterations)},
+        ]
+
+    results += [
+        {"case": "tools/call encode (direct bytes)", "backend": serializer.BACKEND,
+         "mean_us": mean_us(lambda: serializer.text_content_result(small_text), args.iterations)},
+        {"case": "tools/call 1MB encode (direct bytes)", "backend": serializer.BACKEND,
+         "mean_us": mean_us(lambda: serializer.text_content_result(large_text),
+                            max(1, args.iterations // 100))},
+    ]
+    for r in results:
+        r["mean_us"] = round(r["mean_us"], 3)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'case':<38}{'backend':>10}{'mean (us)':>14}")
+    for r in results:
+        print(f"{r['case']:<38}{r['backend']:>10}{r['mean_us']:>14}")
+
+
+if __name__ == "__main__":
+    main()
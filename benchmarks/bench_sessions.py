@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: session throughput of prefork_server.py by worker count
+Starts prefork_server.py with each --workers count and keeps --sessions
+session streams busy, each with --concurrency tools/call requests in
+flight. Every session POSTs over its own connections, which the kernel
+spreads across the workers, so most messages are routed to the worker
+holding the stream
+
+    python benchmarks/bench_sessions.py --workers 1,2,4 -s 32 -c 4 -d 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, BENCHMARKS)
+sys.path.insert(0, ROOT)
+
+from load_test import ServerProcess, summarize  # noqa: E402
+from mcp_client import AsyncMCPClient, MCPError  # noqa: E402
+
+
+async def drive(port: int, args) -> dict:
+    clients = [AsyncMCPClient(f"http://127.0.0.1:{port}", max_connections=args.concurrency)
+               for _ in range(args.sessions)]
+    samples = []
+    measuring = False
+
+    async def worker(client: AsyncMCPClient, stop_at: float):
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                await client.call_tool("echo", {"text": "Hello, MCP!"})
+                ok = True
+            except (MCPError, OSError):
+                ok = False
+            if measuring:
+                samples.append(("echo", time.perf_counter() - start, ok))
+
+    try:
+        # Opens every session stream before the clock starts
+        await asyncio.gather(*(client.call_tool("echo", {"text": "warm-up"}) for client in clients))
+        stop_at = time.monotonic() + args.warmup
+        await asyncio.gather(*(worker(client, stop_at) for client in clients for _ in range(args.concurrency)))
+        measuring = True
+        stop_at = time.monotonic() + args.duration
+        await asyncio.gather(*(worker(client, stop_at) for client in clients for _ in range(args.concurrency)))
+    finally:
+        await asyncio.gather(*(client.close() for client in clients))
+    return summarize(samples, args.duration)
+
+
+async def run(workers: int, args) -> dict:
+    server = ServerProcess("prefork", workers, 0)
+    server.start()
+    try:
+        await server.wait_ready(args.startup_timeout)
+        return {"workers": workers, **await drive(server.port, args)}
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default=f"1,{max(2, os.cpu_count() or 1)}",
+                        help="comma-separated worker counts to compare")
+    parser.add_argument("-s", "--sessions", type=int, default=32, help="open session streams")
+    parser.add_argument("-c", "--concurrency", type=int, default=4,
+                        help="requests each session keeps in flight")
+    parser.add_argument("-d", "--duration", type=float, default=10, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before each run")
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run(int(workers), args)) for workers in args.workers.split(",")]
+
+    if args.json:
+        print(json.dumps({"cpus": os.cpu_count(), "results": results}, indent=2))
+        return
+
+    print(f"{'workers':<10}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for r in results:
+        print(f"{r['workers']:<10}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10}"
+              f"{r['p50_ms']:>10}{r['p99_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: stdio server.py throughput and head-of-line blocking
+Starts server.py on a local pipe with each stdio transport and keeps
+--concurrency tools/call requests in flight until --requests have been
+answered, then sends one slow call followed by fast ones to check that
+the fast calls are answered first
+
+    python benchmarks/bench_stdio.py -n 20000 -c 64
+    python benchmarks/bench_stdio.py --transports buffered --max-concurrent 8 --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, BENCHMARKS)
+
+from load_test import StdioClient  # noqa: E402
+
+
+# server.py with an extra tool that sleeps, registered before the server
+# builds its tool list
+SERVER_SCRIPT = """
+import asyncio
+from tools import registry
+
+@registry.tool(name="sleep", description="Sleeps for a number of seconds",
+               input_schema={"type": "object", "properties": {"seconds": {"type": "number"}}})
+async def sleep(arguments):
+    await asyncio.sleep(arguments.get("seconds", 1))
+    return "done"
+
+import server
+asyncio.run(server.main())
+"""
+
+CALL = {"name": "echo", "arguments": {"text": "Hello, MCP!"}}
+
+
+async def throughput(client: StdioClient, requests: int, concurrency: int) -> dict:
+    """Keep concurrency calls in flight until requests have been answered"""
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.request("tools/call", CALL)
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            latencies.append((time.perf_counter() - start) * 1e6)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests_per_s": round(requests / elapsed),
+        "p50_us": round(statistics.median(latencies), 1),
+        "p99_us": round(latencies[int(len(latencies) * 0.99) - 1], 1),
+    }
+
+
+async def head_of_line(client: StdioClient, slow: float, fast: int) -> dict:
+    """Send one slow call, then fast ones; count the fast calls answered before it"""
+    slow_call = asyncio.ensure_future(client.request("tools/call", {"name": "sleep", "arguments": {"seconds": slow}}))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    fast_calls = [asyncio.ensure_future(client.request("tools/call", CALL)) for _ in range(fast)]
+    await asyncio.wait(fast_calls, timeout=slow)
+    ahead = sum(call.done() for call in fast_calls)
+    ahead_ms = (time.perf_counter() - start) * 1e3
+    await asyncio.gather(slow_call, *fast_calls)
+    return {"fast_before_slow": f"{ahead}/{fast}", "fast_ms": round(ahead_ms, 1)}
+
+
+async def run(transport: str, args) -> dict:
+    env = {**os.environ, "MCP_STDIO_TRANSPORT": transport}
+    if args.max_concurrent is not None:
+        env["MCP_STDIO_MAX_CONCURRENT"] = str(args.max_concurrent)
+    proc = subprocess.Popen([sys.executable, "-c", SERVER_SCRIPT], cwd=ROOT, env=env,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    client = StdioClient(proc)
+    try:
+        await client.start()
+        await throughput(client, min(1000, args.requests), args.concurrency)  # warm-up
+        result = {"transport": transport, **await throughput(client, args.requests, args.concurrency)}
+        result.update(await head_of_line(client, args.slow, args.concurrency))
+        return result
+    finally:
+        client.close()
+        proc.stdin.close()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--requests", type=int, default=10000)
+    parser.add_argument("-c", "--concurrency", type=int, default=64,
+                        help="requests the client keeps in flight")
+    parser.add_argument("--transports", default="buffered,sdk",
+                        help="comma-separated: buffered, sdk")
+    parser.add_argument("--max-concurrent", type=int, default=None,
+                        help="MCP_STDIO_MAX_CONCURRENT for the buffered transport")
+    parser.add_argument("--slow", type=float, default=0.5,
+                        help="seconds the slow call sleeps in the head-of-line check")
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run(transport.strip(), args)) for transport in args.transports.split(",")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'transport':<12}{'req/s':>10}{'p50 (us)':>12}{'p99 (us)':>12}{'fast before slow':>20}")
+    for r in results:
+        print(f"{r['transport']:<12}{r['requests_per_s']:>10}{r['p50_us']:>12}{r['p99_us']:>12}"
+              f"{r['fast_before_slow']:>20}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-call cost of tool argument validation
+Compares the registry's compiled validators with jsonschema.validate(),
+which the MCP SDK runs on every call by default
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import jsonschema
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import registry  # noqa: E402
+
+
+CASES = {
+    "echo": {"text": "Hello, MCP!"},
+    "calculate": {"operation": "multiply", "a": 7, "b": 6},
+    "reverse_text": {"text": "MCP Server"},
+}
+
+
+def mean_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=20000)
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    results = []
+    for name, arguments in CASES.items():
+        spec = registry.get(name)
+        results.append({
+            "tool": name,
+            "compiled_us": round(mean_us(lambda: spec.validate(arguments), args.iterations), 3),
+            "jsonschema_us": round(mean_us(
+                lambda: jsonschema.validate(instance=arguments, schema=spec.input_schema),
+                args.iterations), 3),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'tool':<16}{'compiled (us)':>16}{'jsonschema (us)':>18}")
+    for r in results:
+        print(f"{r['tool']:<16}{r['compiled_us']:>16}{r['jsonschema_us']:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Load test: start each server locally and drive it with concurrent clients
+Runs a weighted mix of tools/list and tools/call against http_server,
+mcp_sse_server (under gunicorn, or prefork_server.py), mcp_asgi_server
+and the stdio server.py, and reports requests per second, p50/p95/p99
+latency and the server's peak RSS.
+Write the results with --output and pass a previous file to --compare to
+see the change between commits.
+
+    python benchmarks/load_test.py --servers sse,asgi -c 64 -d 15 --output after.json
+    python benchmarks/load_test.py --servers sse,asgi -c 64 -d 15 --compare after.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Arguments sent with each tools/call
+ARGUMENTS = {
+    "echo": {"text": "Hello, MCP!"},
+    "get_current_time": {},
+    "calculate": {"operation": "multiply", "a": 7, "b": 6},
+    "reverse_text": {"text": "The quick brown fox jumps over the lazy dog"},
+}
+
+# REST routes of http_server.py for each operation
+REST_ROUTES = {
+    "tools/list": ("GET", "/tools"),
+    "echo": ("POST", "/tools/echo"),
+    "get_current_time": ("GET", "/tools/time"),
+    "calculate": ("POST", "/tools/calculate"),
+    "reverse_text": ("POST", "/tools/reverse"),
+}
+
+DEFAULT_MIX = "tools/list=1,echo=3,calculate=3,reverse_text=2,get_current_time=1"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wsgi_command(module: str, port: int, workers: int, threads: int) -> list[str]:
+    """gunicorn as deployed (render.yaml), or Flask's dev server without it"""
+    if importlib.util.find_spec("gunicorn") is None:
+        return [sys.executable, f"{module}.py"]
+    return [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}",
+            "--workers", str(workers), "--worker-class", "gthread", "--threads", str(threads),
+            "--log-level", "warning", f"{module}:app"]
+
+
+def server_command(name: str, port: int, workers: int, threads: int) -> list[str]:
+    if name == "http":
+        return wsgi_command("http_server", port, workers, threads)
+    if name == "sse":
+        return wsgi_command("mcp_sse_server", port, workers, threads)
+    if name == "asgi":
+        return [sys.executable, "-m", "uvicorn", "mcp_asgi_server:app", "--host", "127.0.0.1",
+                "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    if name == "stdio":
+        return [sys.executable, "server.py"]
+    if name == "prefork":
+        return [sys.executable, "prefork_server.py", "--host", "127.0.0.1", "--port", str(port),
+                "--workers", str(workers)]
+    raise ValueError(f"Unknown server: {name}")
+
+
+def tree_rss(pid: int) -> Optional[int]:
+    """Resident memory (bytes) of a process and all its descendants; None off Linux"""
+    total = 0
+    pending = [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+    except FileNotFoundError:
+        if current == pid:
+            return None
+    return total
+
+
+class ServerProcess:
+    """A server started as a subprocess for the length of one run"""
+
+    def __init__(self, name: str, workers: int, threads: int):
+        self.name = name
+        self.port = free_port()
+        self.command = server_command(name, self.port, workers, threads)
+        self.log = tempfile.TemporaryFile()
+        self.proc: Optional[subprocess.Popen] = None
+
+    def start(self, stdio: bool = False):
+        self.proc = subprocess.Popen(
+            self.command, cwd=ROOT, env={**os.environ, "PORT": str(self.port)},
+            stdin=subprocess.PIPE if stdio else subprocess.DEVNULL,
+            stdout=subprocess.PIPE if stdio else subprocess.DEVNULL,
+            stderr=self.log)
+
+    async def wait_ready(self, timeout: float):
+        """Poll /health until the server answers"""
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                if self.proc.poll() is not None:
+                    break
+                try:
+                    if (await client.get(f"http://127.0.0.1:{self.port}/health")).status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+        raise RuntimeError(f"{self.name} server did not start:\n{self.log_tail()}")
+
+    def log_tail(self) -> str:
+        self.log.seek(0)
+        return self.log.read().decode(errors="replace")[-2000:]
+
+    def stop(self):
+        if self.proc is None or self.proc.poll() is not None:
+            return
+        self.proc.terminate()
+        try:
+            self.proc.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+
+class StdioClient:
+    """Newline-delimited JSON-RPC over a server.py subprocess's stdin/stdout"""
+
+    def __init__(self, proc: subprocess.Popen):
+        self.proc = proc
+        self.next_id = 0
+        self.pending: dict[int, asyncio.Future] = {}
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.reader = asyncio.StreamReader(limit=2 ** 24)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(self.reader), self.proc.stdout)
+        transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, self.proc.stdin)
+        self.writer = asyncio.StreamWriter(transport, protocol, None, loop)
+        self.reading = asyncio.create_task(self._read())
+        await self.request("initialize", {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {},
+            "clientInfo": {"name": "load-test", "version": "1.0.0"},
+        })
+        await self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    async def _read(self):
+        while line := await self.reader.readline():
+            message = json.loads(line)
+            future = self.pending.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+
+    async def _send(self, message: dict):
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        await self.writer.drain()
+
+    async def request(self, method: str, params: dict) -> dict:
+        self.next_id += 1
+        future = self.pending[self.next_id] = asyncio.get_running_loop().create_future()
+        await self._send({"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params})
+        return await future
+
+    def close(self):
+        self.reading.cancel()
+        self.writer.close()
+
+
+def rpc_params(operation: str) -> tuple[str, dict]:
+    if operation == "tools/list":
+        return "tools/list", {}
+    return "tools/call", {"name": operation, "arguments": ARGUMENTS[operation]}
+
+
+def rpc_ok(response: dict) -> bool:
+    return "error" not in response and not response.get("result", {}).get("isError")
+
+
+def http_caller(client: httpx.AsyncClient, server: str, port: int) -> Callable[[str], Awaitable[bool]]:
+    base = f"http://127.0.0.1:{port}"
+
+    async def call_rest(operation: str) -> bool:
+        method, path = REST_ROUTES[operation]
+        if method == "GET":
+            response = await client.get(base + path)
+        else:
+            response = await client.post(base + path, json=ARGUMENTS[operation])
+        return response.status_code == 200
+
+    async def call_sse(operation: str) -> bool:
+        method, params = rpc_params(operation)
+        response = await client.post(base + "/sse", json={
+            "jsonrpc": "2.0", "id": 1, "method": method, "params": params})
+        if response.status_code != 200:
+            return False
+        events = [line[6:] for line in response.text.splitlines() if line.startswith("data: ")]
+        return bool(events) and all(rpc_ok(json.loads(event)) for event in events)
+
+    return call_rest if server == "http" else call_sse
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples: list[tuple], seconds: float) -> dict:
+    """Throughput and latency (ms) for a list of (operation, latency, ok) samples"""
+    latencies = sorted(latency * 1000 for _, latency, _ in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, _, ok in samples if not ok),
+        "rps": round(len(samples) / seconds, 1) if seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+    }
+
+
+async def drive(call: Callable[[str], Awaitable[bool]], mix: dict[str, float], args,
+                pid: int) -> dict:
+    """Run args.concurrency clients for warmup + duration seconds"""
+    operations, weights = list(mix), list(mix.values())
+    samples: list[tuple] = []
+    measure_from = time.perf_counter() + args.warmup
+    end = measure_from + args.duration
+    rss = {"peak": 0}
+
+    async def client(index: int):
+        rng = random.Random(args.seed + index)
+        while (start := time.perf_counter()) < end:
+            operation = rng.choices(operations, weights)[0]
+            try:
+                ok = await call(operation)
+            except Exception:
+                ok = False
+            if start >= measure_from:
+                samples.append((operation, time.perf_counter() - start, ok))
+
+    async def sample_rss():
+        while True:
+            rss["peak"] = max(rss["peak"], tree_rss(pid) or 0)
+            await asyncio.sleep(0.25)
+
+    sampler = asyncio.create_task(sample_rss())
+    await asyncio.gather(*(client(i) for i in range(args.concurrency)))
+    sampler.cancel()
+
+    result = summarize(samples, args.duration)
+    result["rss_mb"] = {
+        "peak": round(rss["peak"] / 2 ** 20, 1),
+        "end": round((tree_rss(pid) or 0) / 2 ** 20, 1),
+    }
+    result["operations"] = {
+        operation: summarize([s for s in samples if s[0] == operation], args.duration)
+        for operation in operations
+    }
+    return result
+
+
+async def run_server(name: str, mix: dict[str, float], args) -> dict:
+    server = ServerProcess(name, args.workers, args.threads)
+    server.start(stdio=name == "stdio")
+    try:
+        if name == "stdio":
+            client = StdioClient(server.proc)
+            await asyncio.wait_for(client.start(), args.startup_timeout)
+
+            async def call(operation: str) -> bool:
+                return rpc_ok(await client.request(*rpc_params(operation)))
+
+            try:
+                result = await drive(call, mix, args, server.proc.pid)
+            finally:
+                client.close()
+        else:
+            await server.wait_ready(args.startup_timeout)
+            limits = httpx.Limits(max_connections=args.concurrency,
+                                  max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(limits=limits, timeout=30) as http:
+                result = await drive(http_caller(http, name, server.port), mix, args, server.proc.pid)
+    finally:
+        server.stop()
+    return {"server": name, "command": " ".join(server.command[1:]), **result}
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        operation, _, weight = item.partition("=")
+        operation = operation.strip()
+        if operation not in REST_ROUTES:
+            raise SystemExit(f"Unknown operation in --mix: {operation}")
+        mix[operation] = float(weight or 1)
+    return mix
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results: list[dict]):
+    print(f"{'server':<8}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 (ms)':>10}"
+          f"{'p95 (ms)':>10}{'p99 (ms)':>10}{'rss (MB)':>10}")
+    for r in results:
+        print(f"{r['server']:<8}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10}{r['p50_ms']:>10}"
+              f"{r['p95_ms']:>10}{r['p99_ms']:>10}{r['rss_mb']['peak']:>10}")
+
+
+def print_comparison(report: dict, baseline: dict):
+    """Percentage change against a previous --output file"""
+    results = report["results"]
+    before = {r["server"]: r for r in baseline["results"]}
+    print(f"\nvs {baseline.get('commit') or 'baseline'}:")
+    if baseline.get("config") != report["config"]:
+        print("(warning: the baseline ran with a different configuration)")
+    print(f"{'server':<8}{'rps':>10}{'p50':>10}{'p99':>10}{'rss':>10}")
+    for r in results:
+        old = before.get(r["server"])
+        if old is None:
+            continue
+
+        def change(new, previous):
+            return f"{(new - previous) / previous * 100:+.1f}%" if previous else "n/a"
+        print(f"{r['server']:<8}{change(r['rps'], old['rps']):>10}{change(r['p50_ms'], old['p50_ms']):>10}"
+              f"{change(r['p99_ms'], old['p99_ms']):>10}"
+              f"{change(r['rss_mb']['peak'], old['rss_mb']['peak']):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--servers", default="http,sse,asgi,stdio",
+                        help="comma-separated: http, sse, asgi, stdio, prefork")
+    parser.add_argument("-c", "--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("-d", "--duration", type=float, default=10, help="measured seconds per server")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before each run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted operations, e.g. 'tools/list=1,echo=3'")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn/uvicorn/prefork worker processes")
+    parser.add_argument("--threads", type=int, default=64, help="gunicorn threads per worker")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    results = []
+    for name in args.servers.split(","):
+        results.append(asyncio.run(run_server(name.strip(), mix, args)))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mix": mix,
+            "workers": args.workers,
+            "threads": args.threads,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
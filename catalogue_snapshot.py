@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Startup snapshot for the stdio server
+The initialize result (from the MCP SDK) and the tools/list payload (from
+the tool registry) are built once and saved next to the bytecode cache,
+so a fresh server.py can answer initialize and tools/list without
+importing either. A snapshot is used only while the files it was built
+from (every module of ours loaded to build it, and the SDK) are
+unchanged; MCP_CATALOGUE_SNAPSHOT=off disables it
+"""
+
+import importlib.util
+import os
+import sys
+from typing import Optional
+
+from serializer import dumps, loads
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Where the snapshot is kept ("off": always build from the SDK and registry)
+SNAPSHOT_PATH = os.environ.get('MCP_CATALOGUE_SNAPSHOT') or os.path.join(HERE, '__pycache__', 'catalogue-snapshot.json')
+
+# Files the snapshot is always checked against, besides the modules of
+# ours that building it loads (tools.py's imports, such as vectorized.py)
+SOURCES = ('tools.py', 'tool_registry.py', 'vectorized.py', 'sdk_server.py', 'catalogue_snapshot.py')
+
+
+def sources() -> list[str]:
+    """SOURCES, the files of our modules loaded so far, and the installed MCP SDK"""
+    paths = {os.path.join(HERE, name) for name in SOURCES}
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path and os.path.dirname(os.path.abspath(path)) == HERE:
+            paths.add(os.path.abspath(path))
+    spec = importlib.util.find_spec('mcp')
+    if spec is not None and spec.origin:
+        paths.add(spec.origin)
+    return sorted(paths)
+
+
+def fingerprint(paths: list[str]) -> list:
+    """Sizes and mtimes of paths"""
+    stats = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stats.append([path, st.st_mtime_ns, st.st_size])
+    return stats
+
+
+def build() -> dict:
+    """Build the snapshot (imports the SDK and the tools)"""
+    import sdk_server
+    from tools import registry
+
+    return {
+        "initialize": sdk_server.initialize_result(),
+        "tools_list": loads(registry.tools_list.body),
+        # After the imports, so it covers every module they loaded
+        "fingerprint": fingerprint(sources()),
+    }
+
+
+def load() -> Optional[dict]:
+    """The saved snapshot, or None if there is none or it is out of date"""
+    if SNAPSHOT_PATH == 'off':
+        return None
+    try:
+        with open(SNAPSHOT_PATH, 'rb') as f:
+            snapshot = loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or not isinstance(snapshot.get('fingerprint'), list):
+        return None
+    try:
+        paths = [entry[0] for entry in snapshot['fingerprint']]
+    except (TypeError, IndexError, KeyError):
+        return None
+    if snapshot['fingerprint'] != fingerprint(paths):
+        return None
+    return snapshot
+
+
+def save(snapshot: dict):
+    """Write a snapshot atomically; a read-only install just goes without"""
+    if SNAPSHOT_PATH == 'off':
+        return
+    import tempfile
+
+    directory = os.path.dirname(SNAPSHOT_PATH)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=directory, prefix='.catalogue-')
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dumps(snapshot))
+        os.replace(temp, SNAPSHOT_PATH)
+    except OSError:
+        os.unlink(temp)
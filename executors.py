@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Shared worker pools for blocking or CPU-heavy tool handlers
+Each tool runs inline on the event loop, on a thread pool, or on a process
+pool; pools are created once per worker process and shared by all requests
+"""
+
+import asyncio
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from metrics import QUEUE_WAIT_SECONDS
+
+
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+EXECUTION_MODES = (INLINE, THREAD, PROCESS)
+
+# Pool sizes
+THREAD_POOL_SIZE = int(os.environ.get('TOOL_THREAD_POOL_SIZE', min(32, (os.cpu_count() or 1) + 4)))
+PROCESS_POOL_SIZE = int(os.environ.get('TOOL_PROCESS_POOL_SIZE', os.cpu_count() or 1))
+
+
+def execution_overrides() -> dict[str, str]:
+    """Per-tool modes from TOOL_EXECUTION_MODES, e.g. "reverse_text=process,echo=inline" """
+    overrides = {}
+    for item in os.environ.get('TOOL_EXECUTION_MODES', '').split(','):
+        if not item.strip():
+            continue
+        name, _, mode = item.partition('=')
+        mode = mode.strip()
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Invalid execution mode for {name.strip()}: {mode!r}")
+        overrides[name.strip()] = mode
+    return overrides
+
+
+def _timed(queued: float, fn: Callable, *args: Any) -> Any:
+    QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued, THREAD)
+    return fn(*args)
+
+
+class ExecutorPools:
+    """Lazily started thread and process pools, one set per worker process"""
+
+    def __init__(self, thread_workers: int = THREAD_POOL_SIZE,
+                 process_workers: int = PROCESS_POOL_SIZE):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self._pools: dict[str, Executor] = {}
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self, mode: str) -> Executor:
+        # Pools inherited across a fork have no live workers; start fresh ones
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pools = {}
+                    self._pid = os.getpid()
+        pool = self._pools.get(mode)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(mode)
+                if pool is None:
+                    pool = self._pools[mode] = self._create(mode)
+        return pool
+
+    def _create(self, mode: str) -> Executor:
+        if mode == THREAD:
+            return ThreadPoolExecutor(self.thread_workers, thread_name_prefix="tool-worker")
+        if mode == PROCESS:
+            # Imported here: multiprocessing is slow to load and most
+            # processes never start a pool
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn: the parent has running threads (event loop, thread pool),
+            # which makes fork unsafe
+            return ProcessPoolExecutor(self.process_workers,
+                                       mp_context=multiprocessing.get_context("spawn"))
+        raise ValueError(f"No pool for execution mode: {mode}")
+
+    def submit(self, mode: str, fn: Callable, *args: Any) -> Future:
+        """Start fn(*args) on the pool for mode"""
+        if mode == THREAD:
+            return self.get(mode).submit(_timed, time.perf_counter(), fn, *args)
+        return self.get(mode).submit(fn, *args)
+
+    async def run(self, mode: str, fn: Callable, *args: Any) -> Any:
+        """Run fn(*args) on the pool for mode without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(mode, fn, *args))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                for pool in self._pools.values():
+                    pool.shutdown(wait=False, cancel_futures=True)
+            self._pools = {}
+
+
+pools = ExecutorPools()
+atexit.register(pools.shutdown)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the Flask front-ends (http_server.py and mcp_sse_server.py)
+"""
+
+import os
+import time
+from typing import Any
+
+from flask import Flask, Response, g, request
+from flask.json.provider import JSONProvider
+from werkzeug.exceptions import BadRequest
+
+import metrics
+from admission import ConcurrencyLimit, buckets, client_key
+from profiling import PROFILE_HEADER, profiler
+from request_limits import body_limit, check_tool_limits, read_stream
+from response_compression import MIN_SIZE, compress, compress_stream, compressible, negotiate
+from serializer import dumps, loads
+from session_routing import routed
+from sessions import SessionManager, SessionNotFound
+from tool_registry import CachedPayload
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by the serializer module (orjson when installed)
+
+    Covers jsonify(), dict return values and request.get_json().
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        start = time.perf_counter()
+        body = dumps(obj)
+        metrics.JSON_ENCODE_SECONDS.observe(time.perf_counter() - start)
+        return self._app.response_class(body, mimetype='application/json')
+
+
+def install_json_provider(app: Flask):
+    """Route all of an app's JSON encoding and decoding through the serializer"""
+    app.json = FastJSONProvider(app)
+
+
+def install_metrics(app: Flask):
+    """Count requests by route and status, and serve them at /metrics"""
+
+    @app.after_request
+    def count_request(response: Response) -> Response:
+        if routed(request.environ):
+            # Already counted by the worker that passed it on
+            return response
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.REQUESTS.inc(endpoint, str(response.status_code))
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        """Prometheus metrics"""
+        return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def install_admission(app: Flask, rate_limited: set[str], slot_paths: set[str]):
+    """Rate-limit requests to rate_limited paths per client, and cap POSTs to slot_paths
+
+    RateLimited and Overloaded propagate to the app's error handlers. A
+    slot is held until the response, streamed or not, has been sent.
+    Returns the ConcurrencyLimit the slots come from.
+    """
+    concurrency = ConcurrencyLimit()
+
+    @app.before_request
+    def admit():
+        if request.path in rate_limited and not routed(request.environ):
+            buckets.check(client_key(request.headers.get, request.remote_addr))
+        if request.method == 'POST' and request.path in slot_paths:
+            concurrency.acquire()
+            g.admission_slot = True
+
+    @app.after_request
+    def hold_slot(response: Response) -> Response:
+        if g.pop('admission_slot', False):
+            response.call_on_close(concurrency.release)
+        return response
+
+    @app.teardown_request
+    def release_slot(error):
+        # after_request is skipped when the view raises
+        if g.pop('admission_slot', False):
+            concurrency.release()
+
+    return concurrency
+
+
+def install_session_routing(app: Flask, sessions: SessionManager, path: str, headers: tuple[str, ...]):
+    """Pass POSTs to path for sessions held by another worker process on to that worker
+
+    Does nothing unless sessions has a router (MCP_SESSION_DIR). The
+    session id comes from the session_id query parameter; headers lists
+    the request headers the owning worker needs.
+    """
+    router = sessions.router
+    if router is None:
+        return
+    router.serve(app)
+
+    @app.before_request
+    def route_message():
+        if request.method != 'POST' or request.path != path or routed(request.environ):
+            return None
+        session_id = request.args.get('session_id')
+        if session_id in sessions:
+            return None
+        owner = router.owner(session_id)
+        if owner is None:
+            return None
+        body = read_stream(request.stream, body_limit(request.path), request.content_length)
+        forwarded = {name: request.headers[name] for name in headers if name in request.headers}
+        try:
+            status, content_type, body = router.forward(owner, request.full_path, bytes(body), forwarded)
+        except SessionNotFound:
+            # The owner has exited; the view reports the session as unknown
+            metrics.SESSION_MESSAGES_ROUTED.inc('unreachable')
+            return None
+        metrics.SESSION_MESSAGES_ROUTED.inc(str(status))
+        return Response(body, status=status, content_type=content_type)
+
+
+def install_profiling(app: Flask, tools_by_path: dict[str, str]):
+    """Profile whole requests on demand (X-MCP-Profile header, or MCP_PROFILE_TOOLS)
+
+    For apps whose views do all their work in the request thread;
+    tools_by_path maps each tool endpoint to the tool it serves.
+    """
+
+    @app.before_request
+    def start_profile():
+        tool = tools_by_path.get(request.path)
+        if profiler.wanted(request.headers.get(PROFILE_HEADER), tool=tool or ''):
+            g.profile = profiler.start()
+
+    @app.after_request
+    def finish_profile(response: Response) -> Response:
+        profile = g.pop('profile', None)
+        if profile is not None:
+            path = profiler.finish(profile, tools_by_path.get(request.path, request.path))
+            response.headers[PROFILE_HEADER + '-File'] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def abandon_profile(error):
+        # after_request is skipped when the view raises
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profiler.finish(profile, 'error')
+
+
+def cached_response(payload: CachedPayload, mimetype: str = 'application/json',
+                    headers: dict = None, body: bytes = None) -> Response:
+    """Serve a cached payload (or a body framing it) with its ETag, or a 304
+
+    Compressed bodies are built once per encoding and kept with the payload.
+    """
+    headers = {**(headers or {}), 'ETag': payload.etag, 'Vary': 'Accept-Encoding'}
+    if payload.matches(request.headers.get('If-None-Match')):
+        return Response(status=304, headers=headers)
+    body = payload.body if body is None else body
+    encoding = negotiate(request.headers.get('Accept-Encoding'))
+    if encoding and len(body) >= MIN_SIZE:
+        # Same content, different bytes: the ETag becomes weak
+        headers.update({'Content-Encoding': encoding, 'ETag': 'W/' + payload.etag})
+        body = payload.encoded(encoding, body)
+    return Response(body, mimetype=mimetype, headers=headers)
+
+
+def install_compression(app: Flask):
+    """Compress JSON and SSE responses for clients that accept it
+
+    Complete bodies are compressed from MIN_SIZE bytes up; event streams
+    are compressed as they are generated, flushing after every event.
+    """
+
+    @app.after_request
+    def compress_response(response: Response) -> Response:
+        if (response.status_code in (204, 304) or 'Content-Encoding' in response.headers
+                or not compressible(response.mimetype)):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding)
+        else:
+            body = response.get_data()
+            if len(body) < MIN_SIZE:
+                return response
+            response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def read_json(tool: str = None, silent: bool = True) -> Any:
+    """Parse the request body, enforcing the endpoint's (and tool's) body limit
+
+    Raises BodyTooLarge before reading if Content-Length is over the limit,
+    or as soon as the bytes received pass it. The raw body is released once
+    parsed rather than cached on the request. Bad JSON gives None when
+    silent, else BadRequest, as with request.get_json().
+    """
+    raw = read_stream(request.stream, body_limit(request.path, tool), request.content_length)
+    if not raw:
+        return None
+    try:
+        data = loads(raw)
+    except ValueError:
+        if silent:
+            return None
+        raise BadRequest("Failed to decode JSON object")
+    if tool is None:
+        check_tool_limits(data, len(raw))
+    return data
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+gunicorn settings, read from the working directory when gunicorn starts
+Command-line options (as in render.yaml) still take precedence
+"""
+
+import metrics
+
+
+def child_exit(server, worker):
+    """Fold an exited worker's counters into the MCP_METRICS_DIR totals"""
+    metrics.mark_process_dead(worker.pid)
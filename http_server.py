@@ -4,10 +4,116 @@ HTTP wrapper for MCP Server
 This allows the MCP server to be accessed via HTTP endpoints
 """
 
-from flask import Flask, request, jsonify
+import functools
+import math
+
+from flask import Flask, jsonify
 from datetime import datetime
 
+from flask_support import (
+    cached_response,
+    install_admission,
+    install_compression,
+    install_json_provider,
+    install_metrics,
+    install_profiling,
+    read_json,
+)
+from admission import Overloaded, RateLimited
+from metrics import TOOL_CALL_SECONDS
+from request_limits import BodyTooLarge
+from tool_registry import CachedPayload, InvalidArgumentsError
+from tools import OPERATIONS, registry
+from vectorized import batch_length, evaluate
+
 app = Flask(__name__)
+install_json_provider(app)
+install_metrics(app)
+install_compression(app)
+
+# REST endpoint serving each tool in the shared catalogue
+TOOL_ENDPOINTS = {
+    "echo": ("/tools/echo", "POST"),
+    "get_current_time": ("/tools/time", "GET"),
+    "calculate": ("/tools/calculate", "POST"),
+    "reverse_text": ("/tools/reverse", "POST"),
+}
+
+
+def describe_parameters(schema: dict) -> dict:
+    """Summarize an inputSchema as the human-readable parameter strings of /tools"""
+    required = set(schema.get("required", []))
+    parameters = {}
+    for name, prop in schema.get("properties", {}).items():
+        types = prop['type'] if isinstance(prop['type'], list) else [prop['type']]
+        text = f"{' or '.join(types)} ({'required' if name in required else 'optional'})"
+        enum = prop.get("enum", prop.get("items", {}).get("enum"))
+        if enum:
+            text += ": " + ", ".join(enum)
+        parameters[name] = text
+    return parameters
+
+
+def build_tools_list() -> CachedPayload:
+    """Build the /tools response once from the shared catalogue"""
+    tools = []
+    for tool in registry.catalogue:
+        endpoint, method = TOOL_ENDPOINTS[tool["name"]]
+        entry = {
+            "name": tool["name"],
+            "description": tool["description"],
+            "endpoint": endpoint,
+            "method": method,
+        }
+        if method == "POST":
+            entry["parameters"] = describe_parameters(tool["inputSchema"])
+        tools.append(entry)
+    return CachedPayload({"tools": tools})
+
+
+HTTP_TOOLS_LIST = build_tools_list()
+
+TOOL_PATHS = {endpoint for endpoint, _ in TOOL_ENDPOINTS.values()}
+install_admission(app, rate_limited=TOOL_PATHS, slot_paths=TOOL_PATHS)
+install_profiling(app, {endpoint: name for name, (endpoint, _) in TOOL_ENDPOINTS.items()})
+
+
+def invalid_arguments(tool_name: str, data: dict):
+    """Check a request body against the tool's inputSchema; return a 400 response if it fails"""
+    try:
+        registry.validate(tool_name, data)
+    except InvalidArgumentsError as e:
+        return jsonify({"error": f"Invalid params: {e}"}), 400
+    return None
+
+
+def timed(tool_name: str):
+    """Record a tool endpoint in mcp_tool_call_seconds, as JSON-RPC calls are"""
+    def decorate(view):
+        @functools.wraps(view)
+        def timed_view(*args, **kwargs):
+            with TOOL_CALL_SECONDS.time(tool_name):
+                return view(*args, **kwargs)
+        return timed_view
+    return decorate
+
+
+@app.errorhandler(BodyTooLarge)
+def body_too_large(e):
+    """Reject oversized requests before they are read in full"""
+    return jsonify({"error": str(e)}), 413
+
+
+@app.errorhandler(RateLimited)
+def rate_limited(e):
+    """Turn away a client that is over its request rate"""
+    return jsonify({"error": str(e)}), 429, {"Retry-After": e.retry_after_header}
+
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    """Turn away a tool call when no slot frees up in time"""
+    return jsonify({"error": str(e)}), 503, {"Retry-After": e.retry_after_header}
 
 
 @app.route('/')
@@ -24,7 +130,8 @@ def home():
             "/tools/echo": "Echo tool",
             "/tools/time": "Current time tool",
             "/tools/calculate": "Calculator tool",
-            "/tools/reverse": "Text reversal tool"
+            "/tools/reverse": "Text reversal tool",
+            "/metrics": "Prometheus metrics"
         }
     })
 
@@ -38,53 +145,19 @@ def health():
 @app.route('/tools')
 def list_tools():
     """List all available tools"""
-    return jsonify({
-        "tools": [
-            {
-                "name": "echo",
-                "description": "Echoes back the input text",
-                "endpoint": "/tools/echo",
-                "method": "POST",
-                "parameters": {
-                    "text": "string (required)"
-                }
-            },
-            {
-                "name": "get_current_time",
-                "description": "Returns the current server time",
-                "endpoint": "/tools/time",
-                "method": "GET"
-            },
-            {
-                "name": "calculate",
-                "description": "Performs basic arithmetic operations",
-                "endpoint": "/tools/calculate",
-                "method": "POST",
-                "parameters": {
-                    "operation": "string (required): add, subtract, multiply, divide",
-                    "a": "number (required)",
-                    "b": "number (required)"
-                }
-            },
-            {
-                "name": "reverse_text",
-                "description": "Reverses the input text",
-                "endpoint": "/tools/reverse",
-                "method": "POST",
-                "parameters": {
-                    "text": "string (required)"
-                }
-            }
-        ]
-    })
+    return cached_response(HTTP_TOOLS_LIST)
 
 
 @app.route('/tools/echo', methods=['POST'])
+@timed("echo")
 def echo():
     """Echo tool endpoint"""
-    data = request.get_json()
+    data = read_json("echo", silent=False)
     if not data or 'text' not in data:
         return jsonify({"error": "Missing 'text' parameter"}), 400
+    error = invalid_arguments("echo", data)
+    if error:
+        return error
     
     return jsonify({
         "tool": "echo",
@@ -93,6 +166,7 @@ def echo():
 
 
 @app.route('/tools/time', methods=['GET'])
+@timed("get_current_time")
 def get_time():
     """Current time tool endpoint"""
     return jsonify({
@@ -103,36 +177,49 @@ def get_time():
 
 
 @app.route('/tools/calculate', methods=['POST'])
+@timed("calculate")
 def calculate():
     """Calculator tool endpoint"""
-    data = request.get_json()
+    data = read_json("calculate", silent=False)
     
     if not data:
         return jsonify({"error": "Missing request body"}), 400
     
-    operation = data.get('operation')
+    operation = data.get('operations', data.get('operation'))
     a = data.get('a')
     b = data.get('b')
     
     if not all([operation, a is not None, b is not None]):
         return jsonify({"error": "Missing required parameters: operation, a, b"}), 400
+    error = invalid_arguments("calculate", data)
+    if error:
+        return error
+    
+    try:
+        # Arrays are evaluated element-wise in one pass
+        if batch_length(operation, a, b) is not None:
+            results, divide_by_zero, non_finite = evaluate(operation, a, b)
+            return jsonify({
+                "tool": "calculate",
+                "result": results,
+                "divide_by_zero": divide_by_zero,
+                "non_finite": non_finite
+            })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     try:
         a = float(a)
         b = float(b)
         
-        if operation == "add":
-            result = a + b
-        elif operation == "subtract":
-            result = a - b
-        elif operation == "multiply":
-            result = a * b
-        elif operation == "divide":
-            if b == 0:
-                return jsonify({"error": "Division by zero"}), 400
-            result = a / b
-        else:
+        op = OPERATIONS.get(operation)
+        if op is None:
             return jsonify({"error": f"Unknown operation: {operation}"}), 400
+        if operation == "divide" and b == 0:
+            return jsonify({"error": "Division by zero"}), 400
+        result = op(a, b)
+        if not math.isfinite(result):
+            return jsonify({"error": "Result is not a finite number"}), 400
         
         return jsonify({
             "tool": "calculate",
@@ -148,11 +235,15 @@ def calculate():
 
 
 @app.route('/tools/reverse', methods=['POST'])
+@timed("reverse_text")
 def reverse_text():
     """Text reversal tool endpoint"""
-    data = request.get_json()
+    data = read_json("reverse_text", silent=False)
     if not data or 'text' not in data:
         return jsonify({"error": "Missing 'text' parameter"}), 400
+    error = invalid_arguments("reverse_text", data)
+    if error:
+        return error
     
     text = data['text']
     reversed_text = text[::-1]
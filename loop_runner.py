@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Shared asyncio event loop for synchronous front-ends
+Flask request threads submit coroutines to one long-lived loop per worker
+process instead of creating and closing a loop for every request
+"""
+
+import asyncio
+import os
+import threading
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional
+
+
+class LoopRunner:
+    """Runs an event loop in a daemon thread and accepts work from any thread"""
+
+    def __init__(self, name: str = "mcp-event-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Return the running loop, starting it on first use in this process"""
+        # A loop started before a fork (e.g. gunicorn --preload) has no
+        # thread in the child, so restart it when the pid changes
+        if self._loop is None or self._pid != os.getpid():
+            with self._lock:
+                if self._loop is None or self._pid != os.getpid():
+                    self._start()
+        return self._loop
+
+    def _start(self):
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        thread = threading.Thread(target=run, name=self.name, daemon=True)
+        thread.start()
+        ready.wait()
+
+        self._loop = loop
+        self._thread = thread
+        self._pid = os.getpid()
+
+    def submit(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the shared loop and block until it finishes"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator) -> Iterator:
+        """Consume an async iterator on the shared loop from a sync caller
+
+        Items are pulled one at a time, so a Flask generator can stream them
+        as they are produced and a slow client holds back the producer
+        instead of letting output pile up in memory.
+        """
+        loop = self.loop
+        try:
+            while True:
+                future = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop)
+                try:
+                    item = future.result()
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            # Client went away mid-stream: let the producer clean up
+            asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+    def stop(self):
+        """Stop the loop thread (used by benchmarks and tests)"""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+
+# One runner per worker process, shared by all request threads
+runner = LoopRunner()
+
+
+def run_coroutine(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the worker's shared event loop and return its result"""
+    return runner.submit(coro, timeout)
+
+
+def iterate_async(agen: AsyncIterator) -> Iterator:
+    """Iterate an async iterator on the worker's shared event loop"""
+    return runner.iterate(agen)
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+MCP ASGI Server - the SSE transport served natively on asyncio
+Exposes the same /, /health, /sse and /messages routes as mcp_sse_server.py,
+but every connection is a task on one event loop per worker instead of a
+worker thread
+
+Run with:  uvicorn mcp_asgi_server:app --workers 2
+"""
+
+import asyncio
+import time
+from typing import Any, Optional
+from urllib.parse import parse_qs
+
+from mcp_protocol import (
+    HOME_INFO,
+    error_response,
+    expects_response,
+    health_info,
+    is_tools_list,
+    request_deadline,
+    server_info_event,
+    sse_event,
+)
+import metrics
+from admission import (
+    OVERLOADED_CODE,
+    RATE_LIMITED_CODE,
+    AsyncConcurrencyLimit,
+    Overloaded,
+    RateLimited,
+    buckets,
+    client_key,
+)
+from profiling import profiler
+from request_limits import BodyReader, BodyTooLarge, body_limit, check_tool_limits
+from response_compression import ENCODINGS, MIN_SIZE, StreamCompressor, compress, compressible, negotiate
+from serializer import dumps, loads
+from sessions import (
+    KEEPALIVE_COMMENT,
+    SessionBusy,
+    SessionManager,
+    SessionNotFound,
+    endpoint_event,
+)
+from tool_registry import CachedPayload
+from tools import registry
+
+
+# Open session streams in this worker process
+sessions = SessionManager()
+
+# Paths whose requests count against the client's rate, and whose POSTs
+# (tool calls) need a concurrency slot; calls posted to a session's
+# /messages take theirs in the handler, as it is held until they finish
+RATE_LIMITED_PATHS = {"/sse", "/messages"}
+SLOT_PATHS = {"/sse"}
+concurrency = AsyncConcurrencyLimit()
+
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),
+]
+
+JSON_HEADERS = [
+    (b"content-type", b"application/json"),
+]
+
+
+def header(scope, name: bytes) -> Optional[str]:
+    """Return a request header value (name in lowercase bytes)"""
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def send_cached(scope, send, payload: CachedPayload, headers: list = JSON_HEADERS,
+                      body: bytes = None):
+    """Serve a cached payload (or a body framing it) with its ETag, or a 304
+
+    Compressed bodies are built once per encoding and kept with the payload.
+    """
+    etag = payload.etag.encode()
+    headers = headers + [(b"vary", b"accept-encoding")]
+    if payload.matches(header(scope, b"if-none-match")):
+        await send({"type": "http.response.start", "status": 304, "headers": headers + [(b"etag", etag)]})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    body = payload.body if body is None else body
+    encoding = negotiate(header(scope, b"accept-encoding"))
+    if encoding and len(body) >= MIN_SIZE:
+        # Same content, different bytes: the ETag becomes weak
+        headers += [(b"content-encoding", encoding.encode()), (b"etag", b"W/" + etag)]
+        body = payload.encoded(encoding, body)
+    else:
+        headers.append((b"etag", etag))
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def read_body(scope, receive) -> bytearray:
+    """Read the request body into one buffer, raising BodyTooLarge past the path's limit"""
+    content_length = header(scope, b"content-length")
+    reader = BodyReader(body_limit(scope["path"]),
+                        int(content_length) if content_length and content_length.isdigit() else None)
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        reader.feed(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return reader.body()
+
+
+async def send_json(send, payload: Any, status: int = 200, headers: list = ()):
+    """Send a complete JSON response"""
+    start = time.perf_counter()
+    body = dumps(payload)
+    metrics.JSON_ENCODE_SECONDS.observe(time.perf_counter() - start)
+    await send({"type": "http.response.start", "status": status, "headers": JSON_HEADERS + list(headers)})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def read_json(scope, receive) -> tuple[Any, Optional[dict]]:
+    """Read and parse a JSON request body, or return a JSON-RPC parse error"""
+    raw = await read_body(scope, receive)
+    try:
+        data = loads(raw) if raw else None
+    except ValueError as e:
+        return None, error_response(None, -32700, f"Parse error: {e}")
+    check_tool_limits(data, len(raw))
+    return data, None
+
+
+async def sse_endpoint(scope, receive, send):
+    """SSE endpoint for MCP protocol"""
+    if scope["method"] == "GET":
+        await session_stream(scope, receive, send)
+        return
+
+    data, error = await read_json(scope, receive)
+
+    if is_tools_list(data):
+        # The catalogue never changes at runtime, so polling gateways can
+        # revalidate with If-None-Match instead of re-downloading it
+        tools_list = registry.tools_list
+        event = sse_event({"id": data.get("id"), "result": tools_list})
+        await send_cached(scope, send, tools_list, headers=SSE_HEADERS, body=event)
+        return
+
+    await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+    if error:
+        await send({"type": "http.response.body", "body": sse_event(error)})
+        return
+
+    handler = profiler.payload_handler(header(scope, b"x-mcp-profile"), data)
+    deadline = request_deadline(header(scope, b"x-mcp-timeout"))
+    # Stream each response (batches may have several) as soon as it is ready
+    with metrics.SSE_STREAMS.track("request"):
+        async for response in handler(data, deadline):
+            await send({"type": "http.response.body", "body": sse_event(response), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def session_stream(scope, receive, send):
+    """Open a long-lived session stream (GET /sse)"""
+    session = sessions.create()
+    stream = asyncio.current_task()
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        session.close()
+        stream.cancel()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    metrics.SSE_STREAMS.inc("session")
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+        await send({"type": "http.response.body", "body": endpoint_event(session), "more_body": True})
+        await send({"type": "http.response.body", "body": sse_event(server_info_event()), "more_body": True})
+        while not session.closed:
+            event = await session.next_event()
+            body = KEEPALIVE_COMMENT if event is None else sse_event(event)
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    except asyncio.CancelledError:
+        # Cancelled by the disconnect watcher; anything else propagates
+        if not watcher.done():
+            raise
+    finally:
+        watcher.cancel()
+        sessions.remove(session.id)
+        metrics.SSE_STREAMS.dec("session")
+
+
+async def messages(scope, receive, send):
+    """Accept a JSON-RPC message for an open session stream; its responses go to the stream"""
+    query = parse_qs(scope.get("query_string", b"").decode())
+    session_id = query.get("session_id", [None])[0]
+    data, error = await read_json(scope, receive)
+
+    try:
+        session = sessions.get(session_id)
+        if error:
+            await session.push(error)
+        else:
+            release = None
+            if expects_response(data):
+                # Raises Overloaded, answered by app()
+                await concurrency.acquire()
+                release = concurrency.release
+            try:
+                await session.accept(data, profiler.payload_handler(header(scope, b"x-mcp-profile"), data),
+                                     request_deadline(header(scope, b"x-mcp-timeout")), on_done=release)
+            except BaseException:
+                if release is not None:
+                    release()
+                raise
+    except SessionNotFound:
+        await send_json(send, {"error": f"Unknown session: {session_id}"}, status=404)
+        return
+    except SessionBusy as e:
+        await send_json(send, {"error": str(e)}, status=503)
+        return
+
+    await send_json(send, {"status": "accepted"}, status=202)
+
+
+async def tools(scope, receive, send):
+    """Tool catalogue (the tools/list result) with ETag revalidation"""
+    await send_cached(scope, send, registry.tools_list)
+
+
+async def metrics_endpoint(scope, receive, send):
+    """Prometheus metrics"""
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", metrics.CONTENT_TYPE.encode())]})
+    await send({"type": "http.response.body", "body": metrics.render()})
+
+
+async def home(scope, receive, send):
+    """Home endpoint with server information"""
+    await send_json(send, HOME_INFO)
+
+
+async def health(scope, receive, send):
+    """Health check endpoint"""
+    await send_json(send, health_info())
+
+
+ROUTES = {
+    "/": (home, {"GET", "HEAD"}),
+    "/health": (health, {"GET", "HEAD"}),
+    "/sse": (sse_endpoint, {"GET", "POST"}),
+    "/messages": (messages, {"POST"}),
+    "/tools": (tools, {"GET", "HEAD"}),
+    "/metrics": (metrics_endpoint, {"GET", "HEAD"}),
+}
+
+
+async def lifespan(scope, receive, send):
+    """Acknowledge ASGI lifespan events"""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def counting_send(send, endpoint: str):
+    """Wrap an ASGI send channel to count the response by endpoint and status"""
+    async def counted(message):
+        if message["type"] == "http.response.start":
+            metrics.REQUESTS.inc(endpoint, str(message["status"]))
+        await send(message)
+    return counted
+
+
+def compressing_send(send, encoding: Optional[str]):
+    """Wrap an ASGI send channel to compress JSON and SSE responses
+
+    The response start is held back until the first body message shows
+    whether the body is complete (compressed from MIN_SIZE bytes up) or
+    streamed (compressed message by message, flushing each one).
+    """
+    start = None
+    compressor = None
+
+    async def compressed(message):
+        nonlocal start, compressor
+        if message["type"] == "http.response.start":
+            headers = dict(message.get("headers", []))
+            if (message["status"] in (204, 304) or b"content-encoding" in headers
+                    or not compressible(headers.get(b"content-type", b"").decode("latin-1"))):
+                await send(message)
+            else:
+                start = message
+            return
+        if start is None and compressor is None:
+            await send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if start is not None:
+            headers = [(k, v) for k, v in start["headers"] if k != b"content-length"]
+            if not any(k == b"vary" for k, _ in headers):
+                headers.append((b"vary", b"accept-encoding"))
+            if encoding is None or (not more_body and len(body) < MIN_SIZE):
+                await send({**start, "headers": headers})
+                start = None
+                await send(message)
+                return
+            headers.append((b"content-encoding", encoding.encode()))
+            await send({**start, "headers": headers})
+            start = None
+            if not more_body:
+                await send({"type": "http.response.body", "body": compress(body, encoding)})
+                return
+            compressor = StreamCompressor(encoding)
+        body = compressor.compress(body)
+        if not more_body:
+            body += compressor.finish()
+        await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    return compressed
+
+
+async def app(scope, receive, send):
+    """ASGI application entry point"""
+    if scope["type"] == "lifespan":
+        await lifespan(scope, receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    route = ROUTES.get(scope["path"])
+    send = counting_send(send, scope["path"] if route is not None else "unmatched")
+    if ENCODINGS:
+        send = compressing_send(send, negotiate(header(scope, b"accept-encoding")))
+    if route is None:
+        await send_json(send, {"error": "Not found"}, status=404)
+        return
+
+    handler, methods = route
+    if scope["method"] not in methods:
+        await send_json(send, {"error": "Method not allowed"}, status=405)
+        return
+
+    holds_slot = False
+    try:
+        if scope["path"] in RATE_LIMITED_PATHS:
+            client = scope.get("client")
+            buckets.check(client_key(lambda name: header(scope, name.lower().encode()),
+                                     client[0] if client else None))
+        if scope["method"] == "POST" and scope["path"] in SLOT_PATHS:
+            await concurrency.acquire()
+            holds_slot = True
+        await handler(scope, receive, send)
+    except BodyTooLarge as e:
+        # Raised while reading the body, before any response has started
+        await send_json(send, error_response(None, -32600, str(e)), status=413)
+    except RateLimited as e:
+        await send_json(send, error_response(None, RATE_LIMITED_CODE, str(e)), status=429,
+                        headers=[(b"retry-after", e.retry_after_header.encode())])
+    except Overloaded as e:
+        await send_json(send, error_response(None, OVERLOADED_CODE, str(e)), status=503,
+                        headers=[(b"retry-after", e.retry_after_header.encode())])
+    finally:
+        if holds_slot:
+            concurrency.release()
+
+
+if __name__ == '__main__':
+    import os
+    import uvicorn
+    port = int(os.environ.get('PORT', 8000))
+    uvicorn.run(app, host='0.0.0.0', port=port, log_level='info')
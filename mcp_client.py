@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Client for the MCP SSE servers (mcp_sse_server.py and mcp_asgi_server.py)
+Requests share pooled keep-alive connections. In session mode they are
+pipelined over one GET /sse stream and matched to responses by id; calls
+issued within a short window go out together as one JSON-RPC batch
+
+    with MCPClient("http://localhost:8000") as client:
+        print(client.call_tool_text("echo", {"text": "hi"}))
+
+    async with AsyncMCPClient("http://localhost:8000") as client:
+        results = await client.call_tools([("echo", {"text": "a"}), ("echo", {"text": "b"})])
+"""
+
+import asyncio
+import itertools
+import json
+import random
+from typing import Any, AsyncIterator, Iterator, Optional
+
+import httpx
+
+from loop_runner import LoopRunner
+
+
+# Seconds calls are held back to be sent together as one batch
+BATCH_WINDOW = 0.002
+
+# Responses that mean the request was not handled and may be retried
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+# The same for POSTs to a session's /messages endpoint, which are answered
+# before their calls run (a 503 means the session or server is busy); a
+# gateway timeout can still come after the server has accepted them
+SESSION_RETRY_STATUSES = frozenset({429, 502, 503})
+
+# Failures that happen before the request is sent, so it can't have run
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Also retried for GETs, which are safe to repeat: a stale keep-alive
+# connection closed by the server shows up as RemoteProtocolError, but so
+# does one dropped after a POST was sent, whose tool calls may have run
+GET_RETRY_ERRORS = RETRY_ERRORS + (httpx.RemoteProtocolError,)
+
+
+class MCPError(Exception):
+    """A JSON-RPC error response from the server"""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(f"{message} (code {code})")
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class SessionClosed(ConnectionError):
+    """The session stream ended while requests were waiting for responses"""
+
+
+def result_text(result: dict) -> str:
+    """The text of a tools/call result's text content items"""
+    return "".join(item.get("text", "") for item in result.get("content", []) if item.get("type") == "text")
+
+
+async def sse_events(lines: AsyncIterator[str]) -> AsyncIterator[tuple[str, str]]:
+    """Parse an SSE stream into (event type, data) pairs, skipping comments"""
+    event, data = "message", []
+    async for line in lines:
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip(" "))
+    if data:
+        yield event, "\n".join(data)
+
+
+class AsyncMCPClient:
+    """asyncio client speaking JSON-RPC to an MCP SSE server
+
+    session=True opens one GET /sse stream and POSTs requests to the
+    /messages endpoint it announces; session=False POSTs each batch to
+    /sse and reads the responses from that request's own stream.
+    """
+
+    def __init__(self, base_url: str, session: bool = True, batch_window: float = BATCH_WINDOW,
+                 max_batch: int = 100, retries: int = 3, backoff: float = 0.1,
+                 timeout: float = 30.0, max_connections: int = 20, headers: Optional[dict] = None):
+        self.session = session
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"), timeout=timeout, headers=headers,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections))
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._outbox: list[dict] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._sending: set[asyncio.Task] = set()
+        self._endpoint: Optional[str] = None
+        self._stream: Optional[asyncio.Task] = None
+        # The session stream that accepted each pending request and owes its response
+        self._owners: dict[int, asyncio.Task] = {}
+        self._connecting: Optional[asyncio.Lock] = None
+        self._tools_etag: Optional[str] = None
+        self._tools: Optional[list] = None
+
+    async def __aenter__(self) -> "AsyncMCPClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def request(self, method: str, params: Optional[dict] = None) -> Any:
+        """Send a JSON-RPC request and return its result, raising MCPError on error"""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._enqueue({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}})
+        try:
+            response = await future
+        except asyncio.CancelledError:
+            if self.session and future.cancelled():
+                # Let the server abort the call and free its slot
+                self._enqueue({"jsonrpc": "2.0", "method": "notifications/cancelled",
+                               "params": {"requestId": request_id, "reason": "Cancelled by client"}})
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+            self._owners.pop(request_id, None)
+        if "error" in response:
+            error = response["error"]
+            raise MCPError(error.get("code"), error.get("message"), error.get("data"))
+        return response.get("result")
+
+    async def list_tools(self) -> list[dict]:
+        """The server's tool catalogue, revalidated with its ETag (GET /tools)"""
+        headers = {"If-None-Match": self._tools_etag} if self._tools_etag else {}
+        response = await self._retrying("GET", "/tools", headers=headers)
+        if response.status_code == 304 and self._tools is not None:
+            return self._tools
+        response.raise_for_status()
+        self._tools = response.json()["tools"]
+        self._tools_etag = response.headers.get("ETag")
+        return self._tools
+
+    async def call_tool(self, name: str, arguments: Optional[dict] = None,
+                        timeout: Optional[float] = None) -> dict:
+        """Call a tool and return its result ({"content": [...]})
+
+        timeout (seconds) is enforced by the server, which answers with
+        MCPError code -32001 when the call runs out of time.
+        """
+        params = {"name": name, "arguments": arguments or {}}
+        if timeout is not None:
+            params["_meta"] = {"timeout": timeout}
+        return await self.request("tools/call", params)
+
+    async def call_tool_text(self, name: str, arguments: Optional[dict] = None,
+                             timeout: Optional[float] = None) -> str:
+        """Call a tool and return its text output"""
+        return result_text(await self.call_tool(name, arguments, timeout))
+
+    async def call_tools(self, calls: list[tuple[str, Optional[dict]]]) -> list:
+        """Call several tools at once (sent as one batch); errors are returned in place"""
+        return await asyncio.gather(*(self.call_tool(name, arguments) for name, arguments in calls),
+                                    return_exceptions=True)
+
+    async def stream_tool(self, name: str, arguments: Optional[dict] = None) -> AsyncIterator[str]:
+        """Call a tool with streamed output, yielding each chunk as it arrives"""
+        request_id = next(self._ids)
+        message = {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": "tools/call",
+            "params": {"name": name, "arguments": arguments or {}, "_meta": {"stream": True}},
+        }
+        async with self.http.stream("POST", "/sse", json=message,
+                                    timeout=httpx.Timeout(self.timeout, read=None)) as response:
+            response.raise_for_status()
+            async for _, data in sse_events(response.aiter_lines()):
+                event = json.loads(data)
+                if event.get("method") == "notifications/progress":
+                    yield event["params"].get("message", "")
+                elif "error" in event:
+                    error = event["error"]
+                    raise MCPError(error.get("code"), error.get("message"), error.get("data"))
+
+    async def close(self):
+        """Close the session stream and the connection pool"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        if self._stream is not None:
+            self._stream.cancel()
+        self._fail_pending(SessionClosed("Client closed"))
+        await self.http.aclose()
+
+    def _enqueue(self, message: dict):
+        self._outbox.append(message)
+        if len(self._outbox) >= self.max_batch:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+
+    def _flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        messages, self._outbox = self._outbox, []
+        if not messages:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(messages))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, messages: list[dict]):
+        payload = messages[0] if len(messages) == 1 else messages
+        try:
+            if self.session:
+                await self._send_to_session(payload)
+            else:
+                await self._send_one_shot(payload)
+        except Exception as e:
+            for message in messages:
+                future = self._pending.get(message.get("id"))
+                if future is not None and not future.done():
+                    future.set_exception(e)
+
+    async def _send_to_session(self, payload: Any):
+        for attempt in range(2):
+            endpoint = await self._connect()
+            stream = self._stream
+            # Answered once the calls are accepted; their results arrive on the stream
+            response = await self._retrying("POST", endpoint, json=payload,
+                                            retry_statuses=SESSION_RETRY_STATUSES)
+            if response.status_code != 404:
+                response.raise_for_status()
+                for message in payload if isinstance(payload, list) else [payload]:
+                    future = self._pending.get(message.get("id"))
+                    if future is None or future.done():
+                        continue
+                    if stream.done():
+                        # The stream ended while these were posted: no response can come
+                        future.set_exception(SessionClosed("Session stream closed"))
+                    else:
+                        self._owners[message["id"]] = stream
+                return
+            # The session is gone (server restart, or another worker): reconnect
+            # once. These calls weren't accepted, so they are resent, not failed
+            if self._stream is stream:
+                self._endpoint = None
+            stream.cancel()
+        response.raise_for_status()
+
+    async def _send_one_shot(self, payload: Any):
+        response = await self._retrying("POST", "/sse", json=payload)
+        response.raise_for_status()
+        async for _, data in sse_events(response.aiter_lines()):
+            self._dispatch(json.loads(data))
+        for message in payload if isinstance(payload, list) else [payload]:
+            future = self._pending.get(message.get("id"))
+            if future is not None and not future.done():
+                future.set_exception(MCPError(-32603, "No response for request"))
+
+    async def _retrying(self, method: str, url: str, retry_statuses: frozenset = RETRY_STATUSES,
+                        **kwargs) -> httpx.Response:
+        """Send a request, retrying with exponential backoff while it cannot have run"""
+        retry_errors = GET_RETRY_ERRORS if method == "GET" else RETRY_ERRORS
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+            try:
+                response = await self.http.request(method, url, **kwargs)
+            except retry_errors:
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in retry_statuses or attempt == self.retries:
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            await asyncio.sleep(delay)
+
+    async def _connect(self) -> str:
+        """Open the session stream if needed and return its message endpoint"""
+        if self._endpoint is not None and self._stream is not None and not self._stream.done():
+            return self._endpoint
+        if self._connecting is None:
+            self._connecting = asyncio.Lock()
+        async with self._connecting:
+            for attempt in range(self.retries + 1):
+                if self._endpoint is not None and self._stream is not None and not self._stream.done():
+                    break
+                ready = asyncio.get_running_loop().create_future()
+                self._stream = asyncio.create_task(self._read_session(ready))
+                try:
+                    self._endpoint = await asyncio.wait_for(ready, self.timeout)
+                except GET_RETRY_ERRORS:
+                    if attempt == self.retries:
+                        raise
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                        raise
+                else:
+                    break
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+        return self._endpoint
+
+    async def _read_session(self, ready: asyncio.Future):
+        error: Exception = SessionClosed("Session stream closed")
+        try:
+            async with self.http.stream("GET", "/sse", timeout=httpx.Timeout(self.timeout, read=None)) as response:
+                response.raise_for_status()
+                async for event, data in sse_events(response.aiter_lines()):
+                    if event == "endpoint":
+                        if not ready.done():
+                            ready.set_result(data)
+                    else:
+                        self._dispatch(json.loads(data))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            if self._stream is asyncio.current_task():
+                self._endpoint = None
+            if not ready.done():
+                ready.set_exception(error)
+            # Responses still owed on this stream will never arrive; calls
+            # being resent on a new session aren't among them
+            stream = asyncio.current_task()
+            for request_id, owner in list(self._owners.items()):
+                future = self._pending.get(request_id)
+                if owner is stream and future is not None and not future.done():
+                    future.set_exception(error)
+
+    def _dispatch(self, message: Any):
+        messages = message if isinstance(message, list) else [message]
+        for item in messages:
+            if not isinstance(item, dict) or "id" not in item:
+                continue
+            future = self._pending.get(item["id"])
+            if future is not None and not future.done():
+                future.set_result(item)
+
+    def _fail_pending(self, error: Exception):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+
+class MCPClient:
+    """Blocking client; runs an AsyncMCPClient on its own event loop thread
+
+    Safe to share between threads: concurrent calls are pipelined and
+    batched together.
+    """
+
+    def __init__(self, base_url: str, **options: Any):
+        self._runner = LoopRunner(name="mcp-client")
+        self._client = AsyncMCPClient(base_url, **options)
+
+    def __enter__(self) -> "MCPClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def request(self, method: str, params: Optional[dict] = None) -> Any:
+        return self._runner.submit(self._client.request(method, params))
+
+    def list_tools(self) -> list[dict]:
+        return self._runner.submit(self._client.list_tools())
+
+    def call_tool(self, name: str, arguments: Optional[dict] = None,
+                  timeout: Optional[float] = None) -> dict:
+        return self._runner.submit(self._client.call_tool(name, arguments, timeout))
+
+    def call_tool_text(self, name: str, arguments: Optional[dict] = None,
+                       timeout: Optional[float] = None) -> str:
+        return self._runner.submit(self._client.call_tool_text(name, arguments, timeout))
+
+    def call_tools(self, calls: list[tuple[str, Optional[dict]]]) -> list:
+        return self._runner.submit(self._client.call_tools(calls))
+
+    def stream_tool(self, name: str, arguments: Optional[dict] = None) -> Iterator[str]:
+        return self._runner.iterate(self._client.stream_tool(name, arguments))
+
+    def close(self):
+        self._runner.submit(self._client.close())
+        self._runner.stop()
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Transport-neutral MCP request handling
+Shared by the Flask SSE server and the ASGI server so both speak exactly
+the same JSON-RPC protocol
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Optional
+
+import resource_subscriptions
+import resources
+from metrics import JSON_ENCODE_SECONDS, RPC_ERRORS
+from serializer import dumps, text_content_result
+from tool_registry import CachedPayload, InvalidArgumentsError, ToolTimeout
+from tools import registry
+
+
+# Header carrying the seconds a client will wait for its request
+TIMEOUT_HEADER = 'X-MCP-Timeout'
+
+# JSON-RPC error for calls that outlive their deadline (as in the MCP SDKs)
+REQUEST_TIMEOUT = -32001
+
+# JSON-RPC error for resources/read of an unknown URI (MCP specification)
+RESOURCE_NOT_FOUND = -32002
+
+# Calls in flight on the current session by request id, so that
+# notifications/cancelled can abort them (None outside a session)
+in_flight: ContextVar[Optional[dict]] = ContextVar('in_flight', default=None)
+
+# Returned in place of a response for a request the client cancelled
+CANCELLED = object()
+
+
+SERVER_INFO = {
+    "name": "simple-mcp-server",
+    "version": "1.0.0",
+    "description": "A basic MCP server with utility tools"
+}
+
+HOME_INFO = {
+    "name": "Simple MCP Server",
+    "version": "1.0.0",
+    "description": "A basic MCP server with utility tools",
+    "protocol": "MCP with SSE transport",
+    "endpoints": {
+        "/": "Server information",
+        "/sse": "MCP SSE endpoint (GET opens a session stream, POST for one-shot requests)",
+        "/messages": "Session message endpoint (POST with ?session_id=)",
+        "/tools": "Tool catalogue (tools/list result, supports If-None-Match)",
+        "/metrics": "Prometheus metrics"
+    }
+}
+
+
+@lru_cache(maxsize=None)
+def mcp_server():
+    """MCP SDK server instance for the same tools, created on first use
+
+    The handlers below don't need the SDK, and importing it takes longer
+    than the rest of startup combined.
+    """
+    from mcp.server import Server
+    from mcp.types import Tool
+
+    server = Server("simple-mcp-server")
+    # Tool objects are built once from the shared catalogue
+    tool_objects = [Tool(**tool) for tool in registry.catalogue]
+
+    @server.list_tools()
+    async def list_tools() -> list[Tool]:
+        """List available tools"""
+        return tool_objects
+
+    server.call_tool()(call_tool)
+    return server
+
+
+async def call_tool(name: str, arguments: Any) -> list:
+    """Handle tool calls"""
+    from mcp.types import TextContent
+
+    text = await registry.call(name, arguments)
+    return [TextContent(type="text", text=text)]
+
+
+def content_result(text: str) -> CachedPayload:
+    """Serialized tools/call result for a tool returning text"""
+    return CachedPayload(body=text_content_result(text))
+
+
+def server_info_event() -> dict:
+    """Notification sent to clients that GET the SSE endpoint"""
+    return {
+        "jsonrpc": "2.0",
+        "method": "server/info",
+        "params": SERVER_INFO
+    }
+
+
+def health_info() -> dict:
+    """Health check payload"""
+    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+
+
+def request_deadline(timeout: Any) -> Optional[float]:
+    """Deadline (time.monotonic()) for a client's timeout in seconds, if it gave a valid one"""
+    try:
+        seconds = float(timeout)
+    except (TypeError, ValueError):
+        return None
+    if not seconds > 0:
+        return None
+    return time.monotonic() + seconds
+
+
+def message_deadline(data: dict, deadline: Optional[float]) -> Optional[float]:
+    """Tighten a request's deadline with a message's own params._meta.timeout"""
+    params = data.get('params')
+    meta = params.get('_meta') if isinstance(params, dict) else None
+    if not isinstance(meta, dict) or 'timeout' not in meta:
+        return deadline
+    own = request_deadline(meta['timeout'])
+    if own is None or deadline is None:
+        return own if deadline is None else deadline
+    return min(own, deadline)
+
+
+async def cancellable(request_id: Any, awaitable: Awaitable) -> Any:
+    """Await work that notifications/cancelled on the current session can abort
+
+    Returns CANCELLED if the client cancelled it. The work runs as its own
+    task, so cancelling it leaves the caller (e.g. the /messages request) running.
+    """
+    requests = in_flight.get()
+    if requests is None or request_id is None:
+        return await awaitable
+    task = asyncio.ensure_future(awaitable)
+    requests[request_id] = task
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if requests.get(request_id) is task:
+            # Cancelled from outside, not by the client's notification
+            raise
+        return CANCELLED
+    finally:
+        if requests.get(request_id) is task:
+            del requests[request_id]
+
+
+def cancel_request(request_id: Any):
+    """Abort a call in flight on the current session (notifications/cancelled)"""
+    requests = in_flight.get()
+    if requests is not None:
+        task = requests.pop(request_id, None)
+        if task is not None:
+            # Profiled calls run on a private loop in another thread
+            task.get_loop().call_soon_threadsafe(task.cancel)
+
+
+def error_response(request_id: Any, code: int, message: str) -> dict:
+    """Build a JSON-RPC error response"""
+    RPC_ERRORS.inc(str(code))
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {
+            "code": code,
+            "message": message
+        }
+    }
+
+
+async def handle_message(data: Any, deadline: Optional[float] = None) -> Optional[dict]:
+    """Handle a single JSON-RPC request and return its response
+
+    Returns None for a request the client cancelled; it gets no response.
+    """
+    if not isinstance(data, dict):
+        return error_response(None, -32600, "Invalid Request: expected a JSON-RPC object")
+    
+    if data.get('method') == 'notifications/cancelled':
+        params = data.get('params')
+        if isinstance(params, dict):
+            cancel_request(params.get('requestId'))
+        return None
+    
+    response = await cancellable(data.get('id'), dispatch_message(data, message_deadline(data, deadline)))
+    return None if response is CANCELLED else response
+
+
+async def dispatch_message(data: dict, deadline: Optional[float]) -> dict:
+    """Run a JSON-RPC request's method and build its response"""
+    request_id = data.get('id')
+    method = data.get('method', '')
+    params = data.get('params', {})
+    if not isinstance(params, dict):
+        return error_response(request_id, -32602, "Invalid params: params must be an object")
+    
+    try:
+        if method == 'tools/list':
+            # Served from the catalogue serialized at import
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": registry.tools_list
+            }
+        
+        elif method == 'tools/call':
+            tool_name = params.get('name')
+            arguments = params.get('arguments', {})
+            
+            # Cached results carry their serialized form, so a hit skips json.dumps
+            result = await registry.call_result(tool_name, arguments, deadline=deadline)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": result.derive(content_result)
+            }
+        
+        elif method == 'resources/list':
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": await list_resources()
+            }
+        
+        elif method == 'resources/read':
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": await read_resource(params)
+            }
+        
+        elif method in ('resources/subscribe', 'resources/unsubscribe'):
+            client = resource_subscriptions.subscriber.get()
+            if client is None:
+                return error_response(request_id, -32600, "Invalid Request: subscriptions need a session stream")
+            update_subscription(method, client, params)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {}
+            }
+        
+        else:
+            return error_response(request_id, -32601, f"Method not found: {method}")
+    
+    except resources.ResourceNotFound as e:
+        return error_response(request_id, RESOURCE_NOT_FOUND, f"Resource not found: {e.args[0]}")
+    except InvalidArgumentsError as e:
+        return error_response(request_id, -32602, f"Invalid params: {e}")
+    except ToolTimeout as e:
+        return error_response(request_id, REQUEST_TIMEOUT, str(e))
+    except Exception as e:
+        return error_response(request_id, -32603, str(e))
+
+
+async def list_resources() -> CachedPayload:
+    """The resources/list result; a rescan of the directory runs off the event loop"""
+    listing = resources.registry.cached_listing()
+    if listing is None:
+        listing = await asyncio.to_thread(resources.registry.listing)
+    return listing
+
+
+async def read_resource(params: dict) -> Any:
+    """The resources/read result; reads that need file I/O run off the event loop"""
+    uri = params.get('uri')
+    if not isinstance(uri, str):
+        raise InvalidArgumentsError("uri is required")
+    offset, length = resources.page_range(params)
+    result = resources.registry.read_cached(uri, offset, length)
+    if result is None:
+        result = await asyncio.to_thread(resources.registry.read, uri, offset, length)
+    return result
+
+
+def update_subscription(method: str, client: resource_subscriptions.Subscriber, params: dict):
+    """Start or stop notifications/resources/updated for a URI on a client's stream"""
+    uri = params.get('uri')
+    if not isinstance(uri, str):
+        raise InvalidArgumentsError("uri is required")
+    if method == 'resources/subscribe':
+        resource_subscriptions.hub.subscribe(client, uri)
+    else:
+        resource_subscriptions.hub.unsubscribe(client, uri)
+
+
+def encode_message(message: dict) -> bytes:
+    """Serialize a JSON-RPC message, splicing in pre-serialized results"""
+    start = time.perf_counter()
+    result = message.get('result')
+    if isinstance(result, CachedPayload):
+        encoded = b'{"jsonrpc":"2.0","id":' + dumps(message.get('id')) + b',"result":' + result.body + b'}'
+    else:
+        encoded = dumps(message)
+    JSON_ENCODE_SECONDS.observe(time.perf_counter() - start)
+    return encoded
+
+
+def sse_event(message: Any) -> bytes:
+    """Encode a JSON-RPC message (or take an encoded one) as a single SSE data frame"""
+    return b"data: " + (message if isinstance(message, bytes) else encode_message(message)) + b"\n\n"
+
+
+def is_tools_list(data: Any) -> bool:
+    """Whether a request body is a single tools/list call (eligible for ETags)"""
+    return isinstance(data, dict) and data.get('method') == 'tools/list'
+
+
+def expects_response(message: Any) -> bool:
+    """Whether a JSON-RPC message needs a response (notifications have no id)"""
+    return not (isinstance(message, dict) and 'id' not in message)
+
+
+async def handle_batch(batch: list, deadline: Optional[float] = None) -> AsyncIterator[dict]:
+    """Run batch entries concurrently and yield each response as it finishes"""
+    if not batch:
+        yield error_response(None, -32600, "Invalid Request: empty batch")
+        return
+    
+    async def run(message):
+        return message, await handle_message(message, deadline)
+    
+    tasks = [asyncio.ensure_future(run(message)) for message in batch]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            message, response = await next_done
+            if response is not None and expects_response(message):
+                yield response
+    finally:
+        # The consumer went away mid-batch; don't leave calls running
+        for task in tasks:
+            task.cancel()
+
+
+def stream_requested(data: Any) -> bool:
+    """Whether a request is a tools/call asking for streamed output (params._meta.stream)"""
+    if not isinstance(data, dict) or data.get('method') != 'tools/call':
+        return False
+    params = data.get('params')
+    meta = params.get('_meta') if isinstance(params, dict) else None
+    return isinstance(meta, dict) and meta.get('stream') is True
+
+
+async def handle_streaming_call(data: dict, deadline: Optional[float] = None) -> AsyncIterator[dict]:
+    """Run a tools/call, sending each output chunk as a progress notification
+
+    Chunks go out as notifications/progress messages whose `message` is the
+    chunk text; the final response has empty content and reports how many
+    chunks were sent. Memory stays bounded by the chunk size. A cancelled
+    call stops without a final response.
+    """
+    request_id = data.get('id')
+    params = data.get('params') or {}
+    token = params['_meta'].get('progressToken', request_id)
+    stream = registry.stream(params.get('name'), params.get('arguments', {}),
+                             deadline=message_deadline(data, deadline))
+    chunks = 0
+    
+    try:
+        # Each chunk is awaited as cancellable work, so a cancellation
+        # interrupts the tool rather than waiting for its next chunk
+        while (chunk := await cancellable(request_id, anext(stream, None))) is not None:
+            if chunk is CANCELLED:
+                return
+            chunks += 1
+            yield {
+                "jsonrpc": "2.0",
+                "method": "notifications/progress",
+                "params": {
+                    "progressToken": token,
+                    "progress": chunks,
+                    "message": chunk
+                }
+            }
+    except InvalidArgumentsError as e:
+        yield error_response(request_id, -32602, f"Invalid params: {e}")
+        return
+    except ToolTimeout as e:
+        yield error_response(request_id, REQUEST_TIMEOUT, str(e))
+        return
+    except Exception as e:
+        yield error_response(request_id, -32603, str(e))
+        return
+    finally:
+        await stream.aclose()
+    
+    yield {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "result": {
+            "content": [],
+            "_meta": {"streamed": True, "chunks": chunks}
+        }
+    }
+
+
+async def handle_payload(data: Any, deadline: Optional[float] = None) -> AsyncIterator[dict]:
+    """Yield the responses for a request body, which may be a batch array
+
+    deadline (a time.monotonic() value) bounds every tool call in the body.
+    """
+    if isinstance(data, list):
+        async for response in handle_batch(data, deadline):
+            yield response
+    elif stream_requested(data):
+        async for message in handle_streaming_call(data, deadline):
+            yield message
+    else:
+        response = await handle_message(data, deadline)
+        if response is not None:
+            yield response
@@ -5,276 +5,188 @@ This server is compatible with MCP gateways and clients
 """
 
 from flask import Flask, request, Response
-from datetime import datetime
-import json
-import asyncio
-from typing import Any
 
-from mcp.server import Server
-from mcp.types import (
-    Tool,
-    TextContent,
+from flask_support import (
+    cached_response,
+    install_admission,
+    install_compression,
+    install_json_provider,
+    install_metrics,
+    install_session_routing,
+    read_json,
 )
+from loop_runner import iterate_async, run_coroutine
+from metrics import SSE_STREAMS
+from profiling import PROFILE_HEADER, profiler
+from mcp_protocol import (
+    HOME_INFO,
+    TIMEOUT_HEADER,
+    error_response,
+    expects_response,
+    health_info,
+    is_tools_list,
+    request_deadline,
+    server_info_event,
+    sse_event,
+)
+from sessions import (
+    KEEPALIVE_COMMENT,
+    SessionBusy,
+    SessionManager,
+    SessionNotFound,
+    endpoint_event,
+)
+from admission import OVERLOADED_CODE, RATE_LIMITED_CODE, Overloaded, RateLimited
+from request_limits import BodyTooLarge
+from session_routing import SESSION_DIR, SessionRouter
+from tools import registry
 
 app = Flask(__name__)
+install_json_provider(app)
+install_metrics(app)
+install_compression(app)
+# Tool calls posted to a session's /messages take their slot in the view,
+# since it is held until the calls finish, after the 202
+concurrency = install_admission(app, rate_limited={'/sse', '/messages'}, slot_paths={'/sse'})
+
+# Open session streams in this worker process, found by the other workers
+# through MCP_SESSION_DIR when set
+sessions = SessionManager(SessionRouter() if SESSION_DIR else None)
+install_session_routing(app, sessions, '/messages', ('Content-Type', TIMEOUT_HEADER, PROFILE_HEADER))
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',
+    'Connection': 'keep-alive'
+}
 
-# Create MCP server instance
-mcp_server = Server("simple-mcp-server")
 
+@app.errorhandler(BodyTooLarge)
+def body_too_large(e):
+    """Reject oversized requests before they are read in full"""
+    return error_response(None, -32600, str(e)), 413
 
-@mcp_server.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available tools"""
-    return [
-        Tool(
-            name="echo",
-            description="Echoes back the input text",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "The text to echo back"
-                    }
-                },
-                "required": ["text"]
-            }
-        ),
-        Tool(
-            name="get_current_time",
-            description="Returns the current server time",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "timezone": {
-                        "type": "string",
-                        "description": "Timezone (optional, defaults to UTC)",
-                        "default": "UTC"
-                    }
-                }
-            }
-        ),
-        Tool(
-            name="calculate",
-            description="Performs basic arithmetic operations",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "operation": {
-                        "type": "string",
-                        "enum": ["add", "subtract", "multiply", "divide"],
-                        "description": "The operation to perform"
-                    },
-                    "a": {
-                        "type": "number",
-                        "description": "First number"
-                    },
-                    "b": {
-                        "type": "number",
-                        "description": "Second number"
-                    }
-                },
-                "required": ["operation", "a", "b"]
-            }
-        ),
-        Tool(
-            name="reverse_text",
-            description="Reverses the input text",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "The text to reverse"
-                    }
-                },
-                "required": ["text"]
-            }
-        )
-    ]
 
+@app.errorhandler(RateLimited)
+def rate_limited(e):
+    """Turn away a client that is over its request rate"""
+    return error_response(None, RATE_LIMITED_CODE, str(e)), 429, {'Retry-After': e.retry_after_header}
 
-@mcp_server.call_tool()
-async def call_tool(name: str, arguments: Any) -> list[TextContent]:
-    """Handle tool calls"""
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    """Turn away a tool call when no slot frees up in time"""
+    return error_response(None, OVERLOADED_CODE, str(e)), 503, {'Retry-After': e.retry_after_header}
+
+
+@app.route('/sse', methods=['GET', 'POST'])
+def sse_endpoint():
+    """SSE endpoint for MCP protocol"""
     
-    if name == "echo":
-        text = arguments.get("text", "")
-        return [TextContent(type="text", text=f"Echo: {text}")]
+    if request.method == 'GET':
+        return session_stream()
     
-    elif name == "get_current_time":
-        current_time = datetime.now().isoformat()
-        return [TextContent(
-            type="text",
-            text=f"Current server time: {current_time}"
-        )]
+    # Read the request up front; the generator runs after the request
+    # context has been torn down
+    body = read_json()
     
-    elif name == "calculate":
-        operation = arguments.get("operation")
-        a = arguments.get("a")
-        b = arguments.get("b")
-        
+    if is_tools_list(body):
+        # The catalogue never changes at runtime, so polling gateways can
+        # revalidate with If-None-Match instead of re-downloading it
+        tools_list = registry.tools_list
+        event = sse_event({'id': body.get('id'), 'result': tools_list})
+        return cached_response(tools_list, mimetype='text/event-stream',
+                               headers=SSE_HEADERS, body=event)
+    
+    handler = profiler.payload_handler(request.headers.get(PROFILE_HEADER), body)
+    deadline = request_deadline(request.headers.get(TIMEOUT_HEADER))
+    
+    def generate():
+        """Generate SSE events"""
+        SSE_STREAMS.inc('request')
         try:
-            if operation == "add":
-                result = a + b
-            elif operation == "subtract":
-                result = a - b
-            elif operation == "multiply":
-                result = a * b
-            elif operation == "divide":
-                if b == 0:
-                    return [TextContent(type="text", text="Error: Division by zero")]
-                result = a / b
-            else:
-                return [TextContent(type="text", text=f"Unknown operation: {operation}")]
-            
-            return [TextContent(
-                type="text",
-                text=f"Result: {a} {operation} {b} = {result}"
-            )]
+            # Handle the MCP request (or batch) on the shared worker loop,
+            # streaming each response as soon as it is ready
+            for response in iterate_async(handler(body, deadline)):
+                yield sse_event(response)
+        
         except Exception as e:
-            return [TextContent(type="text", text=f"Error: {str(e)}")]
-    
-    elif name == "reverse_text":
-        text = arguments.get("text", "")
-        reversed_text = text[::-1]
-        return [TextContent(
-            type="text",
-            text=f"Reversed: {reversed_text}"
-        )]
+            yield sse_event(error_response(None, -32603, str(e)))
+        finally:
+            SSE_STREAMS.dec('request')
     
-    else:
-        raise ValueError(f"Unknown tool: {name}")
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
 
 
-@app.route('/sse', methods=['GET', 'POST'])
-def sse_endpoint():
-    """SSE endpoint for MCP protocol"""
+def session_stream():
+    """Open a long-lived session stream (GET /sse)"""
+    session = sessions.create()
     
     def generate():
-        """Generate SSE events"""
+        """Send the endpoint and server info, then queued responses"""
+        SSE_STREAMS.inc('session')
         try:
-            if request.method == 'POST':
-                # Handle MCP request
-                data = request.get_json()
-                
-                # Process based on method
-                method = data.get('method', '')
-                
-                if method == 'tools/list':
-                    # List tools
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    tools = loop.run_until_complete(list_tools())
-                    loop.close()
-                    
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": data.get('id'),
-                        "result": {
-                            "tools": [
-                                {
-                                    "name": tool.name,
-                                    "description": tool.description,
-                                    "inputSchema": tool.inputSchema
-                                }
-                                for tool in tools
-                            ]
-                        }
-                    }
-                    yield f"data: {json.dumps(response)}\n\n"
-                
-                elif method == 'tools/call':
-                    # Call tool
-                    params = data.get('params', {})
-                    tool_name = params.get('name')
-                    arguments = params.get('arguments', {})
-                    
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    result = loop.run_until_complete(call_tool(tool_name, arguments))
-                    loop.close()
-                    
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": data.get('id'),
-                        "result": {
-                            "content": [
-                                {
-                                    "type": content.type,
-                                    "text": content.text
-                                }
-                                for content in result
-                            ]
-                        }
-                    }
-                    yield f"data: {json.dumps(response)}\n\n"
-                
+            yield endpoint_event(session)
+            yield sse_event(server_info_event())
+            while not session.closed:
+                event = run_coroutine(session.next_event())
+                if event is None:
+                    yield KEEPALIVE_COMMENT
                 else:
-                    # Unknown method
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": data.get('id'),
-                        "error": {
-                            "code": -32601,
-                            "message": f"Method not found: {method}"
-                        }
-                    }
-                    yield f"data: {json.dumps(response)}\n\n"
-            
-            else:
-                # GET request - send server info
-                info = {
-                    "jsonrpc": "2.0",
-                    "method": "server/info",
-                    "params": {
-                        "name": "simple-mcp-server",
-                        "version": "1.0.0",
-                        "description": "A basic MCP server with utility tools"
-                    }
-                }
-                yield f"data: {json.dumps(info)}\n\n"
-        
-        except Exception as e:
-            error_response = {
-                "jsonrpc": "2.0",
-                "error": {
-                    "code": -32603,
-                    "message": str(e)
-                }
-            }
-            yield f"data: {json.dumps(error_response)}\n\n"
+                    yield sse_event(event)
+        finally:
+            # Runs when the client disconnects and the server closes the generator
+            sessions.remove(session.id)
+            SSE_STREAMS.dec('session')
     
-    return Response(
-        generate(),
-        mimetype='text/event-stream',
-        headers={
-            'Cache-Control': 'no-cache',
-            'X-Accel-Buffering': 'no',
-            'Connection': 'keep-alive'
-        }
-    )
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+
+@app.route('/messages', methods=['POST'])
+def messages():
+    """Accept a JSON-RPC message for an open session stream; its responses go to the stream"""
+    session_id = request.args.get('session_id')
+    data = read_json()
+    
+    try:
+        session = sessions.get(session_id)
+        handler = profiler.payload_handler(request.headers.get(PROFILE_HEADER), data)
+        deadline = request_deadline(request.headers.get(TIMEOUT_HEADER))
+        release = None
+        if expects_response(data):
+            # Raises Overloaded for the error handler
+            concurrency.acquire()
+            release = concurrency.release
+        try:
+            run_coroutine(session.accept(data, handler, deadline, on_done=release))
+        except BaseException:
+            if release is not None:
+                release()
+            raise
+    except SessionNotFound:
+        return {"error": f"Unknown session: {session_id}"}, 404
+    except SessionBusy as e:
+        return {"error": str(e)}, 503
+    
+    return {"status": "accepted"}, 202
+
+
+@app.route('/tools')
+def tools():
+    """Tool catalogue (the tools/list result) with ETag revalidation"""
+    return cached_response(registry.tools_list)
 
 
 @app.route('/')
 def home():
     """Home endpoint with server information"""
-    return {
-        "name": "Simple MCP Server",
-        "version": "1.0.0",
-        "description": "A basic MCP server with utility tools",
-        "protocol": "MCP with SSE transport",
-        "endpoints": {
-            "/": "Server information",
-            "/sse": "MCP SSE endpoint (GET for info, POST for requests)"
-        }
-    }
+    return HOME_INFO
 
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return health_info()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style metrics for the server front-ends
+Each thread records into its own shard, so the hot path is a thread-local
+dict update with no lock; shards are summed only when /metrics is scraped.
+With MCP_METRICS_DIR set, every worker process also writes its totals to a
+file in that directory and a scrape of any worker reports the sum of all;
+the counters of exited workers are folded into one retired file, so totals
+never go backwards
+"""
+
+import atexit
+import fcntl
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from serializer import dumps, loads
+
+
+# Directory shared by gunicorn workers for aggregated metrics (unset: per process)
+METRICS_DIR = os.environ.get('MCP_METRICS_DIR')
+
+# Seconds between writes of this worker's totals to METRICS_DIR
+FLUSH_INTERVAL = float(os.environ.get('MCP_METRICS_FLUSH_INTERVAL', 5))
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Shard:
+    """One thread's metric values, keyed on (metric name, label values)"""
+
+    __slots__ = ("thread", "values", "histograms")
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.values: dict[tuple, float] = {}
+        # Per-bucket counts (the last one is +Inf) followed by the sum
+        self.histograms: dict[tuple, list] = {}
+
+    def merge(self, values: dict, histograms: dict):
+        for key, value in values.items():
+            self.values[key] = self.values.get(key, 0) + value
+        for key, counts in histograms.items():
+            mine = self.histograms.get(key)
+            if mine is None:
+                self.histograms[key] = list(counts)
+            else:
+                for i, count in enumerate(counts):
+                    mine[i] += count
+
+
+_local = threading.local()
+_shards: list[Shard] = []
+# Totals of threads that have exited
+_retired = Shard()
+_shards_lock = threading.Lock()
+
+
+def _shard() -> Shard:
+    """Create the calling thread's shard (recording reads its dicts from _local directly)"""
+    flusher.start()
+    shard = Shard()
+    _local.values = shard.values
+    _local.histograms = shard.histograms
+    with _shards_lock:
+        _retire_dead_shards()
+        _shards.append(shard)
+    return shard
+
+
+def _retire_dead_shards():
+    # Request threads come and go; fold finished ones into one shard so
+    # the list stays as long as the number of live threads
+    for shard in [s for s in _shards if not s.thread.is_alive()]:
+        _shards.remove(shard)
+        _retired.merge(shard.values, shard.histograms)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        METRICS[name] = self
+
+
+class Counter(Metric):
+    """A monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        try:
+            values = _local.values
+        except AttributeError:
+            values = _shard().values
+        key = (self.name, labels)
+        values[key] = values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. open streams
+
+    Live values are summed across threads (one thread may open what another
+    closes); values from exited worker processes are dropped.
+    """
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels: str) -> Iterator[None]:
+        """Count the body of a with block as in progress"""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(Metric):
+    """A distribution of observed values (latencies) in fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels: str):
+        try:
+            histograms = _local.histograms
+        except AttributeError:
+            histograms = _shard().histograms
+        key = (self.name, labels)
+        counts = histograms.get(key)
+        if counts is None:
+            counts = histograms[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """Observe the duration of a with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+
+METRICS: dict[str, Metric] = {}
+
+REQUESTS = Counter(
+    "mcp_http_requests_total", "HTTP requests by endpoint and status code", ("endpoint", "status"))
+RPC_ERRORS = Counter(
+    "mcp_jsonrpc_errors_total", "JSON-RPC error responses by error code", ("code",))
+SSE_STREAMS = Gauge(
+    "mcp_sse_streams_in_flight", "Open SSE response streams", ("kind",))
+TOOL_CALL_SECONDS = Histogram(
+    "mcp_tool_call_seconds", "Tool call dispatch time, including cache hits", ("tool",))
+TOOL_CACHE_LOOKUPS = Counter(
+    "mcp_tool_cache_lookups_total", "Result cache lookups for cacheable tools", ("tool", "result"))
+TOOL_CACHE_EVICTIONS = Counter(
+    "mcp_tool_cache_evictions_total", "Results evicted from a full result cache")
+JSON_ENCODE_SECONDS = Histogram(
+    "mcp_json_encode_seconds", "Time spent serializing response messages")
+ADMISSION_REJECTED = Counter(
+    "mcp_admission_rejected_total", "Requests turned away by admission control", ("reason",))
+QUEUE_WAIT_SECONDS = Histogram(
+    "mcp_queue_wait_seconds", "Time work waited in a queue before being picked up", ("queue",))
+SESSION_MESSAGES_ROUTED = Counter(
+    "mcp_session_messages_routed_total", "Session messages passed to the worker holding the stream", ("status",))
+RESOURCE_NOTIFICATIONS = Counter(
+    "mcp_resource_notifications_total", "Resource update notifications by outcome", ("status",))
+
+
+def snapshot() -> tuple[dict, dict]:
+    """This process's totals across all threads"""
+    total = Shard()
+    with _shards_lock:
+        _retire_dead_shards()
+        total.merge(_retired.values, _retired.histograms)
+        for shard in _shards:
+            # dict.copy() is atomic under the GIL, so writers need no lock
+            total.merge(shard.values.copy(),
+                        {key: list(counts) for key, counts in shard.histograms.copy().items()})
+    return total.values, total.histograms
+
+
+# Totals of the workers that have exited, in METRICS_DIR
+RETIRED_FILE = "metrics-retired.json"
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"metrics-{pid}.json")
+
+
+def _write_totals(path: str, values: dict, histograms: dict):
+    with open(path + ".tmp", "wb") as f:
+        f.write(dumps({
+            "values": [[name, list(labels), value] for (name, labels), value in values.items()],
+            "histograms": [[name, list(labels), counts] for (name, labels), counts in histograms.items()],
+        }))
+    os.replace(path + ".tmp", path)
+
+
+def _read_totals(path: str) -> Optional[tuple[dict, dict]]:
+    try:
+        with open(path, "rb") as f:
+            data = loads(f.read())
+    except (OSError, ValueError):
+        return None
+    return ({(name, tuple(labels)): value for name, labels, value in data["values"] if name in METRICS},
+            {(name, tuple(labels)): counts for name, labels, counts in data["histograms"] if name in METRICS})
+
+
+def write_snapshot():
+    """Write this worker's totals to METRICS_DIR (atomically)"""
+    flusher.start()
+    _write_totals(_snapshot_path(os.getpid()), *snapshot())
+
+
+@contextmanager
+def _directory_lock() -> Iterator[None]:
+    """Serialize retiring and summing the files in METRICS_DIR across processes"""
+    fd = os.open(os.path.join(METRICS_DIR, "metrics.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _retire(pid: int):
+    # Holding the directory lock
+    path = _snapshot_path(pid)
+    worker = _read_totals(path)
+    if worker is None:
+        return
+    total = Shard()
+    retired = _read_totals(os.path.join(METRICS_DIR, RETIRED_FILE))
+    if retired is not None:
+        total.merge(*retired)
+    values, histograms = worker
+    # An exited worker's gauges no longer hold
+    total.merge({key: value for key, value in values.items() if METRICS[key[0]].kind != "gauge"}, histograms)
+    _write_totals(os.path.join(METRICS_DIR, RETIRED_FILE), total.values, total.histograms)
+    os.unlink(path)
+
+
+def mark_process_dead(pid: int):
+    """Fold an exited worker's counters into the retired totals and remove its file
+
+    Called by the process supervisor (gunicorn.conf.py's child_exit hook,
+    prefork_server); scrapes also retire workers that are no longer running.
+    """
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with _directory_lock():
+        _retire(pid)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _worker_pids() -> list[int]:
+    pids = []
+    for filename in os.listdir(METRICS_DIR):
+        number = filename[len("metrics-"):-len(".json")]
+        if filename.startswith("metrics-") and filename.endswith(".json") and number.isdigit():
+            pids.append(int(number))
+    return pids
+
+
+def aggregate() -> tuple[dict, dict]:
+    """Totals across every worker that has written to METRICS_DIR, running or exited"""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    write_snapshot()
+    total = Shard()
+    with _directory_lock():
+        # Retired first, so no worker's counts are missed or summed twice
+        for pid in _worker_pids():
+            if not _pid_alive(pid):
+                _retire(pid)
+        for path in [os.path.join(METRICS_DIR, RETIRED_FILE)] + [_snapshot_path(pid) for pid in _worker_pids()]:
+            totals = _read_totals(path)
+            if totals is not None:
+                total.merge(*totals)
+    return total.values, total.histograms
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(metric: Metric, labels: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(metric.labels, labels)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render() -> bytes:
+    """All metrics in the Prometheus text exposition format"""
+    values, histograms = aggregate() if METRICS_DIR else snapshot()
+    lines = []
+    for metric in METRICS.values():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if isinstance(metric, Histogram):
+            for (name, labels), counts in sorted(histograms.items()):
+                if name != metric.name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                    lines.append(f"{name}_bucket{_label_text(metric, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(metric, labels)} {counts[-1]}")
+                lines.append(f"{name}_count{_label_text(metric, labels)} {cumulative}")
+        else:
+            for (name, labels), value in sorted(values.items()):
+                if name == metric.name:
+                    lines.append(f"{name}{_label_text(metric, labels)} {value}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+class _Flusher:
+    """Background thread writing this worker's totals to METRICS_DIR"""
+
+    def __init__(self):
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Started per worker: gunicorn forks after import
+        if not METRICS_DIR or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            # A file under our pid is left by an earlier process that had it
+            mark_process_dead(self._pid)
+            threading.Thread(target=self._run, name="metrics-flush", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                write_snapshot()
+            except OSError:
+                pass
+
+
+flusher = _Flusher()
+
+
+@atexit.register
+def _final_flush():
+    if METRICS_DIR and flusher._pid == os.getpid():
+        write_snapshot()
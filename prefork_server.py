@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Pre-fork supervisor for the MCP SSE server
+Loads mcp_sse_server once, forks --workers processes and restarts any
+that exit. Each worker listens on the port through its own SO_REUSEPORT
+socket, so the kernel spreads connections across them, and session
+messages reaching the wrong worker are routed to the one holding the
+stream (see session_routing)
+
+    python prefork_server.py --workers 4 --port 8000
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+
+# Worker processes (default: one per CPU)
+WORKERS = int(os.environ.get('MCP_WORKERS', 0)) or os.cpu_count() or 1
+
+# Seconds a worker must run before its exit is treated as a crash and
+# its replacement is delayed
+RESTART_BACKOFF = 1.0
+
+
+def listen_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    """A listening TCP socket; with reuse_port, one of several on the same port"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((host, port))
+        sock.listen(socket.SOMAXCONN)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def run_worker(host: str, port: int, shared: Optional[socket.socket]):
+    """Serve the app in this (forked) process until SIGTERM"""
+    from werkzeug.serving import make_server
+
+    from mcp_sse_server import app, sessions
+    from session_routing import QuietRequestHandler
+
+    # The supervisor handles Ctrl-C and tells the workers to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sock = shared or listen_socket(host, port, reuse_port=True)
+    server = make_server(host, port, app, threaded=True, request_handler=QuietRequestHandler,
+                         fd=sock.fileno())
+    sock.close()
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever(), which runs in this thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    server.serve_forever()
+    server.server_close()
+    if sessions.router is not None:
+        sessions.router.close()
+
+
+def spawn(host: str, port: int, shared: Optional[socket.socket]) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(host, port, shared)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stderr.flush()
+            os._exit(code)
+    return pid
+
+
+def supervise(host: str, port: int, workers: int):
+    """Fork the workers, replace any that exit, and stop them all on SIGTERM or SIGINT"""
+    # Loaded before forking, so the workers share its memory and start at once
+    import mcp_sse_server  # noqa: F401
+    import metrics
+
+    reuse_port = hasattr(socket, 'SO_REUSEPORT')
+    # Without SO_REUSEPORT the workers accept from one inherited socket
+    shared = None if reuse_port else listen_socket(host, port, reuse_port=False)
+    if reuse_port:
+        # Fail here rather than in every worker if the port is taken
+        listen_socket(host, port, reuse_port=True).close()
+
+    children: dict[int, float] = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        children[spawn(host, port, shared)] = time.monotonic()
+    print(f"Serving on {host}:{port} with {workers} workers "
+          f"({'SO_REUSEPORT' if reuse_port else 'shared socket'})", file=sys.stderr)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        metrics.mark_process_dead(pid)
+        if started is None or stopping:
+            continue
+        print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting",
+              file=sys.stderr)
+        if time.monotonic() - started < RESTART_BACKOFF:
+            time.sleep(RESTART_BACKOFF)
+        if not stopping:
+            children[spawn(host, port, shared)] = time.monotonic()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    # Session routing needs a directory the workers share; a fresh one per run
+    # unless MCP_SESSION_DIR names one
+    session_dir = None
+    if not os.environ.get('MCP_SESSION_DIR'):
+        session_dir = tempfile.mkdtemp(prefix='mcp-sessions-')
+        os.environ['MCP_SESSION_DIR'] = session_dir
+    try:
+        supervise(args.host, args.port, args.workers)
+    finally:
+        if session_dir is not None:
+            shutil.rmtree(session_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
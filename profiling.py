@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-request profiling
+With MCP_PROFILE_DIR set, a request carrying the X-MCP-Profile header (or
+calling a tool listed in MCP_PROFILE_TOOLS) runs under cProfile and leaves
+a .prof file (pstats) and a .collapsed file (flamegraph.pl / speedscope) in
+that directory. Profiles are capped per minute; other requests pay one
+header lookup
+"""
+
+import asyncio
+import cProfile
+import itertools
+import os
+import pstats
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Optional
+
+from mcp_protocol import handle_payload
+
+
+# Directory profiles are written to (unset: profiling disabled)
+PROFILE_DIR = os.environ.get('MCP_PROFILE_DIR')
+
+# Tools whose calls are always profiled, e.g. "reverse_text,calculate"
+PROFILE_TOOLS = frozenset(t.strip() for t in os.environ.get('MCP_PROFILE_TOOLS', '').split(',') if t.strip())
+
+# Value the X-MCP-Profile header must carry (unset: any non-empty value)
+PROFILE_TOKEN = os.environ.get('MCP_PROFILE_TOKEN')
+
+# Most profiles written per minute per worker process
+PROFILE_RATE = int(os.environ.get('MCP_PROFILE_RATE', 6))
+
+PROFILE_HEADER = 'X-MCP-Profile'
+
+# Deepest call stack and most stacks written to .collapsed files
+MAX_STACK_DEPTH = 64
+MAX_STACKS = 20000
+
+
+def called_tools(data: Any) -> set:
+    """Names of the tools a JSON-RPC payload calls"""
+    messages = data if isinstance(data, list) else (data,)
+    tools = set()
+    for message in messages:
+        if isinstance(message, dict) and message.get('method') == 'tools/call':
+            params = message.get('params')
+            if isinstance(params, dict) and isinstance(params.get('name'), str):
+                tools.add(params['name'])
+    return tools
+
+
+class Profiler:
+    """Decides which requests to profile and writes their profiles"""
+
+    def __init__(self, directory: Optional[str] = PROFILE_DIR, tools: frozenset = PROFILE_TOOLS,
+                 token: Optional[str] = PROFILE_TOKEN, rate: int = PROFILE_RATE):
+        self.directory = directory
+        self.tools = tools
+        self.token = token
+        self.rate = rate
+        self._recent: deque = deque()
+        self._lock = threading.Lock()
+        # One profile at a time: cProfile can't nest, and on Python 3.12+
+        # it observes every thread
+        self._active = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def wanted(self, header: Optional[str], data: Any = None, tool: Optional[str] = None) -> bool:
+        """Whether to profile a request, given its X-MCP-Profile header and
+        either its JSON-RPC payload or the tool its endpoint serves
+
+        Counts against the rate cap when it returns True.
+        """
+        if not self.directory:
+            return False
+        if header:
+            requested = self.token is None or header == self.token
+        elif self.tools:
+            requested = tool in self.tools if tool is not None else not self.tools.isdisjoint(called_tools(data))
+        else:
+            return False
+        return requested and self._allow()
+
+    def payload_handler(self, header: Optional[str], data: Any) -> Callable[..., AsyncIterator[dict]]:
+        """handle_payload, or a profiled equivalent if this request is to be profiled"""
+        if self.wanted(header, data):
+            return lambda payload, deadline=None: self.profiled_payload(payload, payload_label(payload), deadline)
+        return handle_payload
+
+    def _allow(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and self._recent[0] < now - 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.rate:
+                return False
+            self._recent.append(now)
+            return True
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """Start profiling the calling thread; None if another profile is running"""
+        if not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, profile: cProfile.Profile, label: str) -> str:
+        """Stop a profile from start() and save it; returns the .prof path"""
+        profile.disable()
+        self._active.release()
+        return self.save(profile, label)
+
+    def save(self, profile: cProfile.Profile, label: str) -> str:
+        """Write a finished profile as .prof and .collapsed files; returns the .prof path"""
+        os.makedirs(self.directory, exist_ok=True)
+        label = re.sub(r'[^A-Za-z0-9_.+-]', '_', label)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._sequence)}-{label}"
+        path = os.path.join(self.directory, name)
+        stats = pstats.Stats(profile)
+        stats.dump_stats(path + ".prof")
+        with open(path + ".collapsed", "w") as f:
+            f.writelines(f"{stack} {weight}\n" for stack, weight in collapsed_stacks(stats))
+        return path + ".prof"
+
+    def profile_payload(self, data: Any, label: str, deadline: Optional[float] = None) -> list:
+        """Handle a JSON-RPC payload on a private event loop under cProfile
+
+        Runs in the calling thread, so the shared worker loop and other
+        requests stay out of the profile. Tool handlers on the thread or
+        process pool show up only as time spent waiting for them.
+        """
+        async def collect():
+            return [response async for response in handle_payload(data, deadline)]
+
+        loop = asyncio.new_event_loop()
+        try:
+            profile = self.start()
+            try:
+                responses = loop.run_until_complete(collect())
+            finally:
+                if profile is not None:
+                    self.finish(profile, label)
+        finally:
+            loop.close()
+        return responses
+
+    async def profiled_payload(self, data: Any, label: str,
+                               deadline: Optional[float] = None) -> AsyncIterator[dict]:
+        """profile_payload as a drop-in for handle_payload on the worker loop"""
+        for response in await asyncio.to_thread(self.profile_payload, data, label, deadline):
+            yield response
+
+
+def payload_label(data: Any) -> str:
+    """File name label for a profiled payload: the tool(s) called, or the method"""
+    tools = called_tools(data)
+    if tools:
+        return "+".join(sorted(tools))
+    if isinstance(data, dict) and isinstance(data.get('method'), str):
+        return data['method']
+    return "batch" if isinstance(data, list) else "request"
+
+
+def collapsed_stacks(stats: pstats.Stats) -> list[tuple[str, int]]:
+    """Turn a cProfile call graph into "caller;callee;... microseconds" lines
+
+    cProfile records caller/callee pairs, not whole stacks, so each
+    function's time is split over its callers in proportion to the time
+    spent under each: exact for tree-shaped call graphs, an approximation
+    where functions are shared.
+    """
+    entries = stats.stats
+    callees: dict = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((func, cumulative))
+
+    def frame(func) -> str:
+        filename, line, name = func
+        if filename == '~':
+            return name
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    weights: dict[str, float] = {}
+
+    def walk(func, stack: tuple, on_stack: frozenset, seconds: float):
+        _, _, self_time, cumulative, _ = entries[func]
+        # Shared functions multiply the paths; drop sub-microsecond branches
+        if cumulative <= 0 or seconds < 1e-6 or len(weights) >= MAX_STACKS:
+            return
+        scale = min(1.0, seconds / cumulative)
+        stack = stack + (frame(func),)
+        path = ";".join(stack)
+        weights[path] = weights.get(path, 0) + self_time * scale
+        if len(stack) >= MAX_STACK_DEPTH:
+            return
+        for callee, callee_seconds in callees.get(func, ()):
+            if callee not in on_stack:
+                walk(callee, stack, on_stack | {callee}, callee_seconds * scale)
+
+    for func, (_, _, _, cumulative, callers) in entries.items():
+        if not callers:
+            walk(func, (), frozenset((func,)), cumulative)
+
+    return [(path, round(seconds * 1e6)) for path, seconds in weights.items() if seconds * 1e6 >= 1]
+
+
+profiler = Profiler()
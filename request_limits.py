@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Request body limits for the HTTP front-ends
+Bodies are checked against Content-Length before anything is read, then
+counted as they arrive into a single buffer that is parsed in place and
+dropped, so a large string argument ends up held once, as the parsed str
+"""
+
+import os
+from typing import Any, BinaryIO, Iterable, Optional
+
+
+# Largest request body accepted by any endpoint (bytes)
+MAX_BODY_SIZE = int(os.environ.get('MCP_MAX_BODY_SIZE', 10 * 1024 * 1024))
+
+# Bytes read from a WSGI input stream at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def endpoint_limits() -> dict[str, int]:
+    """Per-path limits from MCP_BODY_LIMITS, e.g. "/messages=1048576,/tools/reverse=2097152" """
+    limits = {}
+    for item in os.environ.get('MCP_BODY_LIMITS', '').split(','):
+        if not item.strip():
+            continue
+        path, _, size = item.partition('=')
+        try:
+            limits[path.strip()] = int(size)
+        except ValueError:
+            raise ValueError(f"Invalid body limit for {path.strip()}: {size!r}") from None
+    return limits
+
+
+ENDPOINT_LIMITS = endpoint_limits()
+
+
+class BodyTooLarge(ValueError):
+    """Raised when a request body exceeds the limit for its endpoint or tool"""
+
+    def __init__(self, size: int, limit: int):
+        super().__init__(f"Request body too large: {size} bytes exceeds the limit of {limit}")
+        self.size = size
+        self.limit = limit
+
+
+def body_limit(path: str, tool: Optional[str] = None) -> int:
+    """The body limit for an endpoint, tightened by the tool it serves if any"""
+    limit = ENDPOINT_LIMITS.get(path, MAX_BODY_SIZE)
+    if tool is None:
+        return limit
+    # Imported here so stdio_transport can use the limits without loading the tools
+    from tools import registry
+
+    if registry.get(tool).max_body is not None:
+        limit = min(limit, registry.get(tool).max_body)
+    return limit
+
+
+class BodyReader:
+    """Collects a request body into one buffer, enforcing a size limit as it arrives"""
+
+    def __init__(self, limit: int, content_length: Optional[int] = None):
+        if content_length is not None and content_length > limit:
+            raise BodyTooLarge(content_length, limit)
+        self.limit = limit
+        self.size = 0
+        # Sized up front when the length is declared, so the body is never re-copied
+        self.buffer = bytearray(content_length or 0)
+
+    def feed(self, chunk: bytes):
+        end = self.size + len(chunk)
+        if end > self.limit:
+            raise BodyTooLarge(end, self.limit)
+        self.buffer[self.size:end] = chunk
+        self.size = end
+
+    def body(self) -> bytearray:
+        # A client may send less than it declared
+        del self.buffer[self.size:]
+        return self.buffer
+
+
+def read_stream(stream: BinaryIO, limit: int, content_length: Optional[int] = None) -> bytearray:
+    """Read a WSGI input stream to the end, raising BodyTooLarge past limit"""
+    reader = BodyReader(limit, content_length)
+    while chunk := stream.read(READ_CHUNK_SIZE):
+        reader.feed(chunk)
+    return reader.body()
+
+
+def check_tool_limits(data: Any, size: int):
+    """Apply each called tool's own max_body to a JSON-RPC body of size bytes
+
+    The tool is only known once the body is parsed, so this runs after the
+    endpoint limit but before any argument validation or dispatch.
+    """
+    from tools import registry
+
+    messages: Iterable = data if isinstance(data, list) else (data,)
+    for message in messages:
+        if not isinstance(message, dict) or message.get("method") != "tools/call":
+            continue
+        params = message.get("params")
+        name = params.get("name") if isinstance(params, dict) else None
+        if isinstance(name, str) and name in registry:
+            limit = registry.get(name).max_body
+            if limit is not None and size > limit:
+                raise BodyTooLarge(size, limit)
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+resources/subscribe for the stdio and SSE session transports
+Subscribed files are watched from one background thread, with inotify on
+Linux and by polling their stat otherwise. Changes to a resource are
+coalesced: the first opens a debounce window and one
+notifications/resources/updated goes out when it closes, however many
+changes followed. Each notification is encoded once and handed to the
+subscribers' event loops in batches, so a large fan-out neither runs on
+nor monopolises any loop
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+import resources
+from metrics import RESOURCE_NOTIFICATIONS
+from serializer import dumps
+
+
+# Seconds changes to one resource are gathered into a single notification
+RESOURCE_DEBOUNCE = float(os.environ.get('MCP_RESOURCE_DEBOUNCE', 0.25))
+
+# "auto" (inotify where available), "inotify" or "poll"
+RESOURCE_WATCH = os.environ.get('MCP_RESOURCE_WATCH', 'auto')
+
+# Seconds between stats of the subscribed files when polling
+RESOURCE_POLL_INTERVAL = float(os.environ.get('MCP_RESOURCE_POLL_INTERVAL', 1))
+
+# Subscribers notified per event loop iteration
+FANOUT_BATCH = 256
+
+
+class Subscriber:
+    """A client that can be sent notifications
+
+    send(line) takes an encoded JSON-RPC notification and runs on the
+    loop the client subscribed from; it returns False if the client
+    can't take it now (the notification is dropped).
+    """
+
+    def __init__(self, send: Callable[[bytes], Any]):
+        self.send = send
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.uris: set[str] = set()
+
+    def deliver(self, uri: str, line: bytes) -> bool:
+        return self.send(line) is not False
+
+
+# The client behind the request being handled (None for one-shot requests,
+# which have no stream to notify)
+subscriber: ContextVar[Optional[Subscriber]] = ContextVar('subscriber', default=None)
+
+
+def file_stamp(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class PollingWatcher:
+    """Reports watched files whose mtime, size or inode changed since the last poll"""
+
+    def __init__(self, interval: float = RESOURCE_POLL_INTERVAL):
+        self.interval = interval
+        self._stamps: dict[str, Optional[tuple]] = {}
+        self._lock = threading.Lock()
+        self._next_poll = time.monotonic() + interval
+
+    def add(self, path: str):
+        stamp = file_stamp(path)
+        with self._lock:
+            self._stamps[path] = stamp
+
+    def remove(self, path: str):
+        with self._lock:
+            self._stamps.pop(path, None)
+
+    def wait(self, timeout: Optional[float]) -> list[str]:
+        """Changed paths, after waiting up to timeout seconds (None: until the next poll)"""
+        delay = max(0.0, self._next_poll - time.monotonic())
+        if timeout is not None and timeout < delay:
+            time.sleep(timeout)
+            return []
+        time.sleep(delay)
+        self._next_poll = time.monotonic() + self.interval
+        with self._lock:
+            watched = list(self._stamps.items())
+        changed = []
+        for path, stamp in watched:
+            current = file_stamp(path)
+            if current != stamp:
+                changed.append(path)
+                with self._lock:
+                    if path in self._stamps:
+                        self._stamps[path] = current
+        return changed
+
+
+class InotifyWatcher:
+    """Reports changes to watched files from inotify events on their directories
+
+    Watching the directory rather than the file also catches a file
+    replaced by a rename, as resources should be.
+    """
+
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = os.O_CLOEXEC
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: dict[str, int] = {}
+        # Watch descriptor -> its directory and the file names watched in it
+        self._names: dict[int, tuple[str, set[str]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, path: str):
+        directory, name = os.path.split(path)
+        with self._lock:
+            wd = self._directories.get(directory)
+            if wd is None:
+                wd = self._add_watch(self.fd, os.fsencode(directory), self.MASK)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+                self._directories[directory] = wd
+                self._names[wd] = (directory, set())
+            self._names[wd][1].add(name)
+
+    def remove(self, path: str):
+        directory, name = os.path.split(path)
+        with self._lock:
+            wd = self._directories.get(directory)
+            if wd is None:
+                return
+            names = self._names[wd][1]
+            names.discard(name)
+            if not names:
+                self._rm_watch(self.fd, wd)
+                del self._directories[directory]
+                del self._names[wd]
+
+    def wait(self, timeout: Optional[float]) -> list[str]:
+        """Changed paths, after waiting up to timeout seconds (None: until there are some)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = b''
+        while True:
+            try:
+                data += os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+        changed = set()
+        offset = 0
+        with self._lock:
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+                name = data[offset + self.EVENT.size:offset + self.EVENT.size + length].rstrip(b'\0')
+                offset += self.EVENT.size + length
+                if mask & self.IN_Q_OVERFLOW:
+                    # Events were lost: report everything
+                    changed.update(os.path.join(directory, watched_name)
+                                   for directory, names in self._names.values() for watched_name in names)
+                    continue
+                watched = self._names.get(wd)
+                if watched is not None and os.fsdecode(name) in watched[1]:
+                    changed.add(os.path.join(watched[0], os.fsdecode(name)))
+        return list(changed)
+
+
+def make_watcher():
+    """The watcher MCP_RESOURCE_WATCH asks for, falling back to polling without inotify"""
+    if RESOURCE_WATCH != 'poll':
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            if RESOURCE_WATCH == 'inotify':
+                raise
+    return PollingWatcher()
+
+
+def deliver(subscribers: list[Subscriber], uri: str, line: bytes, start: int = 0):
+    """Hand a notification to a batch of subscribers on the current loop
+
+    The next batch is queued behind whatever else is ready to run, so a
+    large fan-out is spread over many loop iterations.
+    """
+    batch = subscribers[start:start + FANOUT_BATCH]
+    sent = sum(1 for s in batch if s.deliver(uri, line))
+    RESOURCE_NOTIFICATIONS.inc("sent", amount=sent)
+    if sent < len(batch):
+        RESOURCE_NOTIFICATIONS.inc("dropped", amount=len(batch) - sent)
+    if start + FANOUT_BATCH < len(subscribers):
+        asyncio.get_running_loop().call_soon(deliver, subscribers, uri, line, start + FANOUT_BATCH)
+
+
+class SubscriptionHub:
+    """Subscribers by resource URI, and the thread watching their files"""
+
+    def __init__(self, registry: resources.ResourceRegistry = resources.registry,
+                 debounce: float = RESOURCE_DEBOUNCE):
+        self.registry = registry
+        self.debounce = debounce
+        self._subscribers: dict[str, set[Subscriber]] = {}
+        self._paths: dict[str, str] = {}
+        self._uris: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid: Optional[int] = None
+
+    def _watch(self):
+        # Started per process: a forked worker doesn't inherit the thread
+        if self._watcher_pid != os.getpid():
+            self._watcher = make_watcher()
+            for path in self._uris:
+                self._watcher.add(path)
+            threading.Thread(target=self._run, args=(self._watcher,), name="resource-watcher",
+                             daemon=True).start()
+            self._watcher_pid = os.getpid()
+        return self._watcher
+
+    def subscribe(self, client: Subscriber, uri: str):
+        """Notify client of changes to uri; raises ResourceNotFound for an unknown URI
+
+        Called on the client's event loop.
+        """
+        path = self.registry.watch_path(uri)
+        if client.loop is None:
+            client.loop = asyncio.get_running_loop()
+        with self._lock:
+            subscribers = self._subscribers.setdefault(uri, set())
+            if not subscribers and path is not None:
+                self._paths[uri] = path
+                self._uris[path] = uri
+                self._watch().add(path)
+            subscribers.add(client)
+            client.uris.add(uri)
+
+    def unsubscribe(self, client: Subscriber, uri: str):
+        with self._lock:
+            client.uris.discard(uri)
+            subscribers = self._subscribers.get(uri)
+            if subscribers is None:
+                return
+            subscribers.discard(client)
+            if not subscribers:
+                del self._subscribers[uri]
+                path = self._paths.pop(uri, None)
+                if path is not None:
+                    del self._uris[path]
+                    self._watcher.remove(path)
+
+    def drop(self, client: Subscriber):
+        """Forget every subscription of a client that has gone away"""
+        for uri in list(client.uris):
+            self.unsubscribe(client, uri)
+
+    def _run(self, watcher):
+        pending: dict[str, float] = {}
+        while True:
+            timeout = max(0.0, min(pending.values()) - time.monotonic()) if pending else None
+            changed = watcher.wait(timeout)
+            now = time.monotonic()
+            with self._lock:
+                for path in changed:
+                    uri = self._uris.get(path)
+                    if uri is not None:
+                        pending.setdefault(uri, now + self.debounce)
+            for uri, due in list(pending.items()):
+                if due <= now:
+                    del pending[uri]
+                    self.publish(uri)
+
+    def publish(self, uri: str):
+        """Send notifications/resources/updated to the resource's subscribers"""
+        line = dumps({"jsonrpc": "2.0", "method": "notifications/resources/updated", "params": {"uri": uri}})
+        with self._lock:
+            subscribers = list(self._subscribers.get(uri, ()))
+        by_loop: dict[asyncio.AbstractEventLoop, list[Subscriber]] = {}
+        for client in subscribers:
+            by_loop.setdefault(client.loop, []).append(client)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver, group, uri, line)
+            except RuntimeError:
+                # The loop has closed, and its clients with it
+                for client in group:
+                    self.drop(client)
+
+
+hub = SubscriptionHub()
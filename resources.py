@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Resource registry shared by all server front-ends
+Serves the built-in server-info text plus, with MCP_RESOURCE_DIR set,
+every file under that directory as resource://files/<path>. Reads are
+paged with params._meta.offset and length: large files are memory-mapped
+and each page is sliced from the map without copying, while small files
+are kept in an LRU cache together with their serialized result. The
+listing is built on first use and rebuilt when the directory changes
+"""
+
+import base64
+import mimetypes
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Union
+from urllib.parse import quote, unquote
+
+from schema import InvalidArgumentsError
+from tool_registry import CachedPayload
+
+
+# Directory served as resource://files/... (unset: only the built-in resources)
+RESOURCE_DIR = os.environ.get('MCP_RESOURCE_DIR')
+
+# Most bytes returned by one read; larger files are read in pages
+RESOURCE_PAGE_SIZE = int(os.environ.get('MCP_RESOURCE_PAGE_SIZE', 1024 * 1024))
+
+# Total bytes of small files kept in memory, and the largest file kept
+RESOURCE_CACHE_SIZE = int(os.environ.get('MCP_RESOURCE_CACHE_SIZE', 32 * 1024 * 1024))
+RESOURCE_CACHE_MAX_ITEM = int(os.environ.get('MCP_RESOURCE_CACHE_MAX_ITEM', 256 * 1024))
+
+# Seconds between checks of the directory for added or removed files
+RESOURCE_INDEX_INTERVAL = float(os.environ.get('MCP_RESOURCE_INDEX_INTERVAL', 2))
+
+# Large files kept mapped at once
+MAX_MAPPED_FILES = 64
+
+FILES_PREFIX = "resource://files/"
+
+# Non-text/* types returned as text rather than base64
+TEXT_TYPES = frozenset({
+    'application/json', 'application/xml', 'application/javascript', 'application/yaml',
+    'application/x-yaml', 'application/toml', 'application/x-sh', 'application/sql',
+})
+
+SERVER_INFO_TEXT = """Simple MCP Server
+
+This is a basic MCP server that provides utility tools:
+- Echo: Returns the input text
+- Current Time: Returns the current server time
+- Calculate: Performs basic arithmetic operations
+- Reverse Text: Reverses the input text
+
+Version: 1.0.0
+"""
+
+
+class ResourceNotFound(KeyError):
+    """Raised when a URI names no resource"""
+
+
+def mime_type(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def is_text(mime: str) -> bool:
+    return mime.startswith('text/') or mime in TEXT_TYPES or mime.endswith(('+json', '+xml'))
+
+
+def char_boundary(data: Any, start: int, end: int) -> int:
+    """Move a page end back so it doesn't split a UTF-8 character"""
+    for back in range(4):
+        if end - back <= start:
+            break
+        if data[end - back] & 0xC0 != 0x80:
+            return end - back
+    return end
+
+
+def page_range(params: dict) -> tuple[int, Optional[int]]:
+    """The offset and length a resources/read asks for (params._meta)"""
+    meta = params.get('_meta')
+    if not isinstance(meta, dict):
+        return 0, None
+    offset, length = meta.get('offset', 0), meta.get('length')
+    if isinstance(offset, bool) or not isinstance(offset, int) or offset < 0:
+        raise InvalidArgumentsError("_meta.offset must be a non-negative integer")
+    if length is not None and (isinstance(length, bool) or not isinstance(length, int) or length < 1):
+        raise InvalidArgumentsError("_meta.length must be a positive integer")
+    return offset, length
+
+
+class SmallFiles:
+    """LRU cache of small files' bytes, bounded by their total size
+
+    Each entry also keeps the serialized result of reading the whole
+    file, built on the first such read.
+    """
+
+    def __init__(self, max_bytes: int = RESOURCE_CACHE_SIZE, max_item: int = RESOURCE_CACHE_MAX_ITEM):
+        self.max_bytes = max_bytes
+        self.max_item = max_item
+        self.size = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stamp: tuple) -> Optional[list]:
+        """The [stamp, data, result] entry for a file, if cached and unchanged"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            if entry[0] != stamp:
+                self._drop(path)
+                return None
+            self._entries.move_to_end(path)
+            return entry
+
+    def put(self, path: str, stamp: tuple, data: bytes) -> list:
+        entry = [stamp, data, None]
+        if len(data) > self.max_item:
+            return entry
+        with self._lock:
+            self._drop(path)
+            self._entries[path] = entry
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return entry
+
+    def _drop(self, path: str):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class MappedFiles:
+    """Read-only maps of large files, the most recently used kept open
+
+    A map dropped here is unmapped once the last page sliced from it is
+    released. Files should be replaced rather than truncated in place,
+    since touching a mapped page past the new end of a file kills the
+    process (SIGBUS).
+    """
+
+    def __init__(self, max_open: int = MAX_MAPPED_FILES):
+        self.max_open = max_open
+        self._maps: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stamp: tuple) -> mmap.mmap:
+        with self._lock:
+            entry = self._maps.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._maps.move_to_end(path)
+                return entry[1]
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with self._lock:
+            self._maps[path] = (stamp, mapped)
+            self._maps.move_to_end(path)
+            while len(self._maps) > self.max_open:
+                self._maps.popitem(last=False)
+        return mapped
+
+
+class ResourceRegistry:
+    """Built-in resources plus the files under a directory"""
+
+    def __init__(self, root: Optional[str] = RESOURCE_DIR, page_size: int = RESOURCE_PAGE_SIZE):
+        self.root = os.path.realpath(root) if root else None
+        self.page_size = page_size
+        self.small_files = SmallFiles()
+        self.mapped_files = MappedFiles()
+        self._static: dict[str, tuple[dict, CachedPayload]] = {}
+        self._listing: Optional[CachedPayload] = None
+        self._directories: dict[str, int] = {}
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def add_text(self, uri: str, name: str, text: str, description: str = "",
+                 mime: str = 'text/plain'):
+        """Register a fixed text resource"""
+        entry = {"uri": uri, "name": name, "description": description, "mimeType": mime}
+        result = CachedPayload({"contents": [{"uri": uri, "mimeType": mime, "text": text}]})
+        self._static[uri] = (entry, result)
+        self._listing = None
+
+    def _changed(self) -> bool:
+        for directory, mtime in self._directories.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _scan(self) -> list[dict]:
+        entries = []
+        self._directories = {}
+        pending = [self.root]
+        while pending:
+            directory = pending.pop()
+            try:
+                self._directories[directory] = os.stat(directory).st_mtime_ns
+                scanned = sorted(os.scandir(directory), key=lambda e: e.name)
+            except OSError:
+                continue
+            for entry in scanned:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    relative = os.path.relpath(entry.path, self.root).replace(os.sep, '/')
+                    entries.append({
+                        "uri": FILES_PREFIX + quote(relative),
+                        "name": relative,
+                        "mimeType": mime_type(entry.name),
+                        "size": entry.stat(follow_symlinks=False).st_size,
+                    })
+        return sorted(entries, key=lambda e: e["name"])
+
+    def cached_listing(self) -> Optional[CachedPayload]:
+        """The listing if it was checked recently enough to skip the disk"""
+        if time.monotonic() - self._checked < RESOURCE_INDEX_INTERVAL:
+            return self._listing
+        return None
+
+    def listing(self) -> CachedPayload:
+        """The serialized resources/list result
+
+        Checks the directories for changes at most every
+        RESOURCE_INDEX_INTERVAL seconds. File sizes are as of the last
+        rebuild; reads always see the current file.
+        """
+        listing = self.cached_listing()
+        if listing is not None:
+            return listing
+        now = time.monotonic()
+        with self._lock:
+            if self._listing is None or (now - self._checked >= RESOURCE_INDEX_INTERVAL
+                                         and self.root and self._changed()):
+                files = self._scan() if self.root else []
+                static = [entry for entry, _ in self._static.values()]
+                self._listing = CachedPayload({"resources": static + files})
+            self._checked = now
+            return self._listing
+
+    def path(self, uri: str) -> str:
+        """The file a resource://files/ URI names; raises ResourceNotFound"""
+        if not self.root or not uri.startswith(FILES_PREFIX):
+            raise ResourceNotFound(uri)
+        relative = unquote(uri[len(FILES_PREFIX):])
+        path = os.path.realpath(os.path.join(self.root, relative))
+        if not path.startswith(self.root + os.sep) or any(
+                part.startswith('.') for part in relative.split('/')):
+            raise ResourceNotFound(uri)
+        return path
+
+    def watch_path(self, uri: str) -> Optional[str]:
+        """The file to watch for changes to a resource (None for built-in ones)
+
+        Raises ResourceNotFound for an unknown URI.
+        """
+        if uri in self._static:
+            return None
+        path = self.path(uri)
+        self._stat(uri, path)
+        return path
+
+    def _stat(self, uri: str, path: str) -> tuple:
+        try:
+            st = os.stat(path)
+        except OSError:
+            raise ResourceNotFound(uri) from None
+        if not os.path.isfile(path):
+            raise ResourceNotFound(uri)
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def read_cached(self, uri: str, offset: int = 0, length: Optional[int] = None) -> Optional[CachedPayload]:
+        """The result of a read served from memory, or None if it needs file I/O"""
+        static = self._static.get(uri)
+        if static is not None:
+            return static[1]
+        if offset or length is not None:
+            return None
+        path = self.path(uri)
+        entry = self.small_files.get(path, self._stat(uri, path))
+        return entry[2] if entry is not None else None
+
+    def read(self, uri: str, offset: int = 0, length: Optional[int] = None) -> Union[CachedPayload, dict]:
+        """The resources/read result for a page of a resource
+
+        Raises ResourceNotFound for an unknown URI.
+        """
+        static = self._static.get(uri)
+        if static is not None:
+            return static[1]
+        path = self.path(uri)
+        stamp = self._stat(uri, path)
+        size = stamp[1]
+        whole = offset == 0 and (length is None or length >= size) and size <= self.page_size
+
+        entry = self.small_files.get(path, stamp) if size <= self.small_files.max_item else None
+        if entry is not None and whole and entry[2] is not None:
+            return entry[2]
+        if size <= self.small_files.max_item:
+            if entry is None:
+                with open(path, 'rb') as f:
+                    entry = self.small_files.put(path, stamp, f.read())
+            data = entry[1]
+        elif size:
+            data = memoryview(self.mapped_files.get(path, stamp))
+        else:
+            data = b''
+        # The file may have changed since the stat
+        size = len(data)
+
+        mime = mime_type(path)
+        text = is_text(mime)
+        start = min(offset, size)
+        end = min(size, start + min(length or self.page_size, self.page_size))
+        if text and end < size:
+            end = char_boundary(data, start, end)
+        page = data[start:end]
+        content = {"uri": uri, "mimeType": mime}
+        if text:
+            try:
+                content["text"] = str(page, 'utf-8')
+            except UnicodeDecodeError:
+                text = False
+        if not text:
+            content["blob"] = base64.b64encode(page).decode('ascii')
+        meta = {"offset": start, "length": end - start, "size": size}
+        if end < size:
+            meta["nextOffset"] = end
+        result = {"contents": [content], "_meta": meta}
+        if whole and entry is not None:
+            entry[2] = CachedPayload(result)
+            return entry[2]
+        return result
+
+
+registry = ResourceRegistry()
+registry.add_text("resource://server-info", "Server Information", SERVER_INFO_TEXT,
+                  description="Information about this MCP server")
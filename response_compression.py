@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Accept-Encoding negotiation and response compression for the server front-ends
+gzip is always available; brotli and zstd are used when the brotli (or
+brotlicffi) and zstandard packages are installed. Complete responses are
+compressed once they reach MCP_COMPRESS_MIN_SIZE bytes; SSE streams are
+compressed incrementally and flushed after every event
+"""
+
+import os
+import zlib
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Smallest complete response body (bytes) worth compressing
+MIN_SIZE = int(os.environ.get('MCP_COMPRESS_MIN_SIZE', 1024))
+
+# Encodings offered, in order of preference ("off" disables compression)
+PREFERENCE = [e.strip() for e in os.environ.get('MCP_COMPRESSION', 'zstd,br,gzip').split(',') if e.strip()]
+
+AVAILABLE = {"gzip"} | ({"br"} if brotli is not None else set()) | ({"zstd"} if zstandard is not None else set())
+
+# Encodings this process can produce, most preferred first
+ENCODINGS = tuple(e for e in PREFERENCE if e in AVAILABLE)
+
+# Compression levels for per-request bodies and streams (fast) and for
+# payloads compressed once and cached (small)
+LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+STATIC_LEVELS = {"gzip": 9, "br": 11, "zstd": 19}
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """The encoding to use for a request's Accept-Encoding header, or None
+
+    Picks the highest q-value the client gives an encoding we offer, using
+    our own preference order to break ties; "*" covers unnamed encodings.
+    """
+    if not accept_encoding or not ENCODINGS:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    wildcard = weights.get('*', 0.0)
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compressible(content_type: Optional[str]) -> bool:
+    """Whether a response of this Content-Type is worth compressing"""
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str, static: bool = False) -> bytes:
+    """Compress a complete body (static: slower, smaller output for cached payloads)"""
+    level = (STATIC_LEVELS if static else LEVELS)[encoding]
+    if encoding == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class StreamCompressor:
+    """Incremental compressor that flushes after every chunk
+
+    Each chunk (an SSE event) comes out decodable on its own arrival, so
+    compression adds no latency; later events still reuse the history of
+    earlier ones, which is where repetitive JSON-RPC streams gain most.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        level = LEVELS[encoding]
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress a chunk and flush it to a byte boundary"""
+        if self.encoding == "gzip":
+            return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        """End the stream"""
+        if self.encoding == "gzip":
+            return self._compressor.flush()
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress an iterable of response chunks, flushing after each one"""
+    compressor = StreamCompressor(encoding)
+    try:
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+    finally:
+        # Closing the stream early must still close the generator it wraps
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
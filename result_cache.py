@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Memoization cache for pure tool results
+Entries are keyed on the tool name and a canonical hash of the arguments,
+bounded in number, evicted least-recently-used, and expire per tool TTL
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from metrics import TOOL_CACHE_EVICTIONS
+from serializer import canonical
+
+
+# Maximum number of cached results per process
+CACHE_SIZE = int(os.environ.get('TOOL_CACHE_SIZE', 1024))
+
+# Arguments or results larger than this (bytes/characters) are not cached
+CACHE_MAX_ITEM = int(os.environ.get('TOOL_CACHE_MAX_ITEM', 64 * 1024))
+
+
+class ToolResult:
+    """A tool's return value plus serializations derived from it
+
+    Derived forms (e.g. the JSON-RPC result bytes) are built once and live
+    as long as the cache entry, so a cache hit skips serialization too.
+    """
+
+    __slots__ = ("value", "_derived")
+
+    def __init__(self, value: Any):
+        self.value = value
+        self._derived: dict = {}
+
+    def derive(self, build: Callable[[Any], Any]) -> Any:
+        """Return build(value), computing it only once per result"""
+        try:
+            return self._derived[build]
+        except KeyError:
+            derived = self._derived[build] = build(self.value)
+            return derived
+
+
+class ResultCache:
+    """Thread-safe LRU cache of ToolResults with per-entry expiry"""
+
+    def __init__(self, max_entries: int = CACHE_SIZE, max_item: int = CACHE_MAX_ITEM):
+        self.max_entries = max_entries
+        self.max_item = max_item
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, name: str, arguments: Any) -> Optional[bytes]:
+        """Canonical cache key, or None if the arguments can't or shouldn't be cached"""
+        try:
+            encoded = canonical(arguments)
+        except (TypeError, ValueError):
+            return None
+        if len(encoded) > self.max_item:
+            return None
+        return hashlib.blake2b(name.encode() + b"\0" + encoded, digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[ToolResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            result, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, key: bytes, result: ToolResult, ttl: float):
+        if isinstance(result.value, str) and len(result.value) > self.max_item:
+            return
+        with self._lock:
+            self._entries[key] = (result, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                TOOL_CACHE_EVICTIONS.inc()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
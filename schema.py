@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Compiled JSON Schema validation for tool arguments
+Each inputSchema is turned into a chain of small closures once, at tool
+registration, so validating a call costs a few isinstance checks instead
+of a full jsonschema run. jsonschema itself is imported only for schemas
+that need it
+"""
+
+import importlib.util
+from typing import Any, Callable
+
+# jsonschema ships with mcp
+HAVE_JSONSCHEMA = importlib.util.find_spec("jsonschema") is not None
+
+
+class InvalidArgumentsError(ValueError):
+    """Raised when tool arguments do not match the tool's inputSchema"""
+
+
+Validator = Callable[[Any], None]
+
+TYPE_CHECKS = {
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: (isinstance(v, int) and not isinstance(v, bool))
+    or (isinstance(v, float) and v.is_integer()),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "null": lambda v: v is None,
+}
+
+# Keywords the compiler understands; anything else is handed to jsonschema
+COMPILED_KEYWORDS = {
+    "type", "properties", "required", "enum", "additionalProperties", "items",
+    "minimum", "maximum", "minLength", "maxLength",
+    # Annotations with no validation effect
+    "description", "default", "title", "examples", "$schema",
+}
+
+
+def _uses_only_compiled_keywords(schema: Any) -> bool:
+    if not isinstance(schema, dict) or not set(schema) <= COMPILED_KEYWORDS:
+        return False
+    subschemas = list(schema.get("properties", {}).values())
+    if isinstance(schema.get("items"), dict):
+        subschemas.append(schema["items"])
+    if isinstance(schema.get("additionalProperties"), dict):
+        return False
+    return all(_uses_only_compiled_keywords(sub) for sub in subschemas)
+
+
+def _compile(schema: dict, path: str) -> list[Validator]:
+    checks: list[Validator] = []
+
+    if "type" in schema:
+        types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        type_checks = [TYPE_CHECKS[t] for t in types]
+        if len(type_checks) == 1:
+            is_type = type_checks[0]
+        else:
+            def is_type(value):
+                for check in type_checks:
+                    if check(value):
+                        return True
+                return False
+        expected = " or ".join(types)
+
+        def check_type(value):
+            if not is_type(value):
+                raise InvalidArgumentsError(f"{path} must be of type {expected}")
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+        listed = ", ".join(map(str, allowed))
+
+        def check_enum(value):
+            if value not in allowed:
+                raise InvalidArgumentsError(f"{path} must be one of: {listed}")
+        checks.append(check_enum)
+
+    for keyword, fails, relation in (
+        ("minimum", lambda v, limit: v < limit, ">="),
+        ("maximum", lambda v, limit: v > limit, "<="),
+    ):
+        if keyword in schema:
+            def check_bound(value, limit=schema[keyword], fails=fails, relation=relation):
+                if isinstance(value, (int, float)) and fails(value, limit):
+                    raise InvalidArgumentsError(f"{path} must be {relation} {limit}")
+            checks.append(check_bound)
+
+    if "minLength" in schema or "maxLength" in schema:
+        min_length = schema.get("minLength", 0)
+        max_length = schema.get("maxLength")
+
+        def check_length(value):
+            if not isinstance(value, str):
+                return
+            if len(value) < min_length or (max_length is not None and len(value) > max_length):
+                raise InvalidArgumentsError(f"{path} has invalid length {len(value)}")
+        checks.append(check_length)
+
+    required = schema.get("required", [])
+    properties = {
+        name: _compile(subschema, f"{path}.{name}")
+        for name, subschema in schema.get("properties", {}).items()
+    }
+    closed = schema.get("additionalProperties") is False
+    if required or properties or closed:
+        def check_object(value):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    raise InvalidArgumentsError(f"{path}.{name} is required")
+            for name, item in value.items():
+                property_checks = properties.get(name)
+                if property_checks is not None:
+                    for check in property_checks:
+                        check(item)
+                elif closed:
+                    raise InvalidArgumentsError(f"{path}.{name} is not allowed")
+        checks.append(check_object)
+
+    if isinstance(schema.get("items"), dict):
+        item_checks = _compile(schema["items"], f"{path}[]")
+        item_type = schema["items"].get("type")
+        item_enum = schema["items"].get("enum")
+
+        if isinstance(item_type, str) and set(schema["items"]) <= {"type", "enum", "description"}:
+            # Flat arrays (e.g. thousands of numbers): test every item with
+            # C-level loops and only walk the items one by one on failure
+            is_item = TYPE_CHECKS[item_type]
+            allowed = set(item_enum) if item_enum is not None else None
+
+            def check_items(value):
+                if not isinstance(value, list):
+                    return
+                if all(map(is_item, value)) and (allowed is None or allowed.issuperset(value)):
+                    return
+                for item in value:
+                    for check in item_checks:
+                        check(item)
+        else:
+            def check_items(value):
+                if not isinstance(value, list):
+                    return
+                for item in value:
+                    for check in item_checks:
+                        check(item)
+        checks.append(check_items)
+
+    return checks
+
+
+def _compile_with_jsonschema(schema: dict) -> Validator:
+    import jsonschema
+    from jsonschema.exceptions import best_match
+
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    validator = cls(schema)
+
+    def validate(instance):
+        error = best_match(validator.iter_errors(instance))
+        if error is not None:
+            where = "".join(f".{p}" if isinstance(p, str) else f"[{p}]" for p in error.absolute_path)
+            raise InvalidArgumentsError(f"arguments{where}: {error.message}")
+    return validate
+
+
+def compile_schema(schema: dict) -> Validator:
+    """Compile an inputSchema into a function that raises InvalidArgumentsError"""
+    if not _uses_only_compiled_keywords(schema) and HAVE_JSONSCHEMA:
+        return _compile_with_jsonschema(schema)
+
+    checks = _compile(schema, "arguments")
+    if len(checks) == 1:
+        return checks[0]
+
+    def validate(instance):
+        for check in checks:
+            check(instance)
+    return validate
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+The stdio server's tools and resources on the MCP SDK
+server.py answers initialize, ping, tools/list and tools/call itself and
+imports this module only for other requests (or MCP_STDIO_TRANSPORT=sdk),
+since loading the SDK takes most of a cold start
+"""
+
+import asyncio
+import base64
+import weakref
+from typing import Any
+
+from mcp.server import Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from mcp.shared.exceptions import McpError
+from mcp.shared.version import SUPPORTED_PROTOCOL_VERSIONS
+from mcp.types import (
+    INVALID_PARAMS,
+    LATEST_PROTOCOL_VERSION,
+    METHOD_NOT_FOUND,
+    CallToolRequest,
+    ClientRequest,
+    ErrorData,
+    Implementation,
+    InitializeResult,
+    Resource,
+    Tool,
+    TextContent,
+    ImageContent,
+    EmbeddedResource,
+)
+from pydantic import AnyUrl, ValidationError
+
+import resources
+from resource_subscriptions import Subscriber, hub
+from mcp_protocol import RESOURCE_NOT_FOUND
+from tool_registry import CachedPayload, InvalidArgumentsError, UnknownToolError
+from tools import registry
+
+
+# Create server instance
+server = Server("simple-mcp-server")
+
+
+@server.list_resources()
+async def list_resources() -> list[Resource]:
+    """List available resources"""
+    listing = await asyncio.to_thread(resources.registry.listing)
+    return [Resource(**entry) for entry in listing.value["resources"]]
+
+
+@server.read_resource()
+async def read_resource(uri: Any) -> list[ReadResourceContents]:
+    """Read a resource by URI (the first page, for a large file)"""
+    try:
+        result = await asyncio.to_thread(resources.registry.read, str(uri))
+    except resources.ResourceNotFound:
+        raise McpError(ErrorData(code=RESOURCE_NOT_FOUND, message=f"Resource not found: {uri}"))
+    if isinstance(result, CachedPayload):
+        result = result.value
+    # The SDK base64-encodes binary contents itself
+    return [ReadResourceContents(content=content["text"] if "text" in content else base64.b64decode(content["blob"]),
+                                 mime_type=content["mimeType"])
+            for content in result["contents"]]
+
+
+class SessionSubscriber(Subscriber):
+    """Sends resource notifications through an SDK session"""
+
+    def __init__(self, session: Any):
+        super().__init__(None)
+        self.session = session
+        self._sending: set[asyncio.Task] = set()
+
+    def deliver(self, uri: str, line: bytes) -> bool:
+        task = asyncio.ensure_future(self.session.send_resource_updated(AnyUrl(uri)))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+        return True
+
+
+# Subscribers by SDK session
+_subscribers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def session_subscriber() -> SessionSubscriber:
+    session = server.request_context.session
+    client = _subscribers.get(session)
+    if client is None:
+        client = _subscribers[session] = SessionSubscriber(session)
+    return client
+
+
+@server.subscribe_resource()
+async def subscribe_resource(uri: Any):
+    """Send notifications/resources/updated when a resource changes"""
+    try:
+        hub.subscribe(session_subscriber(), str(uri))
+    except resources.ResourceNotFound:
+        raise McpError(ErrorData(code=RESOURCE_NOT_FOUND, message=f"Resource not found: {uri}"))
+
+
+@server.unsubscribe_resource()
+async def unsubscribe_resource(uri: Any):
+    hub.unsubscribe(session_subscriber(), str(uri))
+
+
+# Tool objects are built once from the shared catalogue
+TOOL_OBJECTS = [Tool(**tool) for tool in registry.catalogue]
+
+
+@server.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available tools"""
+    return TOOL_OBJECTS
+
+
+# Arguments are checked by the registry's compiled validators (see
+# validate_call_tool) instead of the SDK's per-call jsonschema.validate
+@server.call_tool(validate_input=False)
+async def call_tool(name: str, arguments: Any) -> list[TextContent]:
+    """Handle tool calls"""
+    text = await registry.call(name, arguments, validate=False)
+    return [TextContent(type="text", text=text)]
+
+
+sdk_call_tool = server.request_handlers[CallToolRequest]
+
+
+async def validate_call_tool(request: CallToolRequest):
+    """Reject invalid tool arguments with JSON-RPC -32602 before dispatch"""
+    try:
+        registry.validate(request.params.name, request.params.arguments)
+    except InvalidArgumentsError as e:
+        raise McpError(ErrorData(code=INVALID_PARAMS, message=f"Invalid params: {e}"))
+    except UnknownToolError:
+        pass  # Unknown tools are reported by the SDK handler as before
+    return await sdk_call_tool(request)
+
+
+server.request_handlers[CallToolRequest] = validate_call_tool
+
+
+def initialization_options():
+    """The SDK's initialization options, advertising resource subscriptions
+
+    The SDK reports subscribe as false even with handlers registered.
+    """
+    options = server.create_initialization_options()
+    options.capabilities.resources.subscribe = True
+    return options
+
+
+def initialize_result() -> dict:
+    """The initialize result the SDK session would send, for the latest protocol version"""
+    options = initialization_options()
+    result = InitializeResult(
+        protocolVersion=LATEST_PROTOCOL_VERSION,
+        capabilities=options.capabilities,
+        serverInfo=Implementation(name=options.server_name, version=options.server_version),
+        instructions=options.instructions,
+    )
+    return {
+        "result": result.model_dump(by_alias=True, mode="json", exclude_none=True),
+        "protocol_versions": list(SUPPORTED_PROTOCOL_VERSIONS),
+    }
+
+
+async def handle_request(data: dict) -> dict:
+    """Answer a JSON-RPC request with the SDK's handlers, as Server.run would"""
+    request_id = data.get('id')
+    try:
+        request = ClientRequest.model_validate({"method": data.get('method'), "params": data.get('params')})
+    except ValidationError:
+        known = any(data.get('method') == cls.model_fields['method'].default for cls in server.request_handlers)
+        error = ErrorData(code=INVALID_PARAMS if known else METHOD_NOT_FOUND,
+                          message="Invalid request parameters" if known else "Method not found")
+    else:
+        handler = server.request_handlers.get(type(request.root))
+        if handler is None:
+            error = ErrorData(code=METHOD_NOT_FOUND, message="Method not found")
+        else:
+            try:
+                result = await handler(request.root)
+                return {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": result.model_dump(by_alias=True, mode="json", exclude_none=True),
+                }
+            except McpError as e:
+                error = e.error
+            except Exception as e:
+                error = ErrorData(code=0, message=str(e))
+    return {"jsonrpc": "2.0", "id": request_id, "error": error.model_dump(by_alias=True, exclude_none=True)}
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+JSON serialization for the server front-ends
+Uses orjson when it is installed and falls back to the standard library;
+set MCP_JSON_BACKEND=json to force the fallback
+"""
+
+import json
+import os
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.environ.get('MCP_JSON_BACKEND', '').lower() == 'json':
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _stdlib_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def _stdlib_canonical(value: Any) -> bytes:
+    return json.dumps(value, separators=(',', ':'), sort_keys=True, ensure_ascii=False).encode()
+
+
+if orjson is not None:
+    def dumps(value: Any) -> bytes:
+        """Serialize a value to compact JSON bytes"""
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            # Values orjson rejects (e.g. integers beyond 64 bits)
+            return _stdlib_dumps(value)
+
+    def canonical(value: Any) -> bytes:
+        """Serialize with sorted keys, for hashing"""
+        try:
+            return orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            return _stdlib_canonical(value)
+
+    def loads(data: Any) -> Any:
+        """Parse JSON from bytes or str; raises ValueError on bad input"""
+        return orjson.loads(data)
+
+    def text_content_result(text: str) -> bytes:
+        """Serialize a tools/call result holding one text content item"""
+        # One orjson pass over a literal dict beats splicing for large texts
+        return dumps({"content": [{"type": "text", "text": text}]})
+else:
+    dumps = _stdlib_dumps
+    canonical = _stdlib_canonical
+
+    def loads(data: Any) -> Any:
+        """Parse JSON from bytes or str; raises ValueError on bad input"""
+        return json.loads(data)
+
+    def text_content_result(text: str) -> bytes:
+        """Serialize a tools/call result holding one text content item"""
+        # Only the text needs encoding; the envelope is constant
+        return b"".join((b'{"content":[{"type":"text","text":', dumps(text), b'}]}'))
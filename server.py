@@ -5,191 +5,226 @@ This server provides basic utilities like echo, time, and calculations
 """
 
 import asyncio
-import json
+import importlib
+import os
 import sys
-from datetime import datetime
-from typing import Any
-
-from mcp.server import Server
-from mcp.types import (
-    Resource,
-    Tool,
-    TextContent,
-    ImageContent,
-    EmbeddedResource,
-)
-import mcp.server.stdio
-
-
-# Create server instance
-server = Server("simple-mcp-server")
-
-
-@server.list_resources()
-async def list_resources() -> list[Resource]:
-    """List available resources"""
-    return [
-        Resource(
-            uri="resource://server-info",
-            name="Server Information",
-            mimeType="text/plain",
-            description="Information about this MCP server"
-        )
-    ]
-
-
-@server.read_resource()
-async def read_resource(uri: str) -> str:
-    """Read a resource by URI"""
-    if uri == "resource://server-info":
-        return """Simple MCP Server
-        
-This is a basic MCP server that provides utility tools:
-- Echo: Returns the input text
-- Current Time: Returns the current server time
-- Calculate: Performs basic arithmetic operations
-- Reverse Text: Reverses the input text
-
-Version: 1.0.0
-"""
-    else:
-        raise ValueError(f"Unknown resource: {uri}")
-
-
-@server.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available tools"""
-    return [
-        Tool(
-            name="echo",
-            description="Echoes back the input text",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "The text to echo back"
-                    }
-                },
-                "required": ["text"]
-            }
-        ),
-        Tool(
-            name="get_current_time",
-            description="Returns the current server time",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "timezone": {
-                        "type": "string",
-                        "description": "Timezone (optional, defaults to UTC)",
-                        "default": "UTC"
-                    }
-                }
-            }
-        ),
-        Tool(
-            name="calculate",
-            description="Performs basic arithmetic operations",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "operation": {
-                        "type": "string",
-                        "enum": ["add", "subtract", "multiply", "divide"],
-                        "description": "The operation to perform"
-                    },
-                    "a": {
-                        "type": "number",
-                        "description": "First number"
-                    },
-                    "b": {
-                        "type": "number",
-                        "description": "Second number"
-                    }
-                },
-                "required": ["operation", "a", "b"]
-            }
-        ),
-        Tool(
-            name="reverse_text",
-            description="Reverses the input text",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "The text to reverse"
-                    }
-                },
-                "required": ["text"]
-            }
-        )
-    ]
-
+from typing import Any, Optional
 
-@server.call_tool()
-async def call_tool(name: str, arguments: Any) -> list[TextContent]:
-    """Handle tool calls"""
-    
-    if name == "echo":
-        text = arguments.get("text", "")
-        return [TextContent(type="text", text=f"Echo: {text}")]
-    
-    elif name == "get_current_time":
-        current_time = datetime.now().isoformat()
-        return [TextContent(
-            type="text",
-            text=f"Current server time: {current_time}"
-        )]
-    
-    elif name == "calculate":
-        operation = arguments.get("operation")
-        a = arguments.get("a")
-        b = arguments.get("b")
-        
-        try:
-            if operation == "add":
-                result = a + b
-            elif operation == "subtract":
-                result = a - b
-            elif operation == "multiply":
-                result = a * b
-            elif operation == "divide":
-                if b == 0:
-                    return [TextContent(type="text", text="Error: Division by zero")]
-                result = a / b
-            else:
-                return [TextContent(type="text", text=f"Unknown operation: {operation}")]
-            
-            return [TextContent(
-                type="text",
-                text=f"Result: {a} {operation} {b} = {result}"
-            )]
-        except Exception as e:
-            return [TextContent(type="text", text=f"Error: {str(e)}")]
-    
-    elif name == "reverse_text":
-        text = arguments.get("text", "")
-        reversed_text = text[::-1]
-        return [TextContent(
-            type="text",
-            text=f"Reversed: {reversed_text}"
-        )]
-    
-    else:
-        raise ValueError(f"Unknown tool: {name}")
+import catalogue_snapshot
+import stdio_transport
+from serializer import dumps
+
+
+# "buffered" (stdio_transport: bounded concurrency, batched writes) or "sdk".
+# Buffered is the default because it answers the common requests without
+# importing the SDK (first response ~0.1 s rather than ~0.7 s, see
+# --measure-startup) and doesn't hold later requests behind a slow call;
+# "sdk" is the SDK's own session handling, for methods answered only there
+STDIO_TRANSPORT = os.environ.get('MCP_STDIO_TRANSPORT', 'buffered')
+
+
+class Catalogue:
+    """The initialize and tools/list answers, from the startup snapshot
+
+    A missing or outdated snapshot is rebuilt (importing the MCP SDK) when
+    first needed and saved for the next start.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[dict] = catalogue_snapshot.load()
+        self._tools_list: Optional[bytes] = None
+
+    async def snapshot(self) -> dict:
+        if self._snapshot is None:
+            snapshot = await asyncio.to_thread(catalogue_snapshot.build)
+            catalogue_snapshot.save(snapshot)
+            self._snapshot = snapshot
+        return self._snapshot
+
+    async def initialize(self, protocol_version: Any) -> dict:
+        """The initialize result, agreeing to the client's protocol version if supported"""
+        initialize = (await self.snapshot())["initialize"]
+        result = initialize["result"]
+        if protocol_version in initialize["protocol_versions"]:
+            result = {**result, "protocolVersion": protocol_version}
+        return result
+
+    async def tools_list(self) -> bytes:
+        """The serialized tools/list result"""
+        if 'tools' in sys.modules:
+            # Already loaded (e.g. a script registered tools before importing us)
+            return sys.modules['tools'].registry.tools_list.body
+        if self._tools_list is None:
+            self._tools_list = dumps((await self.snapshot())["tools_list"])
+        return self._tools_list
+
+
+catalogue = Catalogue()
+
+# The SDK handlers, once some request has needed them
+_sdk_server = None
+
+# Receives the notifications for resources/subscribe, once there is one
+_subscriber = None
+
+
+def result_line(request_id: Any, result: Any) -> bytes:
+    return dumps({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+
+async def call_tool(request_id: Any, params: dict) -> bytes:
+    """Answer a tools/call as the SDK would: tool failures become isError results"""
+    # Loads the tools on the first call rather than at startup
+    from mcp_protocol import REQUEST_TIMEOUT, content_result, encode_message, error_response, message_deadline
+    from tool_registry import InvalidArgumentsError, ToolTimeout
+    from tools import registry
+
+    try:
+        result = await registry.call_result(params.get('name'), params.get('arguments'),
+                                            deadline=message_deadline({"params": params}, None))
+    except InvalidArgumentsError as e:
+        return encode_message(error_response(request_id, -32602, f"Invalid params: {e}"))
+    except ToolTimeout as e:
+        return encode_message(error_response(request_id, REQUEST_TIMEOUT, str(e)))
+    except Exception as e:
+        return result_line(request_id, {"content": [{"type": "text", "text": str(e)}], "isError": True})
+    return encode_message({"jsonrpc": "2.0", "id": request_id, "result": result.derive(content_result)})
+
+
+async def resource_request(request_id: Any, method: str, params: dict) -> bytes:
+    """Answer a resources/ request as the SSE servers do"""
+    from mcp_protocol import dispatch_message, encode_message
+    from resource_subscriptions import Subscriber, subscriber
+
+    global _subscriber
+    send = stdio_transport.send_line.get()
+    if _subscriber is None and send is not None:
+        _subscriber = Subscriber(send)
+    subscriber.set(_subscriber)
+    return encode_message(await dispatch_message({"id": request_id, "method": method, "params": params}, None))
+
+
+async def handle_message(message: Any) -> Optional[bytes]:
+    """Answer one JSON-RPC message from stdin (None for notifications and responses)
+
+    initialize, ping, tools/list, tools/call and the resources/ methods
+    (list, read, subscribe, unsubscribe) are answered here without the MCP
+    SDK; other methods go to its handlers in sdk_server.
+    """
+    if not isinstance(message, dict):
+        return stdio_transport.error_line(None, -32600, "Invalid Request: expected a JSON-RPC object")
+    if 'id' not in message or 'method' not in message:
+        # A notification, or the client's response to a request of ours
+        return None
+    request_id = message['id']
+    method = message.get('method')
+    params = message.get('params')
+    if not isinstance(params, dict):
+        params = {}
+
+    if method == 'initialize':
+        return result_line(request_id, await catalogue.initialize(params.get('protocolVersion')))
+    if method == 'ping':
+        return result_line(request_id, {})
+    if method == 'tools/list':
+        return b'{"jsonrpc":"2.0","id":' + dumps(request_id) + b',"result":' + await catalogue.tools_list() + b'}'
+    if method == 'tools/call':
+        return await call_tool(request_id, params)
+    if method in ('resources/list', 'resources/read', 'resources/subscribe', 'resources/unsubscribe'):
+        return await resource_request(request_id, method, params)
+
+    global _sdk_server
+    if _sdk_server is None:
+        # Imported off the loop, so requests already running keep going meanwhile;
+        # concurrent first imports wait on the import lock for the same module
+        _sdk_server = await asyncio.to_thread(importlib.import_module, 'sdk_server')
+    return dumps(await _sdk_server.handle_request(message))
 
 
 async def main():
     """Main entry point"""
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
-        )
+    if STDIO_TRANSPORT == 'sdk':
+        import mcp.server.stdio
+        from sdk_server import initialization_options, server
+
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                initialization_options()
+            )
+    else:
+        await stdio_transport.serve(handle_message)
+
+
+def measure_startup(runs: int, transports: list[str]) -> list[dict]:
+    """Start the server repeatedly and time its import and first responses"""
+    import statistics
+    import subprocess
+    import time
+
+    def median_ms(samples):
+        return round(statistics.median(samples) * 1000, 1)
+
+    # Interpreter startup alone, and the cumulative import time of this module
+    floor = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        floor.append(time.perf_counter() - start)
+    trace = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server"],
+                           cwd=os.path.dirname(os.path.abspath(__file__)),
+                           capture_output=True, text=True, check=True).stderr
+    import_us = next(int(line.split('|')[1]) for line in trace.splitlines() if line.rstrip().endswith('| server'))
+
+    requests = [
+        ("initialize", {"protocolVersion": "2024-11-05", "capabilities": {},
+                        "clientInfo": {"name": "measure-startup", "version": "1.0.0"}}),
+        ("tools/list", {}),
+        ("tools/call", {"name": "echo", "arguments": {"text": "hi"}}),
+    ]
+    results = []
+    for transport in transports:
+        env = {**os.environ, "MCP_STDIO_TRANSPORT": transport}
+        samples: dict[str, list] = {method: [] for method, _ in requests}
+        # The first start builds the snapshot (and warms the page cache)
+        for run in range(runs + 1):
+            start = time.perf_counter()
+            proc = subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env,
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            for request_id, (method, params) in enumerate(requests, 1):
+                proc.stdin.write(dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}) + b"\n")
+                proc.stdin.flush()
+                proc.stdout.readline()
+                if run:
+                    samples[method].append(time.perf_counter() - start)
+                if method == "initialize":
+                    proc.stdin.write(b'{"jsonrpc":"2.0","method":"notifications/initialized"}\n')
+            proc.stdin.close()
+            proc.wait()
+        results.append({
+            "transport": transport,
+            "python_ms": median_ms(floor),
+            "import_ms": round(import_us / 1000, 1),
+            "initialize_ms": median_ms(samples["initialize"]),
+            "tools_list_ms": median_ms(samples["tools/list"]),
+            "first_call_ms": median_ms(samples["tools/call"]),
+        })
+    return results
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if "--measure-startup" in sys.argv[1:]:
+        import argparse
+
+        parser = argparse.ArgumentParser(description="Time server.py from process start to its first responses")
+        parser.add_argument("--measure-startup", action="store_true")
+        parser.add_argument("--runs", type=int, default=10)
+        parser.add_argument("--transports", default="buffered,sdk", help="comma-separated: buffered, sdk")
+        args = parser.parse_args()
+        print(f"{'transport':<12}{'python (ms)':>13}{'import (ms)':>13}{'initialize':>12}{'tools/list':>12}{'tools/call':>12}")
+        for r in measure_startup(args.runs, args.transports.split(",")):
+            print(f"{r['transport']:<12}{r['python_ms']:>13}{r['import_ms']:>13}{r['initialize_ms']:>12}"
+                  f"{r['tools_list_ms']:>12}{r['first_call_ms']:>12}")
+    else:
+        asyncio.run(main())
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Session routing between worker processes
+A session stream lives in the worker that accepted its GET /sse, but its
+/messages POSTs can reach any worker. With MCP_SESSION_DIR set, each
+worker records the sessions it holds in a memory-mapped table in that
+directory and listens on a Unix socket there; a worker receiving a
+message for a session held elsewhere passes the request to the owner
+over its socket and relays the answer
+"""
+
+import atexit
+import fcntl
+import http.client
+import mmap
+import os
+import socket
+import struct
+import threading
+from typing import Any, Optional
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from sessions import SessionNotFound
+
+
+# Directory shared by the workers for the session table and their sockets (unset: no routing)
+SESSION_DIR = os.environ.get('MCP_SESSION_DIR')
+
+# Sessions the table can hold across all workers
+SESSION_TABLE_SLOTS = int(os.environ.get('MCP_SESSION_TABLE_SLOTS', 65536))
+
+# WSGI environ key marking a request passed on by another worker
+ROUTED_KEY = 'mcp.routed'
+
+
+def routed(environ: dict) -> bool:
+    """Whether a request was passed on by another worker (and already admitted there)"""
+    return environ.get(ROUTED_KEY, False)
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Werkzeug request handler without the per-request access log line"""
+
+    def log_request(self, code: Any = "-", size: Any = "-"):
+        pass
+
+
+class SessionTable:
+    """Session id -> owning worker pid, in a memory-mapped file the workers share
+
+    Each slot holds the 16 bytes of a session's uuid and its owner's pid
+    (0 once released). A lookup probes a few slots under a thread lock
+    plus a file lock; a new session takes a free slot or one whose owner
+    has died.
+    """
+
+    SLOT = struct.Struct("<16sI")
+    PROBES = 16
+
+    def __init__(self, path: str, slots: int = SESSION_TABLE_SLOTS):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = self.slots * self.SLOT.size
+        if os.fstat(fd).st_size != size:
+            os.ftruncate(fd, size)
+        self._map = mmap.mmap(fd, size)
+        self._fd = fd
+
+    def _locked(self, operation, key: bytes, *args) -> Any:
+        with self._lock:
+            if self._map is None:
+                self._open()
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                return operation(key, *args)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _offsets(self, key: bytes):
+        start = int.from_bytes(key[:8], 'little') % self.slots
+        for probe in range(self.PROBES):
+            yield ((start + probe) % self.slots) * self.SLOT.size
+
+    def _set(self, key: bytes, pid: int) -> bool:
+        table, slot = self._map, self.SLOT
+        free = None
+        for offset in self._offsets(key):
+            slot_key, owner = slot.unpack_from(table, offset)
+            if slot_key == key:
+                free = offset
+                break
+            if free is None and (owner == 0 or not pid_alive(owner)):
+                free = offset
+            if slot_key == bytes(16):
+                break
+        if free is None:
+            return False
+        slot.pack_into(table, free, key, pid)
+        return True
+
+    def _get(self, key: bytes) -> Optional[int]:
+        for offset in self._offsets(key):
+            slot_key, owner = self.SLOT.unpack_from(self._map, offset)
+            if slot_key == key:
+                return owner or None
+            if slot_key == bytes(16):
+                break
+        return None
+
+    def _delete(self, key: bytes, pid: int):
+        for offset in self._offsets(key):
+            slot_key, owner = self.SLOT.unpack_from(self._map, offset)
+            if slot_key == key:
+                if owner == pid:
+                    # The key stays, so probes for keys placed after it go on
+                    self.SLOT.pack_into(self._map, offset, key, 0)
+                return
+            if slot_key == bytes(16):
+                return
+
+    def set(self, session_id: str, pid: int) -> bool:
+        """Record pid as the session's owner; False if the table has no room for it"""
+        key = session_key(session_id)
+        return key is not None and self._locked(self._set, key, pid)
+
+    def get(self, session_id: str) -> Optional[int]:
+        """The pid of the worker holding the session, if any"""
+        key = session_key(session_id)
+        return None if key is None else self._locked(self._get, key)
+
+    def delete(self, session_id: str, pid: int):
+        """Forget the session if pid still owns it"""
+        key = session_key(session_id)
+        if key is not None:
+            self._locked(self._delete, key, pid)
+
+
+def session_key(session_id: Optional[str]) -> Optional[bytes]:
+    """The table key for a session id (uuid hex), or None for anything else"""
+    if not session_id or len(session_id) != 32:
+        return None
+    try:
+        return bytes.fromhex(session_id)
+    except ValueError:
+        return None
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP/1.1 connection to a worker's Unix socket"""
+
+    def __init__(self, socket_path: str):
+        super().__init__('localhost')
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class SessionRouter:
+    """This worker's share of the session table, and its links to the other workers
+
+    The worker's socket is opened when it first claims a session, serving
+    the app with requests marked as routed. Connections to other workers
+    are kept alive per request thread.
+    """
+
+    def __init__(self, directory: str = SESSION_DIR, slots: int = SESSION_TABLE_SLOTS):
+        self.directory = directory
+        self.table = SessionTable(os.path.join(directory, 'sessions.table'), slots)
+        self.app = None
+        self._listener = None
+        self._listener_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._connections = threading.local()
+
+    def serve(self, app):
+        """Set the WSGI app that answers messages routed to this worker"""
+        self.app = app
+
+    def socket_path(self, pid: int) -> str:
+        return os.path.join(self.directory, f'worker-{pid}.sock')
+
+    def _listen(self):
+        # Started per worker: gunicorn forks after import
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            app = self.app
+
+            def routed_app(environ, start_response):
+                environ[ROUTED_KEY] = True
+                return app(environ, start_response)
+
+            self._listener = make_server('unix://' + self.socket_path(os.getpid()), 0, routed_app,
+                                         threaded=True, request_handler=QuietRequestHandler)
+            threading.Thread(target=self._listener.serve_forever, name="session-router",
+                             daemon=True).start()
+            self._listener_pid = os.getpid()
+            atexit.register(self.close)
+
+    def claim(self, session_id: str):
+        """Record a session opened in this worker"""
+        self._listen()
+        self.table.set(session_id, os.getpid())
+
+    def release(self, session_id: str):
+        self.table.delete(session_id, os.getpid())
+
+    def owner(self, session_id: Optional[str]) -> Optional[int]:
+        """The pid of another worker holding the session, if any"""
+        pid = self.table.get(session_id)
+        return None if pid == os.getpid() else pid
+
+    def close(self):
+        """Stop answering routed messages and remove this worker's socket"""
+        with self._lock:
+            if self._listener is None or self._listener_pid != os.getpid():
+                return
+            self._listener.shutdown()
+            self._listener.server_close()
+            self._listener = None
+            self._listener_pid = None
+        try:
+            os.unlink(self.socket_path(os.getpid()))
+        except OSError:
+            pass
+
+    def _connection(self, pid: int) -> tuple[UnixHTTPConnection, bool]:
+        connections = getattr(self._connections, 'by_pid', None)
+        if connections is None:
+            connections = self._connections.by_pid = {}
+        connection = connections.get(pid)
+        if connection is not None:
+            return connection, True
+        connection = connections[pid] = UnixHTTPConnection(self.socket_path(pid))
+        return connection, False
+
+    def forward(self, pid: int, path: str, body: bytes, headers: dict) -> tuple[int, str, bytes]:
+        """POST a request to the worker with pid; returns status, content type and body
+
+        Raises SessionNotFound when that worker can't be reached.
+        """
+        while True:
+            connection, reused = self._connection(pid)
+            try:
+                connection.request('POST', path, body, headers)
+                response = connection.getresponse()
+                return response.status, response.getheader('Content-Type', ''), response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                del self._connections.by_pid[pid]
+                # A kept-alive connection the worker has since closed: the
+                # request never arrived, so try once on a fresh one
+                if reused:
+                    continue
+                raise SessionNotFound(path) from None
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Long-lived SSE sessions for the MCP transports
+A client opens GET /sse, receives a session id, and POSTs JSON-RPC messages
+to /messages?session_id=...; the POST is answered as soon as the message is
+accepted, and responses are pushed onto the open stream through a bounded
+per-session queue
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Optional
+
+from mcp_protocol import expects_response, handle_message, handle_payload, in_flight
+from metrics import QUEUE_WAIT_SECONDS
+from resource_subscriptions import Subscriber, hub, subscriber
+
+
+# Seconds between keepalive comments on an idle stream
+KEEPALIVE_INTERVAL = float(os.environ.get('SSE_KEEPALIVE_INTERVAL', 15))
+
+# Maximum number of undelivered events buffered per session
+SESSION_QUEUE_SIZE = int(os.environ.get('SSE_SESSION_QUEUE_SIZE', 100))
+
+# Seconds a POST waits for queue space before the session is reported busy
+SESSION_PUT_TIMEOUT = float(os.environ.get('SSE_SESSION_PUT_TIMEOUT', 5))
+
+# Messages a session handles at once; more are turned away as busy
+SESSION_MAX_PENDING = int(os.environ.get('SSE_SESSION_MAX_PENDING', SESSION_QUEUE_SIZE))
+
+MESSAGES_PATH = '/messages'
+
+
+class SessionNotFound(KeyError):
+    """Raised when a message targets an unknown or closed session"""
+
+
+class SessionBusy(RuntimeError):
+    """Raised when a session can't take more: its queue is full or too many messages are pending"""
+
+
+class Session:
+    """One open SSE stream and the queue of events waiting to be sent on it
+
+    All methods must be called on the event loop that owns the session.
+    """
+
+    def __init__(self, session_id: str, max_queue: int = SESSION_QUEUE_SIZE,
+                 max_pending: int = SESSION_MAX_PENDING):
+        self.id = session_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.max_pending = max_pending
+        # Accepted messages still being handled
+        self.pending: set[asyncio.Task] = set()
+        self.created = time.time()
+        self.last_active = self.created
+        self.closed = False
+        # Calls running for this session by request id (see mcp_protocol.cancellable)
+        self.requests: dict[Any, asyncio.Task] = {}
+        # Receives the notifications for resources/subscribe on this session
+        self.subscriber = Subscriber(self.notify)
+
+    @property
+    def endpoint(self) -> str:
+        """URL the client should POST messages to"""
+        return f"{MESSAGES_PATH}?session_id={self.id}"
+
+    async def push(self, event: Any, timeout: Optional[float] = SESSION_PUT_TIMEOUT):
+        """Queue an event for the stream, waiting up to timeout (None: no limit) for space if the client is slow"""
+        if self.closed:
+            raise SessionNotFound(self.id)
+        try:
+            await asyncio.wait_for(self.queue.put((time.perf_counter(), event)), timeout)
+        except asyncio.TimeoutError:
+            raise SessionBusy(f"Session {self.id} is not draining its stream")
+
+    def notify(self, event: Any) -> bool:
+        """Queue a notification without waiting; False (and dropped) if the queue is full"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait((time.perf_counter(), event))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def accept(self, data: Any,
+                     handler: Callable[..., AsyncIterator[dict]] = handle_payload,
+                     deadline: Optional[float] = None,
+                     on_done: Optional[Callable[[], Any]] = None):
+        """Take a JSON-RPC message or batch for handling, without waiting for it
+
+        Requests are handled in the background and their responses go to the
+        stream; notifications (cancellation, say) are handled before
+        returning. Raises SessionNotFound, or SessionBusy while the stream
+        is backed up or max_pending messages are being handled, before any
+        of the message has run. If accept returns, on_done is called once
+        the message has been handled.
+        """
+        if self.closed:
+            raise SessionNotFound(self.id)
+        if not expects_response(data):
+            await self.submit(data, handler, deadline)
+            if on_done is not None:
+                on_done()
+            return
+        if self.queue.full() or len(self.pending) >= self.max_pending:
+            raise SessionBusy(f"Session {self.id} is not draining its stream")
+        task = asyncio.get_running_loop().create_task(self.submit(data, handler, deadline, put_timeout=None))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+        if on_done is not None:
+            task.add_done_callback(lambda _: on_done())
+
+    async def submit(self, data: Any,
+                     handler: Callable[..., AsyncIterator[dict]] = handle_payload,
+                     deadline: Optional[float] = None,
+                     put_timeout: Optional[float] = SESSION_PUT_TIMEOUT):
+        """Handle a JSON-RPC message or batch and push responses onto the stream
+
+        Calls can be aborted by a notifications/cancelled message naming
+        their id on this session.
+        """
+        self.last_active = time.time()
+        token = in_flight.set(self.requests)
+        subscriber_token = subscriber.set(self.subscriber)
+        try:
+            # Notifications (no id) get no response
+            if not expects_response(data):
+                await handle_message(data)
+                return
+            async for response in handler(data, deadline):
+                await self.push(response, put_timeout)
+        finally:
+            subscriber.reset(subscriber_token)
+            in_flight.reset(token)
+
+    async def next_event(self, timeout: float = KEEPALIVE_INTERVAL) -> Optional[Any]:
+        """Wait for the next event; None means the stream should send a keepalive"""
+        try:
+            queued, event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued, "session")
+        return event
+
+    def close(self):
+        self.closed = True
+        # Nobody is left to read the responses (close() may run on a request thread)
+        for task in [*self.requests.values(), *self.pending]:
+            task.get_loop().call_soon_threadsafe(task.cancel)
+        self.requests.clear()
+        hub.drop(self.subscriber)
+
+
+class SessionManager:
+    """Registry of the open sessions in this worker process
+
+    With a router (session_routing.SessionRouter), sessions are also
+    recorded where the other worker processes can find them.
+    """
+
+    def __init__(self, router: Any = None):
+        self._sessions: dict[str, Session] = {}
+        self.router = router
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id: Optional[str]) -> bool:
+        return (session_id or '') in self._sessions
+
+    def create(self) -> Session:
+        session = Session(uuid.uuid4().hex)
+        self._sessions[session.id] = session
+        if self.router is not None:
+            self.router.claim(session.id)
+        return session
+
+    def get(self, session_id: Optional[str]) -> Session:
+        session = self._sessions.get(session_id or '')
+        if session is None or session.closed:
+            raise SessionNotFound(session_id)
+        return session
+
+    def remove(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+            if self.router is not None:
+                self.router.release(session_id)
+
+
+def endpoint_event(session: Session) -> bytes:
+    """First frame of a session stream, telling the client where to POST"""
+    return f"event: endpoint\ndata: {session.endpoint}\n\n".encode()
+
+
+KEEPALIVE_COMMENT = b": keepalive\n\n"
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Buffered JSON-RPC transport over stdin/stdout for server.py
+Each request runs as its own task, at most MCP_STDIO_MAX_CONCURRENT at
+once (reading pauses while they are all running), and responses are
+written as they complete, with those ready together joined into one
+write and flush. Lines are read on the event loop rather than a worker
+thread per line, and nothing here imports the MCP SDK
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from contextvars import ContextVar
+from typing import Any, Awaitable, BinaryIO, Callable, Optional
+
+from request_limits import MAX_BODY_SIZE, READ_CHUNK_SIZE, BodyTooLarge
+from serializer import dumps, loads
+
+
+# Requests handled at once (0: unlimited)
+STDIO_MAX_CONCURRENT = int(os.environ.get('MCP_STDIO_MAX_CONCURRENT', 32))
+
+# Most bytes joined into one write to stdout
+STDIO_WRITE_BUFFER = int(os.environ.get('MCP_STDIO_WRITE_BUFFER', 256 * 1024))
+
+# Seconds to wait at end of input for requests still running
+DRAIN_TIMEOUT = 5.0
+
+# Takes a parsed message; returns the encoded response line, or None for none
+Handler = Callable[[Any], Awaitable[Optional[bytes]]]
+
+# Queues an encoded notification for stdout; set by serve() for the
+# handlers it runs (call it on serve()'s loop)
+send_line: ContextVar[Optional[Callable[[bytes], None]]] = ContextVar('send_line', default=None)
+
+
+def error_line(request_id: Any, code: int, message: str) -> bytes:
+    """An encoded JSON-RPC error response"""
+    return dumps({"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}})
+
+
+async def open_reader(stdin: BinaryIO) -> asyncio.StreamReader:
+    """A StreamReader over stdin: a non-blocking pipe, or a thread for regular files"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_BODY_SIZE, loop=loop)
+    # Our own descriptor, so closing the transport leaves sys.stdin open
+    pipe = os.fdopen(os.dup(stdin.fileno()), 'rb', buffering=0)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader, loop=loop), pipe)
+    except ValueError:
+        # Regular files can't be watched by the event loop
+        def pump():
+            with pipe:
+                while data := pipe.read(READ_CHUNK_SIZE):
+                    loop.call_soon_threadsafe(reader.feed_data, data)
+            loop.call_soon_threadsafe(reader.feed_eof)
+
+        threading.Thread(target=pump, name="stdio-reader", daemon=True).start()
+    return reader
+
+
+async def read_line(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """The next line (None at EOF); raises BodyTooLarge after skipping an oversized one"""
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return e.partial or None
+    except asyncio.LimitOverrunError as e:
+        size = e.consumed
+        await reader.readexactly(e.consumed)
+        while True:
+            try:
+                size += len(await reader.readuntil(b"\n"))
+                break
+            except asyncio.IncompleteReadError as eof:
+                size += len(eof.partial)
+                break
+            except asyncio.LimitOverrunError as more:
+                size += more.consumed
+                await reader.readexactly(more.consumed)
+        raise BodyTooLarge(size, MAX_BODY_SIZE) from None
+
+
+async def write_lines(lines: asyncio.Queue, stdout: BinaryIO):
+    """Write queued response lines until a None arrives, batching those already waiting"""
+    def write(data: bytes):
+        stdout.write(data)
+        stdout.flush()
+
+    closing = False
+    while not closing:
+        line = await lines.get()
+        if line is None:
+            break
+        batch = [line, b"\n"]
+        size = len(line)
+        while size < STDIO_WRITE_BUFFER and not lines.empty():
+            line = lines.get_nowait()
+            if line is None:
+                closing = True
+                break
+            batch += (line, b"\n")
+            size += len(line)
+        # Off the loop, so a client slow to read stalls only the writer;
+        # responses completing meanwhile queue up for the next write
+        await asyncio.to_thread(write, b"".join(batch))
+
+
+async def serve(handler: Handler, max_concurrent: int = STDIO_MAX_CONCURRENT,
+                stdin: Optional[BinaryIO] = None, stdout: Optional[BinaryIO] = None):
+    """Answer newline-delimited JSON-RPC on stdin until it closes
+
+    notifications/cancelled naming a running request cancels its task,
+    and the request gets no response.
+    """
+    reader = await open_reader(stdin or sys.stdin.buffer)
+    lines: asyncio.Queue = asyncio.Queue()
+    writer = asyncio.create_task(write_lines(lines, stdout or sys.stdout.buffer))
+    send_line.set(lines.put_nowait)
+    slots = asyncio.Semaphore(max_concurrent) if max_concurrent > 0 else None
+    requests: dict[Any, asyncio.Task] = {}
+    notifications: set[asyncio.Task] = set()
+
+    async def run(message: Any):
+        try:
+            line = await handler(message)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            line = error_line(message.get('id') if isinstance(message, dict) else None, -32603, str(e))
+        if line is not None:
+            lines.put_nowait(line)
+
+    def finished(request_id: Any, task: asyncio.Task):
+        if requests.get(request_id) is task:
+            del requests[request_id]
+        if slots is not None:
+            slots.release()
+
+    while True:
+        try:
+            line = await read_line(reader)
+            if line is None:
+                break
+            if not line.strip():
+                continue
+            message = loads(line)
+        except BodyTooLarge as e:
+            lines.put_nowait(error_line(None, -32600, str(e)))
+            continue
+        except ValueError:
+            lines.put_nowait(error_line(None, -32700, "Parse error"))
+            continue
+
+        if isinstance(message, dict) and 'method' in message and 'id' in message:
+            if slots is not None:
+                # Waits here while every slot is busy, leaving the rest in the pipe
+                await slots.acquire()
+            request_id = message['id']
+            task = asyncio.create_task(run(message))
+            task.add_done_callback(lambda task, request_id=request_id: finished(request_id, task))
+            requests[request_id] = task
+        elif isinstance(message, dict) and message.get('method') == 'notifications/cancelled':
+            params = message.get('params')
+            task = requests.pop(params.get('requestId'), None) if isinstance(params, dict) else None
+            if task is not None:
+                task.cancel()
+        else:
+            # Other notifications, and anything malformed, skip the slots
+            task = asyncio.create_task(run(message))
+            notifications.add(task)
+            task.add_done_callback(notifications.discard)
+
+    # Let running requests answer before the process exits
+    running = [*requests.values(), *notifications]
+    if running:
+        done, pending = await asyncio.wait(running, timeout=DRAIN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+    lines.put_nowait(None)
+    await writer
@@ -4,9 +4,15 @@ Test script for the MCP HTTP server
 Run this to verify all endpoints are working correctly
 """
 
+import asyncio
 import requests
 import sys
 import json
+import os
+import threading
+
+import httpx
+import pytest
 
 def test_server(base_url="http://localhost:8000"):
     """Test all server endpoints"""
@@ -201,6 +207,970 @@ def test_server(base_url="http://localhost:8000"):
         return 1
 
 
+# The function above checks a running server; pytest collects the checks below
+test_server.__test__ = False
+
+
+# In-process checks of the MCP SSE server (python -m pytest test_server.py)
+
+@pytest.fixture
+def sse_app():
+    import mcp_sse_server
+    return mcp_sse_server
+
+
+@pytest.fixture
+def client(sse_app):
+    return sse_app.app.test_client()
+
+
+def sse_messages(body: bytes) -> list:
+    """The JSON-RPC messages in a buffered SSE response"""
+    return [json.loads(line[len(b"data: "):]) for line in body.splitlines() if line.startswith(b"data: {")]
+
+
+def rpc(method, params=None, request_id=1):
+    message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+    if params is not None:
+        message["params"] = params
+    return message
+
+
+def test_session_round_trip(client):
+    response = client.get('/sse', buffered=False)
+    events = iter(response.response)
+    endpoint = next(events).decode()
+    assert endpoint.startswith("event: endpoint\ndata: /messages?session_id=")
+    next(events)  # server/info
+    path = endpoint.split("data: ")[1].strip()
+
+    posted = client.post(path, json=rpc("tools/call", {"name": "echo", "arguments": {"text": "hi"}}, 7))
+    assert posted.status_code == 202
+    [message] = sse_messages(next(events))
+    assert message["id"] == 7
+    assert message["result"]["content"][0]["text"] == "Echo: hi"
+
+    response.close()
+    assert client.post(path, json=rpc("tools/list")).status_code == 404
+
+
+def test_unknown_session_is_404(client):
+    assert client.post('/messages?session_id=nope', json=rpc("tools/list")).status_code == 404
+
+
+def test_messages_accepts_before_the_call_finishes(client, sse_app, monkeypatch):
+    release = threading.Event()
+    finished = []
+
+    async def slow_handler(data, deadline):
+        await asyncio.to_thread(release.wait, 5)
+        finished.append(data["id"])
+        yield {"jsonrpc": "2.0", "id": data["id"], "result": {}}
+
+    monkeypatch.setattr(sse_app.profiler, "payload_handler", lambda header, data: slow_handler)
+    response = client.get('/sse', buffered=False)
+    events = iter(response.response)
+    path = next(events).decode().split("data: ")[1].strip()
+    next(events)  # server/info
+    try:
+        assert client.post(path, json=rpc("tools/list", request_id=5)).status_code == 202
+        assert finished == []
+        release.set()
+        assert sse_messages(next(events)) == [{"jsonrpc": "2.0", "id": 5, "result": {}}]
+    finally:
+        release.set()
+        response.close()
+
+
+def test_busy_session_is_503(client, sse_app, monkeypatch):
+    handled = []
+
+    async def handler(data, deadline):
+        handled.append(data)
+        yield {}
+
+    monkeypatch.setattr(sse_app.profiler, "payload_handler", lambda header, data: handler)
+    session = sse_app.sessions.create()
+    try:
+        while not session.queue.full():
+            session.queue.put_nowait((0, {}))
+        response = client.post(session.endpoint, json=rpc("tools/list"))
+        assert response.status_code == 503
+        # Turned away before running
+        assert handled == []
+    finally:
+        sse_app.sessions.remove(session.id)
+
+
+def test_batch(client):
+    response = client.post('/sse', json=[
+        rpc("tools/call", {"name": "echo", "arguments": {"text": "a"}}, 1),
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        rpc("tools/call", {"name": "reverse_text", "arguments": {"text": "ab"}}, 2),
+        rpc("no/such/method", {}, 3),
+    ])
+    by_id = {message["id"]: message for message in sse_messages(response.data)}
+    assert sorted(by_id) == [1, 2, 3]
+    assert by_id[1]["result"]["content"][0]["text"] == "Echo: a"
+    assert by_id[2]["result"]["content"][0]["text"] == "Reversed: ba"
+    assert by_id[3]["error"]["code"] == -32601
+
+
+def test_streamed_call_sends_chunks_as_progress(client, monkeypatch):
+    import tools
+    monkeypatch.setattr(tools, "STREAM_CHUNK_SIZE", 4)
+    # reverse_text runs on the thread pool, echo inline
+    for name, expected in (("reverse_text", ["Reversed: ", "jihg", "fedc", "ba"]),
+                           ("echo", ["Echo: ", "abcd", "efgh", "ij"])):
+        response = client.post('/sse', json=rpc("tools/call", {
+            "name": name, "arguments": {"text": "abcdefghij"}, "_meta": {"stream": True, "progressToken": "t"}}, 9))
+        *progress, final = sse_messages(response.data)
+        assert [message["params"]["message"] for message in progress] == expected
+        assert [message["params"]["progress"] for message in progress] == [1, 2, 3, 4]
+        assert {message["params"]["progressToken"] for message in progress} == {"t"}
+        assert final == {"jsonrpc": "2.0", "id": 9,
+                         "result": {"content": [], "_meta": {"streamed": True, "chunks": 4}}}
+
+
+def test_chunks_are_sent_as_they_are_produced(client, monkeypatch):
+    from tool_registry import ToolSpec
+    from tools import registry
+    release = threading.Event()
+
+    async def slow(arguments):
+        yield "first"
+        await asyncio.to_thread(release.wait, 5)
+        yield "second"
+
+    monkeypatch.setitem(registry._tools, "slow", ToolSpec("slow", "Two chunks", {"type": "object"}, slow))
+    response = client.post('/sse', json=rpc("tools/call", {"name": "slow", "_meta": {"stream": True}}),
+                           buffered=False)
+    events = iter(response.response)
+    try:
+        [first] = sse_messages(next(events))
+        assert first["params"]["message"] == "first"
+        release.set()
+        messages = sse_messages(b"".join(events))
+        assert messages[0]["params"]["message"] == "second"
+        assert messages[1]["result"]["_meta"]["chunks"] == 2
+    finally:
+        release.set()
+        response.close()
+
+
+def test_streamed_call_errors(client):
+    response = client.post('/sse', json=rpc("tools/call", {
+        "name": "echo", "arguments": {}, "_meta": {"stream": True}}, 3))
+    [message] = sse_messages(response.data)
+    assert message["id"] == 3
+    assert message["error"]["code"] == -32602
+
+
+def test_invalid_arguments_are_32602(client):
+    response = client.post('/sse', json=[
+        rpc("tools/call", {"name": "echo", "arguments": {}}, 1),
+        rpc("tools/call", {"name": "calculate", "arguments": {"operation": "pow", "a": 1, "b": 2}}, 2),
+        rpc("tools/call", {"name": "calculate", "arguments": {"operation": "add", "a": "1", "b": 2}}, 3),
+        rpc("tools/call", ["echo"], 4),
+    ])
+    errors = {message["id"]: message["error"] for message in sse_messages(response.data)}
+    assert {error["code"] for error in errors.values()} == {-32602}
+    assert errors[1]["message"] == "Invalid params: arguments.text is required"
+    assert errors[2]["message"].startswith("Invalid params: arguments.operation must be one of: add")
+    assert errors[3]["message"] == "Invalid params: arguments.a must be of type number or array"
+
+
+def test_compiled_schema_falls_back_to_jsonschema():
+    from schema import InvalidArgumentsError, compile_schema
+    compiled = compile_schema({"type": "object", "required": ["n"],
+                               "properties": {"n": {"type": "integer", "maximum": 3}}})
+    compiled({"n": 3})
+    with pytest.raises(InvalidArgumentsError, match=r"arguments\.n must be <= 3"):
+        compiled({"n": 4})
+
+    # "pattern" is not compiled, so jsonschema checks it
+    checked = compile_schema({"type": "object", "properties": {"code": {"type": "string", "pattern": "^[A-Z]+$"}}})
+    checked({"code": "ABC"})
+    with pytest.raises(InvalidArgumentsError, match=r"arguments\.code: "):
+        checked({"code": "abc"})
+
+
+def test_serializer_round_trips():
+    from serializer import canonical, dumps, loads, text_content_result
+    text = 'quote " backslash \\ newline \n snowman ☃'
+    assert loads(text_content_result(text)) == {"content": [{"type": "text", "text": text}]}
+    assert loads(dumps({"big": 2 ** 70})) == {"big": 2 ** 70}
+    assert canonical({"b": 1, "a": [2, {"d": 3, "c": 4}]}) == b'{"a":[2,{"c":4,"d":3}],"b":1}'
+    with pytest.raises(ValueError):
+        loads(b'{"jsonrpc": ')
+
+
+def test_cached_results_are_spliced_into_messages():
+    from mcp_protocol import encode_message
+    from tool_registry import CachedPayload
+    result = {"tools": [{"name": "echo", "description": "é"}]}
+    spliced = encode_message({"jsonrpc": "2.0", "id": "a", "result": CachedPayload(result)})
+    assert json.loads(spliced) == {"jsonrpc": "2.0", "id": "a", "result": result}
+    assert spliced == encode_message({"jsonrpc": "2.0", "id": "a", "result": result})
+
+
+@pytest.mark.parametrize("backend", ["numpy", "python"])
+def test_batch_calculate(monkeypatch, backend):
+    import vectorized
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(vectorized, "BACKEND", backend)
+    results, divide_by_zero, non_finite = vectorized.evaluate(
+        ["add", "divide", "multiply", "divide"], [1, 1, 1e300, 3], [2, 0, 1e300, 2])
+    assert results == [3.0, None, None, 1.5]
+    assert divide_by_zero == [False, True, False, False]
+    assert non_finite == [False, False, True, False]
+    # Scalars broadcast against lists
+    assert vectorized.evaluate("subtract", [5, 6], 1)[0] == [4.0, 5.0]
+    with pytest.raises(ValueError, match="same length"):
+        vectorized.evaluate("add", [1, 2], [1, 2, 3])
+    with pytest.raises(ValueError, match="Unknown operation: pow"):
+        vectorized.evaluate(["add", "pow"], [1, 2], 1)
+
+
+def test_batch_calculate_call(client):
+    response = client.post('/sse', json=rpc("tools/call", {
+        "name": "calculate", "arguments": {"operation": "divide", "a": [6, 1], "b": [3, 0]}}))
+    [message] = sse_messages(response.data)
+    assert json.loads(message["result"]["content"][0]["text"]) == {
+        "results": [2.0, None], "divide_by_zero": [False, True], "non_finite": [False, False]}
+
+    response = client.post('/sse', json=rpc("tools/call", {
+        "name": "calculate", "arguments": {"operation": "multiply", "a": 1e300, "b": 1e300}}))
+    [message] = sse_messages(response.data)
+    assert message["result"]["content"][0]["text"] == "Error: Result is not a finite number"
+
+
+def test_tools_etag(client):
+    first = client.get('/tools')
+    assert first.status_code == 200 and first.headers["ETag"]
+    again = client.get('/tools', headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+
+
+def test_accept_encoding_negotiation():
+    from response_compression import negotiate
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("deflate;q=1.0, gzip;q=0.5") == "gzip"
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("identity") is None
+    assert negotiate("*;q=0.1") is not None
+    assert negotiate(None) is None
+
+
+def test_compressed_tools_have_a_weak_etag(client, monkeypatch):
+    import gzip
+    import flask_support
+    monkeypatch.setattr(flask_support, "MIN_SIZE", 0)
+    plain = client.get('/tools')
+    assert "Content-Encoding" not in plain.headers
+    assert not plain.headers["ETag"].startswith("W/")
+
+    compressed = client.get('/tools', headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert compressed.headers["ETag"] == "W/" + plain.headers["ETag"]
+    assert gzip.decompress(compressed.data) == plain.data
+    # Either form of the tag revalidates
+    for etag in (plain.headers["ETag"], compressed.headers["ETag"]):
+        assert client.get('/tools', headers={"Accept-Encoding": "gzip", "If-None-Match": etag}).status_code == 304
+
+
+def test_asgi_compressed_tools_have_a_weak_etag(monkeypatch):
+    import mcp_asgi_server
+    monkeypatch.setattr(mcp_asgi_server, "MIN_SIZE", 0)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=mcp_asgi_server.app),
+                                     base_url="http://mcp.test") as http:
+            compressed = await http.get('/tools', headers={"Accept-Encoding": "gzip"})
+            plain = await http.get('/tools', headers={"Accept-Encoding": "identity"})
+            again = await http.get('/tools', headers={"If-None-Match": compressed.headers["ETag"]})
+            return compressed, plain, again
+
+    compressed, plain, again = asyncio.run(scenario())
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] == "W/" + plain.headers["ETag"]
+    assert compressed.json() == plain.json()
+    assert again.status_code == 304
+
+
+def test_sse_stream_is_compressed_event_by_event(client):
+    import zlib
+    response = client.get('/sse', headers={"Accept-Encoding": "gzip"}, buffered=False)
+    try:
+        assert response.headers["Content-Encoding"] == "gzip"
+        decompressor = zlib.decompressobj(31)
+        # Each event is flushed, so it decodes as soon as it arrives
+        first = decompressor.decompress(next(iter(response.response)))
+        assert first.startswith(b"event: endpoint\ndata: /messages?session_id=")
+    finally:
+        response.close()
+
+
+def test_metrics(client):
+    client.post('/sse', json=rpc("tools/call", {"name": "echo", "arguments": {"text": "m"}}))
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    text = response.data.decode()
+    assert 'mcp_http_requests_total{endpoint="/sse",status="200"}' in text
+    assert 'mcp_tool_call_seconds_count{tool="echo"}' in text
+
+
+def test_pure_tool_results_are_cached():
+    import metrics
+    from result_cache import ResultCache
+    from tool_registry import ToolRegistry
+
+    registry = ToolRegistry(ResultCache(max_entries=2))
+    calls = []
+
+    @registry.tool("square", "Squares n", {"type": "object", "properties": {"n": {"type": "number"}}},
+                   cacheable=True)
+    def square(arguments):
+        calls.append(arguments["n"])
+        return str(arguments["n"] ** 2)
+
+    def counted(*key):
+        return metrics.snapshot()[0].get(key, 0)
+
+    hits = ("mcp_tool_cache_lookups_total", ("square", "hit"))
+    evictions = ("mcp_tool_cache_evictions_total", ())
+    hits_before, evictions_before = counted(*hits), counted(*evictions)
+
+    async def scenario():
+        first = await registry.call_result("square", {"n": 3})
+        assert await registry.call_result("square", {"n": 3}) is first
+        for n in (4, 5, 3):
+            await registry.call("square", {"n": n})
+
+    asyncio.run(scenario())
+    # The third distinct result evicted the least recently used, n=3
+    assert calls == [3, 4, 5, 3]
+    assert counted(*hits) - hits_before == 1
+    assert counted(*evictions) - evictions_before == 2
+
+
+def test_cached_results_expire():
+    from result_cache import ResultCache, ToolResult
+    cache = ResultCache()
+    key = cache.key("square", {"n": 3, "m": 1})
+    assert key == cache.key("square", {"m": 1, "n": 3})
+    cache.put(key, ToolResult("9"), ttl=-1)
+    assert cache.get(key) is None
+    cache.put(key, ToolResult("9"), ttl=60)
+    assert cache.get(key).value == "9"
+
+
+def worker_pid(arguments):
+    """A process-pool handler (module level, so the pool can pickle it)"""
+    return os.getpid()
+
+
+def test_blocking_handlers_run_off_the_loop():
+    import time
+    from tool_registry import ToolRegistry
+    registry = ToolRegistry()
+    registry.tool("pid", "This process's id", {"type": "object"}, execution="process")(worker_pid)
+
+    @registry.tool("block", "Sleeps on a pool thread", {"type": "object"}, execution="thread")
+    def block(arguments):
+        time.sleep(0.2)
+        return threading.current_thread().name
+
+    async def scenario():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(tick())
+        thread = await registry.call("block", {})
+        ticker.cancel()
+        return thread, ticks, await registry.call("pid", {})
+
+    thread, ticks, pid = asyncio.run(scenario())
+    assert thread.startswith("tool-worker")
+    # The loop kept running while the handler slept
+    assert ticks >= 5
+    assert pid != os.getpid()
+
+
+def test_slot_is_held_until_abandoned_pool_work_finishes():
+    from tool_registry import ToolRegistry, ToolTimeout
+    registry = ToolRegistry()
+    release = threading.Event()
+    started = []
+
+    @registry.tool("stuck", "Blocks until released", {"type": "object"},
+                   execution="thread", max_concurrency=1, timeout=0.05)
+    def stuck(arguments):
+        started.append(arguments["n"])
+        release.wait(5)
+        return "done"
+
+    async def scenario():
+        with pytest.raises(ToolTimeout):
+            await registry.call("stuck", {"n": 1})
+        second = asyncio.ensure_future(registry.call("stuck", {"n": 2}))
+        await asyncio.sleep(0.1)
+        # The first handler still runs on its thread, so the second waits for the slot
+        assert started == [1]
+        release.set()
+        with pytest.raises(ToolTimeout):
+            await second
+
+    asyncio.run(scenario())
+
+
+def test_execution_overrides(monkeypatch):
+    from executors import execution_overrides
+    monkeypatch.setenv("TOOL_EXECUTION_MODES", "echo=thread, reverse_text = process")
+    assert execution_overrides() == {"echo": "thread", "reverse_text": "process"}
+    monkeypatch.setenv("TOOL_EXECUTION_MODES", "echo=fibre")
+    with pytest.raises(ValueError):
+        execution_overrides()
+
+
+def test_metrics_of_exited_workers_are_kept(monkeypatch, tmp_path):
+    import subprocess
+    import metrics
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    # A flusher for this test only, without its background thread
+    monkeypatch.setattr(metrics._Flusher, "_run", lambda self: None)
+    monkeypatch.setattr(metrics, "flusher", metrics._Flusher())
+
+    def worker_file(pid, evictions, streams=0):
+        (tmp_path / f"metrics-{pid}.json").write_text(json.dumps({
+            "values": [["mcp_tool_cache_evictions_total", [], evictions],
+                       ["mcp_sse_streams_in_flight", ["session"], streams]],
+            "histograms": []}))
+
+    def evictions():
+        values, _ = metrics.aggregate()
+        return values.get(("mcp_tool_cache_evictions_total", ()), 0)
+
+    own = metrics.snapshot()[0].get(("mcp_tool_cache_evictions_total", ()), 0)
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    worker_file(exited.pid, 7, streams=3)
+    # Left by an earlier process with this worker's pid
+    worker_file(os.getpid(), 5)
+
+    assert evictions() == own + 12
+    assert not (tmp_path / f"metrics-{exited.pid}.json").exists()
+    values, _ = metrics.aggregate()
+    # Counters of exited workers are kept once; their gauges are dropped
+    assert values[("mcp_tool_cache_evictions_total", ())] == own + 12
+    streams = ("mcp_sse_streams_in_flight", ("session",))
+    assert values.get(streams, 0) == metrics.snapshot()[0].get(streams, 0)
+
+    worker_file(exited.pid, 2)
+    metrics.mark_process_dead(exited.pid)
+    assert evictions() == own + 14
+
+
+def test_profiled_request_leaves_a_profile(client, sse_app, monkeypatch, tmp_path):
+    import pstats
+    from profiling import Profiler
+    monkeypatch.setattr(sse_app, "profiler", Profiler(directory=str(tmp_path), tools=frozenset(), rate=1))
+    message = rpc("tools/call", {"name": "reverse_text", "arguments": {"text": "abc"}})
+
+    assert client.post('/sse', json=message).status_code == 200
+    assert list(tmp_path.iterdir()) == []
+    response = client.post('/sse', json=message, headers={"X-MCP-Profile": "1"})
+    assert sse_messages(response.data)[0]["result"]["content"][0]["text"] == "Reversed: cba"
+    [prof] = tmp_path.glob("*-reverse_text.prof")
+    assert pstats.Stats(str(prof)).total_calls > 0
+    lines = prof.with_suffix(".collapsed").read_text().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("handle_payload" in line for line in lines)
+
+    # Over the rate cap, the request runs unprofiled
+    assert client.post('/sse', json=message, headers={"X-MCP-Profile": "1"}).status_code == 200
+    assert len(list(tmp_path.glob("*.prof"))) == 1
+
+
+def test_profiled_tools(tmp_path):
+    from profiling import Profiler
+    profiler = Profiler(directory=str(tmp_path), tools=frozenset({"echo"}), token="secret")
+    echo = rpc("tools/call", {"name": "echo", "arguments": {"text": "x"}})
+    assert profiler.wanted(None, [rpc("tools/list"), echo])
+    assert not profiler.wanted(None, rpc("tools/call", {"name": "reverse_text"}))
+    assert profiler.wanted(None, tool="echo")
+    # A header must carry the token
+    assert not profiler.wanted("wrong", echo)
+    assert profiler.wanted("secret", rpc("tools/list"))
+    assert not Profiler(directory=None, tools=frozenset({"echo"})).wanted("1", echo)
+
+
+def test_body_limit_is_413(client, monkeypatch):
+    import request_limits
+    monkeypatch.setitem(request_limits.ENDPOINT_LIMITS, "/sse", 100)
+    response = client.post('/sse', json=rpc("tools/call", {"name": "echo", "arguments": {"text": "x" * 200}}))
+    assert response.status_code == 413
+
+
+def test_tool_body_limit_is_413(client, monkeypatch):
+    import http_server
+    from tools import registry
+    monkeypatch.setattr(registry.get("echo"), "max_body", 100)
+    text = "x" * 200
+    assert client.post('/sse', json=rpc("tools/call", {"name": "echo", "arguments": {"text": text}})).status_code == 413
+    # Only echo's own limit is tightened
+    assert client.post('/sse', json=rpc("tools/call", {"name": "reverse_text", "arguments": {"text": text}})).status_code == 200
+
+    rest = http_server.app.test_client()
+    response = rest.post('/tools/echo', json={"text": text})
+    assert response.status_code == 413
+    assert "exceeds the limit of 100" in response.get_json()["error"]
+    assert rest.post('/tools/echo', json={"text": "x"}).status_code == 200
+
+
+def test_asgi_chunked_body_limit_is_413(monkeypatch):
+    import mcp_asgi_server
+    import request_limits
+    monkeypatch.setitem(request_limits.ENDPOINT_LIMITS, "/sse", 100)
+
+    async def body():
+        # No Content-Length: the limit is enforced as chunks arrive
+        for _ in range(10):
+            yield b" " * 50
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=mcp_asgi_server.app),
+                                     base_url="http://mcp.test") as http:
+            return await http.post('/sse', content=body(), headers={"Content-Type": "application/json"})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 413
+    assert response.json()["error"]["code"] == -32600
+
+
+def test_rate_limit_is_429(client, monkeypatch, tmp_path):
+    import flask_support
+    from admission import TokenBuckets
+    monkeypatch.setattr(flask_support, "buckets", TokenBuckets(rate=1, burst=1, path=str(tmp_path / "buckets")))
+    message = rpc("tools/call", {"name": "echo", "arguments": {"text": "x"}})
+    assert client.post('/sse', json=message, headers={"X-API-Key": "test"}).status_code == 200
+    limited = client.post('/sse', json=message, headers={"X-API-Key": "test"})
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+
+
+def saturate(monkeypatch, concurrency):
+    """Make every slot of a ConcurrencyLimit busy, with no room to wait"""
+    monkeypatch.setattr(concurrency, "limit", 1)
+    monkeypatch.setattr(concurrency, "active", 1)
+    monkeypatch.setattr(concurrency, "queue", 0)
+
+
+def test_session_call_needs_a_slot(client, sse_app, monkeypatch):
+    session = sse_app.sessions.create()
+    try:
+        saturate(monkeypatch, sse_app.concurrency)
+        response = client.post(session.endpoint, json=rpc("tools/call", {"name": "echo", "arguments": {"text": "x"}}))
+        assert response.status_code == 503
+        assert response.get_json()["error"]["code"] == -32003
+        assert session.queue.empty()
+    finally:
+        sse_app.sessions.remove(session.id)
+
+
+def test_asgi_session_call_needs_a_slot(monkeypatch):
+    import mcp_asgi_server
+
+    async def scenario():
+        session = mcp_asgi_server.sessions.create()
+        try:
+            saturate(monkeypatch, mcp_asgi_server.concurrency)
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=mcp_asgi_server.app),
+                                         base_url="http://mcp.test") as http:
+                response = await http.post(session.endpoint,
+                                           json=rpc("tools/call", {"name": "echo", "arguments": {"text": "x"}}))
+            return response, session.queue.empty()
+        finally:
+            mcp_asgi_server.sessions.remove(session.id)
+
+    response, nothing_queued = asyncio.run(scenario())
+    assert response.status_code == 503
+    assert response.json()["error"]["code"] == -32003
+    assert nothing_queued
+
+
+WORKER = """
+import sys
+sys.path.insert(0, {repo!r})
+from werkzeug.serving import make_server
+from mcp_sse_server import app
+server = make_server("127.0.0.1", 0, app, threaded=True)
+print(server.server_port, flush=True)
+server.serve_forever()
+"""
+
+
+def test_session_messages_are_routed_between_workers(tmp_path):
+    import subprocess
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, "MCP_SESSION_DIR": str(tmp_path)}
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER.format(repo=repo)], env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+               for _ in range(2)]
+    try:
+        holder, other = (f"http://127.0.0.1:{int(worker.stdout.readline())}" for worker in workers)
+        with httpx.Client(timeout=10) as http:
+            with http.stream("GET", holder + "/sse") as stream:
+                lines = stream.iter_lines()
+                path = next(line for line in lines if line.startswith("data: /messages"))[len("data: "):]
+                # Posted to the worker without the stream, answered on the stream
+                message = rpc("tools/call", {"name": "echo", "arguments": {"text": "routed"}}, 4)
+                assert http.post(other + path, json=message).status_code == 202
+                response = next(json.loads(line[len("data: "):]) for line in lines
+                                if line.startswith("data: {") and json.loads(line[len("data: "):]).get("id") == 4)
+                assert response["result"]["content"][0]["text"] == "Echo: routed"
+
+            # Once the holder has gone, the session is unknown everywhere
+            workers[0].kill()
+            workers[0].wait()
+            assert http.post(other + path, json=message).status_code == 404
+    finally:
+        for worker in workers:
+            worker.kill()
+            worker.wait()
+            worker.stdout.close()
+
+
+def test_session_table(tmp_path):
+    import subprocess
+    import uuid
+    from session_routing import SessionTable
+    table = SessionTable(str(tmp_path / "sessions.table"), slots=4)
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+
+    ids = [uuid.uuid4().hex for _ in range(4)]
+    for session_id in ids:
+        assert table.set(session_id, os.getpid())
+    assert table.get(ids[0]) == os.getpid()
+    assert table.get("not-a-session-id") is None
+    assert not table.set(uuid.uuid4().hex, os.getpid())
+
+    # Only the owner can release a session
+    table.delete(ids[0], exited.pid)
+    assert table.get(ids[0]) == os.getpid()
+    table.delete(ids[0], os.getpid())
+    assert table.get(ids[0]) is None
+
+    # The slot of an exited worker's session is reused
+    table.set(ids[1], exited.pid)
+    table.set(ids[0], os.getpid())
+    assert table.set(uuid.uuid4().hex, os.getpid())
+    assert table.get(ids[1]) is None
+    assert [table.get(session_id) for session_id in (ids[0], ids[2], ids[3])] == [os.getpid()] * 3
+
+
+@pytest.fixture(params=["cached", "mapped"])
+def resource_dir(request, tmp_path, monkeypatch):
+    """A resource directory read in 8-byte pages, from the small-file cache or memory-mapped"""
+    import resources
+    registry = resources.ResourceRegistry(str(tmp_path), page_size=8)
+    if request.param == "mapped":
+        registry.small_files = resources.SmallFiles(max_item=0)
+    monkeypatch.setattr(resources, "registry", registry)
+    return tmp_path
+
+
+def read_all(client, uri: str) -> tuple[list, list]:
+    """Read a resource over /sse page by page; returns the pages' contents and _meta"""
+    contents, metas, offset = [], [], 0
+    while offset is not None:
+        response = client.post('/sse', json=rpc("resources/read", {"uri": uri, "_meta": {"offset": offset}}))
+        [message] = sse_messages(response.data)
+        contents.append(message["result"]["contents"][0])
+        metas.append(message["result"]["_meta"])
+        offset = metas[-1].get("nextOffset")
+    return contents, metas
+
+
+def test_paged_resource_reads(client, resource_dir):
+    import base64
+    (resource_dir / "notes.txt").write_text("é" * 10, encoding="utf-8")
+    (resource_dir / "data.bin").write_bytes(bytes(range(20)))
+    response = client.post('/sse', json=rpc("resources/list"))
+    uris = {resource["uri"] for resource in sse_messages(response.data)[0]["result"]["resources"]}
+    assert {"resource://files/notes.txt", "resource://files/data.bin"} <= uris
+
+    contents, metas = read_all(client, "resource://files/data.bin")
+    assert b"".join(base64.b64decode(content["blob"]) for content in contents) == bytes(range(20))
+    assert metas == [{"offset": 0, "length": 8, "size": 20, "nextOffset": 8},
+                     {"offset": 8, "length": 8, "size": 20, "nextOffset": 16},
+                     {"offset": 16, "length": 4, "size": 20}]
+
+    # Text pages end on a character boundary
+    contents, metas = read_all(client, "resource://files/notes.txt")
+    assert [content["text"] for content in contents] == ["éééé", "éééé", "éé"]
+    assert [meta["length"] for meta in metas] == [8, 8, 4]
+
+    response = client.post('/sse', json=rpc("resources/read", {
+        "uri": "resource://files/notes.txt", "_meta": {"offset": 2, "length": 3}}))
+    result = sse_messages(response.data)[0]["result"]
+    assert result["contents"][0]["text"] == "é"
+    assert result["_meta"] == {"offset": 2, "length": 2, "size": 20, "nextOffset": 4}
+
+
+def test_resource_read_errors(client, resource_dir):
+    (resource_dir / "notes.txt").write_text("hello")
+    (resource_dir.parent / "outside.txt").write_text("secret")
+    response = client.post('/sse', json=[
+        rpc("resources/read", {"uri": "resource://files/notes.txt", "_meta": {"offset": -1}}, 1),
+        rpc("resources/read", {"uri": "resource://files/missing.txt"}, 2),
+        rpc("resources/read", {"uri": "resource://files/../outside.txt"}, 3),
+        rpc("resources/read", {}, 4),
+    ])
+    codes = {message["id"]: message["error"]["code"] for message in sse_messages(response.data)}
+    assert codes == {1: -32602, 2: -32002, 3: -32002, 4: -32602}
+
+
+def test_subscribed_session_is_notified_of_changes(client, monkeypatch, tmp_path):
+    import resource_subscriptions
+    import resources
+    registry = resources.ResourceRegistry(str(tmp_path))
+    monkeypatch.setattr(resources, "registry", registry)
+    monkeypatch.setattr(resource_subscriptions.hub, "registry", registry)
+    monkeypatch.setattr(resource_subscriptions.hub, "debounce", 0.05)
+    notes = tmp_path / "notes.txt"
+    notes.write_text("v1")
+    uri = "resource://files/notes.txt"
+
+    # One-shot requests have no stream to notify
+    response = client.post('/sse', json=rpc("resources/subscribe", {"uri": uri}))
+    assert sse_messages(response.data)[0]["error"]["code"] == -32600
+
+    response = client.get('/sse', buffered=False)
+    events = iter(response.response)
+    path = next(events).decode().split("data: ")[1].strip()
+    try:
+        assert client.post(path, json=rpc("resources/subscribe", {"uri": uri}, 2)).status_code == 202
+        assert client.post(path, json=rpc("resources/subscribe", {"uri": "resource://files/none"}, 3)).status_code == 202
+        received = []
+        while len(received) < 2:
+            received += [message for message in sse_messages(next(events)) if message.get("id") in (2, 3)]
+        assert {message["id"]: message.get("error", {}).get("code") for message in received} == {2: None, 3: -32002}
+
+        notes.write_text("v2")
+        # Skipping at most a couple of keepalives
+        messages = next(filter(None, (sse_messages(next(events)) for _ in range(3))))
+        assert messages == [{"jsonrpc": "2.0", "method": "notifications/resources/updated", "params": {"uri": uri}}]
+    finally:
+        response.close()
+
+
+def test_changes_are_coalesced_until_unsubscribed(tmp_path):
+    import time
+    import resources
+    from resource_subscriptions import Subscriber, SubscriptionHub
+    notes = tmp_path / "notes.txt"
+    notes.write_text("v1")
+    uri = "resource://files/notes.txt"
+    hub = SubscriptionHub(resources.ResourceRegistry(str(tmp_path)), debounce=0.2)
+    received = []
+    client = Subscriber(received.append)
+
+    async def settle():
+        # Past the debounce window, with the loop free to take deliveries
+        await asyncio.sleep(0.5)
+
+    async def scenario():
+        hub.subscribe(client, uri)
+        for version in range(5):
+            notes.write_text(f"v{version}")
+            time.sleep(0.01)
+        await settle()
+        changes_seen = len(received)
+        hub.unsubscribe(client, uri)
+        notes.write_text("after")
+        await settle()
+        return changes_seen
+
+    assert asyncio.run(scenario()) == 1
+    assert [json.loads(line) for line in received] == [
+        {"jsonrpc": "2.0", "method": "notifications/resources/updated", "params": {"uri": uri}}]
+    assert client.uris == set()
+
+
+def test_timeout_is_32001(client):
+    response = client.post('/sse', json=rpc("tools/call", {
+        "name": "echo", "arguments": {"text": "late"}, "_meta": {"timeout": 1e-9}}))
+    [message] = sse_messages(response.data)
+    assert message["error"]["code"] == -32001
+
+
+# mcp_client.AsyncMCPClient against a scripted server
+
+class FakeSessionServer:
+    """Speaks the SSE session protocol to an AsyncMCPClient through httpx.MockTransport
+
+    Answers each request with its params as the result. statuses lists
+    responses to give /messages POSTs before handling them.
+    """
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.streams = {}
+        self.posts = []
+
+    async def handle(self, request):
+        if request.method == "GET" and request.url.path == "/sse":
+            session_id = str(len(self.streams))
+            queue = self.streams[session_id] = asyncio.Queue()
+
+            async def events():
+                yield f"event: endpoint\ndata: /messages?session_id={session_id}\n\n".encode()
+                while True:
+                    message = await queue.get()
+                    yield b"event: message\ndata: " + json.dumps(message).encode() + b"\n\n"
+
+            return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=events())
+        if request.url.path == "/messages":
+            payload = json.loads(request.content)
+            self.posts.append((request.url.params["session_id"], payload))
+            if self.statuses:
+                return httpx.Response(self.statuses.pop(0))
+            queue = self.streams[request.url.params["session_id"]]
+            for message in payload if isinstance(payload, list) else [payload]:
+                if "id" in message:
+                    queue.put_nowait({"jsonrpc": "2.0", "id": message["id"], "result": message["params"]})
+            return httpx.Response(202)
+        return httpx.Response(404)
+
+
+def fake_client(server, **options):
+    import mcp_client
+    client = mcp_client.AsyncMCPClient("http://mcp.test", backoff=0.001, **options)
+    client.http = httpx.AsyncClient(base_url="http://mcp.test", transport=httpx.MockTransport(server.handle))
+    return client
+
+
+def test_client_reconnects_after_404():
+    async def scenario():
+        server = FakeSessionServer(statuses=[404])
+        async with fake_client(server) as client:
+            result = await asyncio.wait_for(client.request("tools/call", {"name": "echo"}), 5)
+        return server, result
+
+    server, result = asyncio.run(scenario())
+    assert result == {"name": "echo"}
+    # Resent on a new session rather than failed with the old stream
+    assert [session_id for session_id, _ in server.posts] == ["0", "1"]
+
+
+def test_client_retries_a_busy_session():
+    async def scenario():
+        server = FakeSessionServer(statuses=[503])
+        async with fake_client(server) as client:
+            result = await asyncio.wait_for(client.request("tools/call", {"name": "echo"}), 5)
+        return server, result
+
+    server, result = asyncio.run(scenario())
+    assert result == {"name": "echo"}
+    # Rejected before running, so resent on the same session
+    assert [session_id for session_id, _ in server.posts] == ["0", "0"]
+
+
+def test_client_does_not_resend_after_a_dropped_post():
+    posts = []
+
+    def handle(request):
+        if request.method == "POST":
+            posts.append(request)
+            raise httpx.RemoteProtocolError("Server disconnected without sending a response.", request=request)
+        return httpx.Response(404)
+
+    async def scenario():
+        import mcp_client
+        async with mcp_client.AsyncMCPClient("http://mcp.test", session=False, backoff=0.001) as client:
+            client.http = httpx.AsyncClient(base_url="http://mcp.test", transport=httpx.MockTransport(handle))
+            with pytest.raises(httpx.RemoteProtocolError):
+                await client.request("tools/call", {"name": "echo"})
+
+    asyncio.run(scenario())
+    assert len(posts) == 1
+
+
+def test_client_batches_concurrent_calls():
+    async def scenario():
+        server = FakeSessionServer()
+        async with fake_client(server, max_batch=3) as client:
+            results = await asyncio.wait_for(client.call_tools([("tool", {"n": n}) for n in range(5)]), 5)
+        return server, results
+
+    server, results = asyncio.run(scenario())
+    assert [result["arguments"] for result in results] == [{"n": n} for n in range(5)]
+    # Calls made together share a POST, up to max_batch per POST
+    assert [len(payload) if isinstance(payload, list) else 1 for _, payload in server.posts] == [3, 2]
+
+
+def test_client_one_shot_batch_against_the_server():
+    import mcp_asgi_server
+    import mcp_client
+
+    async def scenario():
+        async with mcp_client.AsyncMCPClient("http://mcp.test", session=False) as client:
+            client.http = httpx.AsyncClient(transport=httpx.ASGITransport(app=mcp_asgi_server.app),
+                                            base_url="http://mcp.test")
+            results = await client.call_tools([("echo", {"text": "a"}), ("reverse_text", {"text": "ab"}),
+                                               ("echo", {})])
+            tools = await client.list_tools()
+            # Revalidated with If-None-Match: the same list back from a 304
+            assert await client.list_tools() is tools
+            return results, tools
+
+    results, tools = asyncio.run(scenario())
+    assert mcp_client.result_text(results[0]) == "Echo: a"
+    assert mcp_client.result_text(results[1]) == "Reversed: ba"
+    assert isinstance(results[2], mcp_client.MCPError) and results[2].code == -32602
+    assert "echo" in {tool["name"] for tool in tools}
+
+
+def test_client_retries_connection_failures():
+    attempts = []
+
+    def handle(request):
+        attempts.append(request)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("Connection refused", request=request)
+        if len(attempts) == 3:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        message = json.loads(request.content)
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"},
+                              content=b"data: " + json.dumps({"jsonrpc": "2.0", "id": message["id"],
+                                                               "result": {}}).encode() + b"\n\n")
+
+    async def scenario(retries):
+        import mcp_client
+        attempts.clear()
+        async with mcp_client.AsyncMCPClient("http://mcp.test", session=False, retries=retries,
+                                             backoff=0.001) as client:
+            client.http = httpx.AsyncClient(base_url="http://mcp.test", transport=httpx.MockTransport(handle))
+            return await client.request("tools/list")
+
+    assert asyncio.run(scenario(retries=3)) == {}
+    assert len(attempts) == 4
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(scenario(retries=1))
+    assert len(attempts) == 2
+
+
 if __name__ == "__main__":
     # Get base URL from command line argument or use default
     base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8000"
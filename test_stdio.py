@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Checks of the buffered stdio transport over real pipes
+Each test starts server.py behind a script that first registers a "sleep"
+tool, so calls can overlap, and the conformance test drives server.py on
+both transports with the MCP SDK client: python -m pytest test_stdio.py
+"""
+
+import asyncio
+import base64
+import json
+import os
+import select
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+from mcp import ClientSession, StdioServerParameters, types
+from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+LAUNCHER = textwrap.dedent("""
+    import asyncio
+    import sys
+
+    sys.path.insert(0, {repo!r})
+    from tools import registry
+
+    running = 0
+
+    @registry.tool("sleep", "Sleeps, then reports how many sleeps were running when it started",
+                   {{"type": "object", "properties": {{"seconds": {{"type": "number"}}}}}})
+    async def sleep(arguments):
+        global running
+        running += 1
+        started_with = running
+        try:
+            await asyncio.sleep(arguments["seconds"])
+        finally:
+            running -= 1
+        return str(started_with)
+
+    import server
+    asyncio.run(server.main())
+""")
+
+
+class StdioServer:
+    def __init__(self, tmp_path, **env):
+        launcher = tmp_path / "launch.py"
+        launcher.write_text(LAUNCHER.format(repo=REPO))
+        self.proc = subprocess.Popen([sys.executable, str(launcher)],
+                                     env={**os.environ, "MCP_STDIO_TRANSPORT": "buffered", **env},
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.buffer = b""
+
+    def send(self, message: dict):
+        self.proc.stdin.write(json.dumps(message).encode() + b"\n")
+        self.proc.stdin.flush()
+
+    def call(self, request_id, seconds):
+        self.send({"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+                   "params": {"name": "sleep", "arguments": {"seconds": seconds}}})
+
+    def receive(self, timeout: float = 10.0):
+        """The next message from stdout, or None if nothing arrives within timeout"""
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self.buffer:
+            ready, _, _ = select.select([self.proc.stdout], [], [], max(0.0, deadline - time.monotonic()))
+            if not ready:
+                return None
+            data = os.read(self.proc.stdout.fileno(), 65536)
+            assert data, "server exited"
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait(timeout=10)
+        self.proc.stdout.close()
+
+
+@pytest.fixture
+def stdio_server(tmp_path):
+    servers = []
+
+    def start(**env):
+        servers.append(StdioServer(tmp_path, **env))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def text(response: dict) -> str:
+    return response["result"]["content"][0]["text"]
+
+
+def test_responses_arrive_as_calls_finish(stdio_server):
+    server = stdio_server()
+    server.call(1, 0.5)
+    server.call(2, 0)
+    server.send({"jsonrpc": "2.0", "id": 3, "method": "ping"})
+    first, second, third = server.receive(), server.receive(), server.receive()
+    assert {first["id"], second["id"]} == {2, 3}
+    assert third["id"] == 1
+    assert text(third) == "1"
+
+
+def test_cancelled_call_gets_no_response(stdio_server):
+    server = stdio_server()
+    server.call(1, 5)
+    server.send({"jsonrpc": "2.0", "method": "notifications/cancelled",
+                 "params": {"requestId": 1, "reason": "test"}})
+    server.call(2, 0)
+    start = time.monotonic()
+    response = server.receive()
+    assert response["id"] == 2
+    # The cancelled sleep no longer counts as running
+    assert text(response) == "1"
+    assert server.receive(timeout=0.5) is None
+    assert time.monotonic() - start < 5
+
+
+def test_max_concurrent_bounds_requests_in_flight(stdio_server):
+    server = stdio_server(MCP_STDIO_MAX_CONCURRENT="2")
+    for request_id in range(1, 7):
+        server.call(request_id, 0.2)
+    responses = [server.receive() for _ in range(6)]
+    assert sorted(response["id"] for response in responses) == [1, 2, 3, 4, 5, 6]
+    assert max(int(text(response)) for response in responses) == 2
+
+
+def test_client_responses_get_no_reply(stdio_server):
+    server = stdio_server()
+    server.send({"jsonrpc": "2.0", "id": 7, "result": {}})
+    server.send({"jsonrpc": "2.0", "id": 8, "error": {"code": -1, "message": "no"}})
+    server.send({"jsonrpc": "2.0", "id": 9, "method": "ping"})
+    assert server.receive() == {"jsonrpc": "2.0", "id": 9, "result": {}}
+    # Long enough for the SDK to load, were they passed to it
+    assert server.receive(timeout=3) is None
+
+
+def server_parameters(transport: str, resource_dir) -> StdioServerParameters:
+    """server.py on the given transport, serving resource_dir in 1 KiB pages"""
+    return StdioServerParameters(
+        command=sys.executable, args=[os.path.join(REPO, "server.py")], cwd=REPO,
+        env={**os.environ, "MCP_STDIO_TRANSPORT": transport, "MCP_RESOURCE_DIR": str(resource_dir),
+             "MCP_RESOURCE_PAGE_SIZE": "1024"})
+
+
+async def sdk_client_results(transport: str, resource_dir) -> dict:
+    """What the MCP SDK client gets back from server.py on the given transport"""
+    results = {}
+
+    async def record(name, call):
+        try:
+            results[name] = (await call).model_dump(mode="json")
+        except McpError as e:
+            results[name] = e.error.model_dump(mode="json")
+
+    async with stdio_client(server_parameters(transport, resource_dir)) as (read, write):
+        async with ClientSession(read, write) as session:
+            await record("initialize", session.initialize())
+            await record("tools/list", session.list_tools())
+            await record("echo", session.call_tool("echo", {"text": "hi"}))
+            await record("echo without text", session.call_tool("echo", {}))
+            await record("unknown tool", session.call_tool("nope", {}))
+            await record("resources/list", session.list_resources())
+            for resource in results["resources/list"]["resources"]:
+                await record(resource["uri"], session.read_resource(resource["uri"]))
+            await record("unknown resource", session.read_resource("resource://files/missing"))
+            await record("subscribe", session.subscribe_resource("resource://files/small.txt"))
+            await record("unsubscribe", session.unsubscribe_resource("resource://files/small.txt"))
+            await record("prompts/list", session.list_prompts())
+            await record("ping", session.send_ping())
+    return results
+
+
+async def read_pages(uri: str, resource_dir) -> bytes:
+    """A resource read through the SDK client page by page, following nextOffset"""
+    data, offset = b"", 0
+    async with stdio_client(server_parameters("buffered", resource_dir)) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            while offset is not None:
+                request = types.ReadResourceRequest(params=types.ReadResourceRequestParams(
+                    uri=uri, _meta={"offset": offset}))
+                result = await session.send_request(types.ClientRequest(request), types.ReadResourceResult)
+                assert result.meta["offset"] == offset == len(data)
+                data += base64.b64decode(result.contents[0].blob)
+                offset = result.meta.get("nextOffset")
+    return data
+
+
+def test_transports_agree_for_the_sdk_client(tmp_path):
+    (tmp_path / "small.txt").write_text("hello\n")
+    (tmp_path / "large.bin").write_bytes(bytes(range(256)) * 10)
+    buffered = asyncio.run(sdk_client_results("buffered", tmp_path))
+    sdk = asyncio.run(sdk_client_results("sdk", tmp_path))
+
+    # The SDK's read handler can only return contents, so only the buffered
+    # transport reports the page in the result's _meta
+    for uri in ("resource://server-info", "resource://files/small.txt", "resource://files/large.bin"):
+        assert sdk[uri]["meta"] is None
+        sdk[uri]["meta"] = buffered[uri]["meta"]
+    assert buffered == sdk
+    assert buffered["resource://files/large.bin"]["meta"] == {
+        "offset": 0, "length": 1024, "size": 2560, "nextOffset": 1024}
+    assert buffered["echo"]["content"][0]["text"] == "Echo: hi"
+    assert buffered["echo without text"]["code"] == -32602
+    assert buffered["unknown tool"]["isError"] is True
+    assert buffered["unknown resource"]["code"] == -32002
+    assert buffered["prompts/list"]["code"] == -32601
+
+
+def test_sdk_client_follows_next_offset(tmp_path):
+    (tmp_path / "large.bin").write_bytes(bytes(range(256)) * 10)
+    assert asyncio.run(read_pages("resource://files/large.bin", tmp_path)) == bytes(range(256)) * 10
+
+
+def test_snapshot_tracks_modules_tools_imports(tmp_path, monkeypatch):
+    import catalogue_snapshot
+    monkeypatch.setattr(catalogue_snapshot, "SNAPSHOT_PATH", str(tmp_path / "snapshot.json"))
+    catalogue_snapshot.save(catalogue_snapshot.build())
+    assert catalogue_snapshot.load() is not None
+
+    # calculate's operation enum comes from vectorized.OPERATIONS
+    path = os.path.join(REPO, "vectorized.py")
+    st = os.stat(path)
+    try:
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        assert catalogue_snapshot.load() is None
+    finally:
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert catalogue_snapshot.load() is not None
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Tool registry shared by all server front-ends
+Tools register with a decorator and are looked up by name in O(1); input
+schemas are compiled into validators at registration, and the catalogue is
+serialized once, so tools/list responses are served from pre-built bytes
+with a stable ETag
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import inspect
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from executors import EXECUTION_MODES, INLINE, PROCESS, execution_overrides, pools
+from metrics import TOOL_CACHE_LOOKUPS, TOOL_CALL_SECONDS
+from response_compression import compress
+from result_cache import ResultCache, ToolResult
+from schema import InvalidArgumentsError, Validator, compile_schema
+from serializer import dumps
+
+
+# Compressed bodies kept per payload (encodings x framings)
+MAX_ENCODED_VARIANTS = 32
+
+# Seconds a tool call may run unless its spec says otherwise (0: no limit)
+DEFAULT_TIMEOUT = float(os.environ.get('MCP_TOOL_TIMEOUT', 60)) or None
+
+
+class CachedPayload:
+    """A JSON value serialized once, with an ETag for conditional requests"""
+
+    def __init__(self, value: Any = None, body: Optional[bytes] = None):
+        self.value = value
+        self.body = dumps(value) if body is None else body
+        self._etag: Optional[str] = None
+        self._encoded: dict[tuple, bytes] = {}
+
+    @property
+    def etag(self) -> str:
+        if self._etag is None:
+            self._etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        return self._etag
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header value covers this payload"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag == '*' or tag.removeprefix('W/') == self.etag:
+                return True
+        return False
+
+    def encoded(self, encoding: str, body: Optional[bytes] = None) -> bytes:
+        """The payload (or a body framing it) compressed with encoding
+
+        Compressed once at the slow, small setting and kept; framed bodies
+        differ only by request id, so a handful of variants cover most clients.
+        """
+        key = (encoding, body)
+        compressed = self._encoded.get(key)
+        if compressed is None:
+            if len(self._encoded) >= MAX_ENCODED_VARIANTS:
+                self._encoded.clear()
+            compressed = compress(self.body if body is None else body, encoding, static=True)
+            self._encoded[key] = compressed
+        return compressed
+
+
+# Marks the end of a chunk stream
+_DONE = object()
+
+
+class UnknownToolError(ValueError):
+    """Raised when a call names a tool that is not registered"""
+
+
+class ToolTimeout(TimeoutError):
+    """Raised when a call outlives its tool's timeout or the caller's deadline"""
+
+
+class ConcurrencySlot:
+    """One of a tool's max_concurrency slots, held for a call
+
+    A call abandoned at its deadline can't stop a handler already running
+    on a pool, so the slot is only given back once that work has finished.
+    """
+
+    def __init__(self, semaphore: Optional[asyncio.Semaphore]):
+        self._semaphore = semaphore
+        self._work: Optional[concurrent.futures.Future] = None
+
+    async def __aenter__(self) -> "ConcurrencySlot":
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._semaphore is None:
+            return
+        if self._work is None:
+            self._semaphore.release()
+        else:
+            loop = asyncio.get_running_loop()
+            self._work.add_done_callback(lambda _: self._release_from(loop))
+
+    def _release_from(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._semaphore.release)
+        except RuntimeError:
+            # The loop has closed, and the semaphore with it
+            pass
+
+    def hold(self, work: concurrent.futures.Future):
+        """Keep the slot until work (the call's latest pool job) is done"""
+        self._work = work
+
+
+def join_chunks(handler: Callable, arguments: dict) -> str:
+    """Run a generator handler to completion (used for process-pool execution)"""
+    return "".join(handler(arguments))
+
+
+@dataclass
+class ToolSpec:
+    """A registered tool: its MCP description, handler and execution metadata"""
+
+    name: str
+    description: str
+    input_schema: dict
+    handler: Callable[[dict], Any]
+    # Seconds before a call is abandoned (None: no limit). Inline sync
+    # handlers block the loop and can't be interrupted; thread and process
+    # pool handlers finish in the background with their result discarded
+    timeout: Optional[float] = DEFAULT_TIMEOUT
+    # Whether results depend only on the arguments and may be reused
+    cacheable: bool = False
+    # Seconds a cached result stays valid (0 disables caching)
+    cache_ttl: float = 60.0
+    # Maximum number of calls running at once (None: unlimited)
+    max_concurrency: Optional[int] = None
+    # Where a sync handler runs: "inline" (on the event loop), "thread" or "process"
+    execution: str = INLINE
+    # Largest request body (bytes) accepted for a call (None: the endpoint limit)
+    max_body: Optional[int] = None
+    is_async: bool = field(init=False)
+    # Generator handlers yield their output in chunks
+    is_streaming: bool = field(init=False)
+    validate: Validator = field(init=False, repr=False)
+    _semaphore: Optional[asyncio.Semaphore] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self.is_async = inspect.iscoroutinefunction(self.handler)
+        self.is_streaming = (inspect.isgeneratorfunction(self.handler)
+                             or inspect.isasyncgenfunction(self.handler))
+        if self.execution not in EXECUTION_MODES:
+            raise ValueError(f"Invalid execution mode for {self.name}: {self.execution!r}")
+        self.validate = compile_schema(self.input_schema)
+        if self.max_concurrency is not None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @property
+    def caches_results(self) -> bool:
+        return self.cacheable and self.cache_ttl > 0
+
+    def to_dict(self) -> dict:
+        """The tool as it appears in a tools/list result"""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "inputSchema": self.input_schema
+        }
+
+    def _limit(self) -> ConcurrencySlot:
+        return ConcurrencySlot(self._semaphore)
+
+    def _deadline(self, deadline: Optional[float]) -> Optional[float]:
+        """The earlier of the caller's deadline and the tool's own timeout (time.monotonic())"""
+        if self.timeout is None:
+            return deadline
+        own = time.monotonic() + self.timeout
+        return own if deadline is None else min(own, deadline)
+
+    async def _until(self, deadline: Optional[float], awaitable: Awaitable) -> Any:
+        """Await work, abandoning it with ToolTimeout at the deadline"""
+        if deadline is None:
+            return await awaitable
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining <= 0:
+                # Spent its time waiting (e.g. in a session queue): don't start it
+                close = getattr(awaitable, 'close', None)
+                if close is not None:
+                    close()
+                raise asyncio.TimeoutError
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            raise ToolTimeout(f"Tool {self.name} timed out") from None
+
+    async def invoke(self, arguments: dict, deadline: Optional[float] = None) -> Any:
+        """Run the handler, honouring the concurrency limit, timeout and caller's deadline"""
+        deadline = self._deadline(deadline)
+        if (self.execution == INLINE and not (self.is_async or self.is_streaming)
+                and self._semaphore is None):
+            # Nothing to interrupt: the handler runs to completion on the loop
+            if deadline is not None and time.monotonic() >= deadline:
+                raise ToolTimeout(f"Tool {self.name} timed out")
+            return self.handler(arguments)
+        return await self._until(deadline, self._limited_run(arguments))
+
+    async def _limited_run(self, arguments: dict) -> Any:
+        async with self._limit() as slot:
+            return await self._run(arguments, slot)
+
+    async def stream(self, arguments: dict, deadline: Optional[float] = None) -> AsyncIterator[Any]:
+        """Yield output chunks as the handler produces them
+
+        Non-streaming tools yield their whole result as a single chunk.
+        The deadline covers the whole stream, not each chunk.
+        """
+        deadline = self._deadline(deadline)
+        async with self._limit() as slot:
+            if not self.is_streaming:
+                yield await self._until(deadline, self._run(arguments, slot))
+                return
+            chunks = self._chunks(arguments, slot)
+            try:
+                while (chunk := await self._until(deadline, anext(chunks, _DONE))) is not _DONE:
+                    yield chunk
+            finally:
+                await chunks.aclose()
+
+    async def _on_pool(self, slot: ConcurrencySlot, fn: Callable, *args: Any) -> Any:
+        work = pools.submit(self.execution, fn, *args)
+        slot.hold(work)
+        return await asyncio.wrap_future(work)
+
+    async def _chunks(self, arguments: dict, slot: ConcurrencySlot) -> AsyncIterator[Any]:
+        if inspect.isasyncgenfunction(self.handler):
+            async for chunk in self.handler(arguments):
+                yield chunk
+        elif self.execution == PROCESS:
+            # Generators can't cross the process boundary; ship the joined output
+            yield await self._on_pool(slot, join_chunks, self.handler, arguments)
+        elif self.execution == INLINE:
+            for chunk in self.handler(arguments):
+                yield chunk
+                # Let other requests run between chunks
+                await asyncio.sleep(0)
+        else:
+            chunks = self.handler(arguments)
+            done = object()
+            while (chunk := await self._on_pool(slot, next, chunks, done)) is not done:
+                yield chunk
+
+    async def _collect(self, arguments: dict, slot: ConcurrencySlot) -> str:
+        return "".join([chunk async for chunk in self._chunks(arguments, slot)])
+
+    async def _run(self, arguments: dict, slot: ConcurrencySlot) -> Any:
+        if self.is_streaming:
+            pending = self._collect(arguments, slot)
+        elif self.is_async:
+            pending = self.handler(arguments)
+        elif self.execution == INLINE:
+            return self.handler(arguments)
+        else:
+            pending = self._on_pool(slot, self.handler, arguments)
+        return await pending
+
+
+class ToolRegistry:
+    """Name-indexed collection of tools"""
+
+    def __init__(self, result_cache: Optional[ResultCache] = None):
+        self._tools: dict[str, ToolSpec] = {}
+        self._execution_overrides = execution_overrides()
+        self._tools_list: Optional[CachedPayload] = None
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __iter__(self):
+        return iter(self._tools.values())
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def register(self, spec: ToolSpec) -> ToolSpec:
+        if spec.name in self._tools:
+            raise ValueError(f"Tool already registered: {spec.name}")
+        self._tools[spec.name] = spec
+        self._tools_list = None
+        return spec
+
+    def tool(self, name: str, description: str, input_schema: dict, **metadata):
+        """Decorator registering a handler that takes the call's arguments dict
+
+        Handlers using execution="process" must be module-level functions so
+        the pool can pickle them; the decorator returns the handler unchanged.
+        """
+        if name in self._execution_overrides:
+            metadata["execution"] = self._execution_overrides[name]
+
+        def decorator(handler):
+            self.register(ToolSpec(name, description, input_schema, handler, **metadata))
+            return handler
+        return decorator
+
+    def get(self, name: str) -> ToolSpec:
+        try:
+            return self._tools[name]
+        except KeyError:
+            raise UnknownToolError(f"Unknown tool: {name}") from None
+
+    @property
+    def catalogue(self) -> list[dict]:
+        """All tools as they appear in a tools/list result"""
+        return [spec.to_dict() for spec in self._tools.values()]
+
+    @property
+    def tools_list(self) -> CachedPayload:
+        """The tools/list result, serialized once per registry change"""
+        if self._tools_list is None:
+            self._tools_list = CachedPayload({"tools": self.catalogue})
+        return self._tools_list
+
+    def validate(self, name: str, arguments: Optional[dict]) -> ToolSpec:
+        """Check arguments against a tool's schema, raising InvalidArgumentsError"""
+        spec = self.get(name)
+        spec.validate({} if arguments is None else arguments)
+        return spec
+
+    async def call_result(self, name: str, arguments: Optional[dict], validate: bool = True,
+                          deadline: Optional[float] = None) -> ToolResult:
+        """Dispatch a tool call by name, serving cacheable tools from the result cache
+
+        deadline (a time.monotonic() value) tightens the tool's own timeout.
+        """
+        spec = self.get(name)
+        start = time.perf_counter()
+        try:
+            arguments = {} if arguments is None else arguments
+            if validate:
+                spec.validate(arguments)
+
+            key = self.result_cache.key(name, arguments) if spec.caches_results else None
+            if key is not None:
+                cached = self.result_cache.get(key)
+                TOOL_CACHE_LOOKUPS.inc(name, "miss" if cached is None else "hit")
+                if cached is not None:
+                    return cached
+
+            result = ToolResult(await spec.invoke(arguments, deadline))
+            if key is not None:
+                self.result_cache.put(key, result, spec.cache_ttl)
+            return result
+        finally:
+            TOOL_CALL_SECONDS.observe(time.perf_counter() - start, name)
+
+    async def call(self, name: str, arguments: Optional[dict], validate: bool = True,
+                   deadline: Optional[float] = None) -> Any:
+        """Dispatch a tool call by name and return the handler's value"""
+        return (await self.call_result(name, arguments, validate, deadline)).value
+
+    async def stream(self, name: str, arguments: Optional[dict], validate: bool = True,
+                     deadline: Optional[float] = None) -> AsyncIterator[Any]:
+        """Dispatch a tool call by name, yielding output chunks as they are produced
+
+        Streamed calls bypass the result cache: holding the output for reuse
+        would defeat the point of streaming it.
+        """
+        spec = self.get(name)
+        start = time.perf_counter()
+        try:
+            arguments = {} if arguments is None else arguments
+            if validate:
+                spec.validate(arguments)
+            async for chunk in spec.stream(arguments, deadline):
+                yield chunk
+        finally:
+            TOOL_CALL_SECONDS.observe(time.perf_counter() - start, name)
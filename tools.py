@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Built-in tools: echo, current time, calculate and reverse text
+Each front-end imports `registry` from here to list and call them
+"""
+
+import math
+import os
+from datetime import datetime
+from typing import Iterator
+
+from serializer import dumps
+from tool_registry import InvalidArgumentsError, ToolRegistry
+from vectorized import OPERATIONS, batch_length, evaluate
+
+
+registry = ToolRegistry()
+
+# Characters per chunk for tools that stream their output
+STREAM_CHUNK_SIZE = int(os.environ.get('TOOL_STREAM_CHUNK_SIZE', 64 * 1024))
+
+# A number, or an array of numbers evaluated element-wise
+NUMBERS = {"type": ["number", "array"], "items": {"type": "number"}}
+
+
+@registry.tool(
+    name="echo",
+    description="Echoes back the input text",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "text": {
+                "type": "string",
+                "description": "The text to echo back"
+            }
+        },
+        "required": ["text"]
+    },
+    cacheable=True,
+)
+def echo(arguments: dict) -> Iterator[str]:
+    """Return the input text"""
+    text = arguments.get("text", "")
+    yield "Echo: "
+    for start in range(0, len(text), STREAM_CHUNK_SIZE):
+        yield text[start:start + STREAM_CHUNK_SIZE]
+
+
+@registry.tool(
+    name="get_current_time",
+    description="Returns the current server time",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "timezone": {
+                "type": "string",
+                "description": "Timezone (optional, defaults to UTC)",
+                "default": "UTC"
+            }
+        }
+    },
+    cache_ttl=0,
+)
+def get_current_time(arguments: dict) -> str:
+    """Return the current server time"""
+    current_time = datetime.now().isoformat()
+    return f"Current server time: {current_time}"
+
+
+@registry.tool(
+    name="calculate",
+    description="Performs basic arithmetic operations",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "operation": {
+                "type": "string",
+                "enum": list(OPERATIONS),
+                "description": "The operation to perform"
+            },
+            "operations": {
+                "type": "array",
+                "items": {"type": "string", "enum": list(OPERATIONS)},
+                "description": "Per-element operations for array arguments (instead of operation)"
+            },
+            "a": {
+                **NUMBERS,
+                "description": "First number, or an array of numbers"
+            },
+            "b": {
+                **NUMBERS,
+                "description": "Second number, or an array of numbers"
+            }
+        },
+        "required": ["a", "b"]
+    },
+    cacheable=True,
+)
+def calculate(arguments: dict) -> str:
+    """Apply an arithmetic operation to two numbers, or element-wise to arrays
+
+    Array calls return JSON {"results": [...], "divide_by_zero": [...],
+    "non_finite": [...]}; divisions by zero and results that overflow give
+    null results flagged in the masks.
+    """
+    operation = arguments.get("operations", arguments.get("operation"))
+    a = arguments.get("a")
+    b = arguments.get("b")
+    if operation is None:
+        raise InvalidArgumentsError("arguments.operation is required")
+
+    try:
+        if batch_length(operation, a, b) is not None:
+            results, divide_by_zero, non_finite = evaluate(operation, a, b)
+            return dumps({"results": results, "divide_by_zero": divide_by_zero,
+                          "non_finite": non_finite}).decode()
+    except ValueError as e:
+        return f"Error: {str(e)}"
+
+    op = OPERATIONS.get(operation)
+    if op is None:
+        return f"Unknown operation: {operation}"
+    if operation == "divide" and b == 0:
+        return "Error: Division by zero"
+
+    try:
+        result = op(a, b)
+    except Exception as e:
+        return f"Error: {str(e)}"
+    if isinstance(result, float) and not math.isfinite(result):
+        return "Error: Result is not a finite number"
+    return f"Result: {a} {operation} {b} = {result}"
+
+
+@registry.tool(
+    name="reverse_text",
+    description="Reverses the input text",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "text": {
+                "type": "string",
+                "description": "The text to reverse"
+            }
+        },
+        "required": ["text"]
+    },
+    cacheable=True,
+    # Multi-megabyte inputs would otherwise stall the event loop
+    execution="thread",
+)
+def reverse_text(arguments: dict) -> Iterator[str]:
+    """Return the input text reversed"""
+    text = arguments.get("text", "")
+    yield "Reversed: "
+    # Walk backwards so each chunk is a reversed slice of bounded size
+    for end in range(len(text), 0, -STREAM_CHUNK_SIZE):
+        yield text[max(0, end - STREAM_CHUNK_SIZE):end][::-1]
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Element-wise arithmetic for the calculate tool's batch mode
+Uses NumPy when it is installed and falls back to plain Python; set
+MCP_VECTOR_BACKEND=python to force the fallback. NumPy is imported on the
+first batch rather than at startup
+"""
+
+import importlib.util
+import math
+import operator
+import os
+from functools import lru_cache
+from itertools import repeat
+from typing import Any, Callable, Optional, Sequence, Union
+
+if os.environ.get('MCP_VECTOR_BACKEND', '').lower() == 'python':
+    BACKEND = "python"
+else:
+    BACKEND = "numpy" if importlib.util.find_spec("numpy") is not None else "python"
+
+# Arithmetic operations supported by the calculate tool
+OPERATIONS = {
+    "add": operator.add,
+    "subtract": operator.sub,
+    "multiply": operator.mul,
+    "divide": operator.truediv,
+}
+
+Operand = Union[float, Sequence[float]]
+
+
+def batch_length(*operands: Any) -> Optional[int]:
+    """Common length of the list operands, or None if all are scalars
+
+    Scalars broadcast against lists; lists of different lengths raise ValueError.
+    """
+    lengths = {len(value) for value in operands if isinstance(value, list)}
+    if len(lengths) > 1:
+        raise ValueError("Array arguments must have the same length")
+    return lengths.pop() if lengths else None
+
+
+def _python_evaluate(operations, a, b, length: int) -> tuple[list, list[bool], list[bool]]:
+    def elements(value):
+        return value if isinstance(value, list) else repeat(value, length)
+
+    results: list = []
+    divide_by_zero = []
+    non_finite = []
+    for operation, x, y in zip(elements(operations), elements(a), elements(b)):
+        if operation == "divide" and y == 0:
+            results.append(None)
+            divide_by_zero.append(True)
+            non_finite.append(False)
+            continue
+        try:
+            result = float(OPERATIONS[operation](x, y))
+        except OverflowError:
+            result = math.inf
+        finite = math.isfinite(result)
+        results.append(result if finite else None)
+        divide_by_zero.append(False)
+        non_finite.append(not finite)
+    return results, divide_by_zero, non_finite
+
+
+@lru_cache(maxsize=None)
+def _numpy_evaluator() -> Callable[..., tuple[list, list[bool], list[bool]]]:
+    import numpy
+
+    ufuncs = {
+        "add": numpy.add,
+        "subtract": numpy.subtract,
+        "multiply": numpy.multiply,
+        "divide": numpy.divide,
+    }
+    # Operations become small integer codes; comparing strings element-wise is slow
+    codes_by_name = {name: code for code, name in enumerate(ufuncs)}
+    divide = codes_by_name["divide"]
+
+    def _numpy_evaluate(operations, a, b, length: int) -> tuple[list, list[bool], list[bool]]:
+        a = numpy.broadcast_to(numpy.asarray(a, dtype=numpy.float64), length)
+        b = numpy.broadcast_to(numpy.asarray(b, dtype=numpy.float64), length)
+        # Masked elements are left unset, so start from a finite value
+        results = numpy.zeros(length, dtype=numpy.float64)
+
+        # Overflow is reported in the non_finite mask rather than as RuntimeWarnings
+        with numpy.errstate(all='ignore'):
+            divide_by_zero = _apply(operations, a, b, results, length)
+        non_finite = ~numpy.isfinite(results)
+
+        values = results.tolist()
+        for index in numpy.flatnonzero(divide_by_zero | non_finite).tolist():
+            values[index] = None
+        return values, divide_by_zero.tolist(), non_finite.tolist()
+
+    def _apply(operations, a, b, results, length: int):
+        """Compute into results; returns the divide-by-zero mask"""
+        if isinstance(operations, list):
+            codes = numpy.fromiter(map(codes_by_name.__getitem__, operations), dtype=numpy.int8, count=length)
+            divide_by_zero = (codes == divide) & (b == 0)
+            for name, ufunc in ufuncs.items():
+                selected = codes == codes_by_name[name]
+                if name == "divide":
+                    selected &= ~divide_by_zero
+                ufunc(a, b, out=results, where=selected)
+        else:
+            divide_by_zero = (b == 0) if operations == "divide" else numpy.zeros(length, dtype=bool)
+            ufuncs[operations](a, b, out=results, where=~divide_by_zero)
+        return divide_by_zero
+
+    return _numpy_evaluate
+
+
+def evaluate(operations: Union[str, list[str]], a: Operand, b: Operand) -> tuple[list, list[bool], list[bool]]:
+    """Apply operations to a and b element-wise in one pass
+
+    Any argument may be a list or a scalar that broadcasts to the common
+    length. Returns the results, a divide-by-zero mask and a mask of
+    results that overflowed to infinity or NaN (which JSON can't carry);
+    masked results are None rather than failing the whole batch.
+    """
+    length = batch_length(operations, a, b)
+    if length is None:
+        length = 1
+    unknown = set(operations if isinstance(operations, list) else [operations]) - OPERATIONS.keys()
+    if unknown:
+        raise ValueError(f"Unknown operation: {', '.join(sorted(map(str, unknown)))}")
+    if BACKEND == "numpy":
+        return _numpy_evaluator()(operations, a, b, length)
+    return _python_evaluate(operations, a, b, length)